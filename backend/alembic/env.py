@@ -0,0 +1,52 @@
+"""
+Alembic environment for PickleJar.
+
+Migrations run against the same DATABASE_URL the app uses and compare
+against the SQLAlchemy models in `models.py`.
+"""
+
+from logging.config import fileConfig
+
+from alembic import context
+from database import DATABASE_URL, Base, engine
+
+import models  # noqa: F401  (registers tables on Base.metadata)
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline():
+    """Emit migration SQL to stdout without connecting to the database."""
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=DATABASE_URL.startswith("sqlite"),
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    """Run migrations on a live connection from the app's engine."""
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,129 @@
+"""Baseline schema
+
+Creates the original picklejars, members, suggestions and votes tables.
+Existing databases whose tables were created by hand (e.g. in Supabase)
+already have them, so each table is only created when missing.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-16
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _existing_tables():
+    # Offline (--sql) runs have no live connection to inspect
+    if op.get_context().as_sql:
+        return set()
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade():
+    existing = _existing_tables()
+
+    if "picklejars" not in existing:
+        op.create_table(
+            "picklejars",
+            sa.Column("id", sa.String(), primary_key=True),
+            sa.Column("title", sa.String(), nullable=False),
+            sa.Column("description", sa.Text(), nullable=True),
+            sa.Column("points_per_voter", sa.Integer(), nullable=True),
+            sa.Column("max_suggestions_per_member", sa.Integer(), nullable=True),
+            sa.Column("suggestion_deadline", sa.DateTime(), nullable=True),
+            sa.Column("voting_deadline", sa.DateTime(), nullable=True),
+            sa.Column("hangout_datetime", sa.DateTime(), nullable=True),
+            sa.Column("status", sa.String(), nullable=True),
+            sa.Column("is_active", sa.Boolean(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+            sa.Column("creator_phone", sa.String(), nullable=True),
+        )
+
+    if "members" not in existing:
+        op.create_table(
+            "members",
+            sa.Column("id", sa.String(), primary_key=True),
+            sa.Column(
+                "picklejar_id",
+                sa.String(),
+                sa.ForeignKey("picklejars.id"),
+                nullable=False,
+            ),
+            sa.Column("phone_number", sa.String(), nullable=False),
+            sa.Column("display_name", sa.String(), nullable=True),
+            sa.Column("is_verified", sa.Boolean(), nullable=True),
+            sa.Column("verification_code", sa.String(), nullable=True),
+            sa.Column("has_suggested", sa.Boolean(), nullable=True),
+            sa.Column("has_voted", sa.Boolean(), nullable=True),
+            sa.Column("is_active", sa.Boolean(), nullable=True),
+            sa.Column("joined_at", sa.DateTime(), nullable=True),
+            sa.Column("last_active", sa.DateTime(), nullable=True),
+        )
+
+    if "suggestions" not in existing:
+        op.create_table(
+            "suggestions",
+            sa.Column("id", sa.String(), primary_key=True),
+            sa.Column(
+                "picklejar_id",
+                sa.String(),
+                sa.ForeignKey("picklejars.id"),
+                nullable=False,
+            ),
+            sa.Column(
+                "member_id", sa.String(), sa.ForeignKey("members.id"), nullable=False
+            ),
+            sa.Column("title", sa.String(), nullable=False),
+            sa.Column("description", sa.Text(), nullable=True),
+            sa.Column("location", sa.String(), nullable=True),
+            sa.Column("structured_location", sa.JSON(), nullable=True),
+            sa.Column("latitude", sa.Float(), nullable=True),
+            sa.Column("longitude", sa.Float(), nullable=True),
+            sa.Column("map_bounds", sa.JSON(), nullable=True),
+            sa.Column("geo_source", sa.String(), nullable=True),
+            sa.Column("location_confidence", sa.Integer(), nullable=True),
+            sa.Column("location_last_verified_at", sa.DateTime(), nullable=True),
+            sa.Column("estimated_cost", sa.String(), nullable=True),
+            sa.Column("is_active", sa.Boolean(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+        )
+
+    if "votes" not in existing:
+        op.create_table(
+            "votes",
+            sa.Column("id", sa.String(), primary_key=True),
+            sa.Column(
+                "member_id", sa.String(), sa.ForeignKey("members.id"), nullable=False
+            ),
+            sa.Column(
+                "suggestion_id",
+                sa.String(),
+                sa.ForeignKey("suggestions.id"),
+                nullable=False,
+            ),
+            sa.Column(
+                "picklejar_id",
+                sa.String(),
+                sa.ForeignKey("picklejars.id"),
+                nullable=False,
+            ),
+            sa.Column("points", sa.Integer(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+        )
+
+
+def downgrade():
+    op.drop_table("votes")
+    op.drop_table("suggestions")
+    op.drop_table("members")
+    op.drop_table("picklejars")
@@ -0,0 +1,58 @@
+"""Add suggestion_tallies
+
+Materialized per-suggestion vote totals, filled from the existing votes.
+`python -m scripts.repair_tallies verify` checks them afterwards.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def _existing_tables():
+    # Offline (--sql) runs have no live connection to inspect
+    if op.get_context().as_sql:
+        return set()
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade():
+    if "suggestion_tallies" in _existing_tables():
+        return
+
+    op.create_table(
+        "suggestion_tallies",
+        sa.Column(
+            "suggestion_id",
+            sa.String(),
+            sa.ForeignKey("suggestions.id"),
+            primary_key=True,
+        ),
+        sa.Column(
+            "picklejar_id", sa.String(), sa.ForeignKey("picklejars.id"), nullable=False
+        ),
+        sa.Column("points", sa.Integer(), nullable=False),
+        sa.Column("vote_count", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+    op.execute(
+        "INSERT INTO suggestion_tallies "
+        "(suggestion_id, picklejar_id, points, vote_count, updated_at) "
+        "SELECT votes.suggestion_id, suggestions.picklejar_id, SUM(votes.points), "
+        "COUNT(*), CURRENT_TIMESTAMP FROM votes "
+        "JOIN suggestions ON suggestions.id = votes.suggestion_id "
+        "GROUP BY votes.suggestion_id, suggestions.picklejar_id"
+    )
+
+
+def downgrade():
+    op.drop_table("suggestion_tallies")
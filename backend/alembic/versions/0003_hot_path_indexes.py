@@ -0,0 +1,96 @@
+"""Add indexes for the routers' hot filters
+
+Adds composite indexes for the member, suggestion, vote and tally lookups
+the routers run on every request, plus a unique index on
+(picklejar_id, phone_number) so a phone number can only join a jar once.
+
+On PostgreSQL the indexes are built with CREATE INDEX CONCURRENTLY outside
+the migration transaction, so reads and writes keep flowing while they
+build. If a concurrent build is interrupted, drop the INVALID index it
+leaves behind and run the upgrade again.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("uq_members_picklejar_phone", "members", ["picklejar_id", "phone_number"], True),
+    ("ix_members_picklejar_active", "members", ["picklejar_id", "is_active"], False),
+    (
+        "ix_suggestions_picklejar_active",
+        "suggestions",
+        ["picklejar_id", "is_active"],
+        False,
+    ),
+    (
+        "ix_suggestions_picklejar_member",
+        "suggestions",
+        ["picklejar_id", "member_id"],
+        False,
+    ),
+    ("ix_votes_member_picklejar", "votes", ["member_id", "picklejar_id"], False),
+    ("ix_votes_suggestion", "votes", ["suggestion_id"], False),
+    ("ix_suggestion_tallies_picklejar", "suggestion_tallies", ["picklejar_id"], False),
+]
+
+
+def _check_duplicate_members():
+    # Offline (--sql) runs have no live connection to inspect
+    if op.get_context().as_sql:
+        return
+
+    duplicates = (
+        op.get_bind()
+        .execute(
+            sa.text(
+                "SELECT picklejar_id, phone_number, COUNT(*) FROM members "
+                "GROUP BY picklejar_id, phone_number HAVING COUNT(*) > 1"
+            )
+        )
+        .fetchall()
+    )
+    if duplicates:
+        listed = ", ".join(f"{jar}/{phone} ({count})" for jar, phone, count in duplicates[:10])
+        raise RuntimeError(
+            f"Cannot add uq_members_picklejar_phone: {len(duplicates)} phone "
+            f"number(s) joined the same PickleJar more than once: {listed}. "
+            "Merge or remove the duplicate members and run the upgrade again."
+        )
+
+
+def upgrade():
+    _check_duplicate_members()
+
+    concurrently = op.get_bind().dialect.name == "postgresql"
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=unique,
+                if_not_exists=True,
+                postgresql_concurrently=concurrently,
+            )
+
+
+def downgrade():
+    concurrently = op.get_bind().dialect.name == "postgresql"
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                if_exists=True,
+                postgresql_concurrently=concurrently,
+            )
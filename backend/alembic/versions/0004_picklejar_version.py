@@ -0,0 +1,30 @@
+"""Add picklejars.version
+
+Per-jar change counter used for ETags. The constant server default lets
+PostgreSQL add the column without rewriting the table.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-16
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "picklejars",
+        sa.Column("version", sa.Integer(), nullable=False, server_default="1"),
+    )
+
+
+def downgrade():
+    with op.batch_alter_table("picklejars") as batch_op:
+        batch_op.drop_column("version")
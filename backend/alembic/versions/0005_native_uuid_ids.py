@@ -0,0 +1,120 @@
+"""Store member, suggestion and vote IDs as native uuid on PostgreSQL
+
+The ID and foreign key columns that hold generated UUIDs move from
+varchar (36 bytes plus header) to PostgreSQL's 16-byte uuid type, which
+shrinks the votes table and every index on it. Other databases keep text
+columns and are not changed.
+
+Changing the column types rewrites members, suggestions, votes and
+suggestion_tallies under an exclusive lock, so run this upgrade in a
+maintenance window. It stops before changing anything if a column holds a
+value that is not a UUID.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-16
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+# (table, column) pairs holding generated UUIDs
+COLUMNS = [
+    ("members", "id"),
+    ("suggestions", "id"),
+    ("suggestions", "member_id"),
+    ("votes", "id"),
+    ("votes", "member_id"),
+    ("votes", "suggestion_id"),
+    ("suggestion_tallies", "suggestion_id"),
+]
+
+# (table, column, referenced table) for the foreign keys between them
+FOREIGN_KEYS = [
+    ("suggestions", "member_id", "members"),
+    ("votes", "member_id", "members"),
+    ("votes", "suggestion_id", "suggestions"),
+    ("suggestion_tallies", "suggestion_id", "suggestions"),
+]
+
+UUID_PATTERN = "^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$"
+
+
+def _foreign_key_name(table, column, referred_table):
+    # Offline (--sql) runs have no live connection to inspect; use the name
+    # PostgreSQL gives unnamed constraints
+    if op.get_context().as_sql:
+        return f"{table}_{column}_fkey"
+    for foreign_key in sa.inspect(op.get_bind()).get_foreign_keys(table):
+        if (
+            foreign_key["constrained_columns"] == [column]
+            and foreign_key["referred_table"] == referred_table
+        ):
+            return foreign_key["name"]
+    return None
+
+
+def _check_uuid_values():
+    if op.get_context().as_sql:
+        return
+
+    bad = []
+    for table, column in COLUMNS:
+        count = (
+            op.get_bind()
+            .execute(
+                sa.text(
+                    f"SELECT COUNT(*) FROM {table} "
+                    f"WHERE {column}::text !~* :pattern"
+                ),
+                {"pattern": UUID_PATTERN},
+            )
+            .scalar()
+        )
+        if count:
+            bad.append(f"{table}.{column} ({count})")
+    if bad:
+        raise RuntimeError(
+            "Cannot convert IDs to uuid, some values are not UUIDs: "
+            f"{', '.join(bad)}. Fix or remove those rows and run the upgrade again."
+        )
+
+
+def _convert(type_, cast):
+    foreign_keys = [
+        (_foreign_key_name(table, column, referred), table, column, referred)
+        for table, column, referred in FOREIGN_KEYS
+    ]
+    for name, table, _, _ in foreign_keys:
+        if name:
+            op.drop_constraint(name, table, type_="foreignkey")
+
+    for table, column in COLUMNS:
+        op.alter_column(
+            table, column, type_=type_, postgresql_using=f"{column}::{cast}"
+        )
+
+    for name, table, column, referred in foreign_keys:
+        op.create_foreign_key(
+            name or f"{table}_{column}_fkey", table, referred, [column], ["id"]
+        )
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    _check_uuid_values()
+    _convert(postgresql.UUID(as_uuid=False), "uuid")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    _convert(sa.String(), "text")
@@ -0,0 +1,71 @@
+"""Add suggestion ordinals and packed_ballots
+
+Numbers the suggestions of each jar 0, 1, 2, ... in `suggestions.ordinal`
+and adds `packed_ballots`, which stores a member's whole ballot as one row
+of (ordinal, points) pairs when BALLOT_STORAGE=packed. Existing votes stay
+in `votes` and are still read for members who have not voted again.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-16
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("suggestions", sa.Column("ordinal", sa.Integer(), nullable=True))
+
+    # Any order works as long as it is dense and unique per jar; IDs are unique
+    op.execute(
+        "UPDATE suggestions SET ordinal = ("
+        "SELECT COUNT(*) FROM suggestions AS earlier "
+        "WHERE earlier.picklejar_id = suggestions.picklejar_id "
+        "AND earlier.id < suggestions.id)"
+    )
+    op.create_index(
+        "uq_suggestions_picklejar_ordinal",
+        "suggestions",
+        ["picklejar_id", "ordinal"],
+        unique=True,
+    )
+
+    # members.id is native uuid on PostgreSQL since revision 0005
+    if op.get_bind().dialect.name == "postgresql":
+        member_id_type = postgresql.UUID(as_uuid=False)
+    else:
+        member_id_type = sa.String()
+
+    op.create_table(
+        "packed_ballots",
+        sa.Column(
+            "picklejar_id",
+            sa.String(),
+            sa.ForeignKey("picklejars.id"),
+            primary_key=True,
+        ),
+        sa.Column(
+            "member_id",
+            member_id_type,
+            sa.ForeignKey("members.id"),
+            primary_key=True,
+        ),
+        sa.Column("entries", sa.LargeBinary(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_table("packed_ballots")
+    op.drop_index("uq_suggestions_picklejar_ordinal", table_name="suggestions")
+    with op.batch_alter_table("suggestions") as batch_op:
+        batch_op.drop_column("ordinal")
@@ -0,0 +1,39 @@
+"""Add results_snapshots
+
+Stores the encoded results of completed jars so `GET /results` serves them
+with a single-row read. Jars completed before this revision get their
+snapshot the first time their results are viewed.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-16
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "results_snapshots",
+        sa.Column(
+            "picklejar_id",
+            sa.String(),
+            sa.ForeignKey("picklejars.id"),
+            primary_key=True,
+        ),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("scoring_rule", sa.String(), nullable=False),
+        sa.Column("body", sa.LargeBinary(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_table("results_snapshots")
@@ -0,0 +1,32 @@
+"""Add members.ballot_version
+
+Per-member ballot counter. Ballots used to bump `picklejars.version`, so
+every voter of a jar updated the same row and dropped the jar from the jar
+cache. The constant server default lets PostgreSQL add the column without
+rewriting the table.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "members",
+        sa.Column("ballot_version", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade():
+    with op.batch_alter_table("members") as batch_op:
+        batch_op.drop_column("ballot_version")
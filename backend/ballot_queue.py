@@ -0,0 +1,484 @@
+"""
+Write-behind ingestion of ballots (BALLOT_INGESTION=queued).
+
+Near a big jar's voting deadline every ballot would otherwise be its own
+transaction, and on SQLite those commits queue up on the database write
+lock. In queued mode `submit_votes` and `clear_votes` validate the request
+as usual, append the ballot to `BallotLog`, an ordered append-only log in
+a local SQLite file (BALLOT_QUEUE_PATH, fsynced on every append), and
+answer right away. A background thread applies the log to the database
+every BALLOT_QUEUE_FLUSH_MS in transactions of up to BALLOT_QUEUE_BATCH_SIZE
+ballots. Only the latest ballot of each member in a batch is written, then
+the applied entries are removed from the log.
+
+Entries leave the log only once they are committed. If the database is
+unreachable, locked or times out, applying stops and the rest of the log
+waits for the next flush; whatever is still in the log when the server
+stops is applied when it starts again. Replaying an entry that was applied
+just before a crash writes the same ballot again, which changes nothing.
+An entry that can never be applied (its jar is no longer voting, or its
+member or suggestion is gone) is moved to the `ballot_dead_letters` table
+of the same file instead of being retried forever.
+
+Workers on one host share the log; a lock file makes sure one of them
+applies it at a time. Where `fcntl` is missing (Windows) only the
+in-process lock is taken, so run a single worker there.
+
+Reads stay consistent for the member who voted: `pending_votes` returns a
+member's ballot from the log while it waits, `apply_member` applies a jar's
+waiting ballots before results or the snapshot are served to a member who
+has one waiting, and `apply_jar` applies them before the jar's phase
+changes. Results read by anyone else during voting may trail the log by one
+flush.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import events
+from config import settings
+from database import SessionLocal
+from models import Member, PickleJar
+from sqlalchemy import update
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from tallies import Ballot, clear_ballot, write_ballot
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Wait before applying again after the database failed
+RETRY_SECONDS = 1.0
+
+
+def queued_ingestion() -> bool:
+    return settings.BALLOT_INGESTION == "queued"
+
+
+def queued_votes(
+    picklejar_id: str, member_id: str, ballot: Ballot, submitted_at: datetime
+) -> List[dict]:
+    """A waiting ballot as `VoteResponse`-shaped dicts."""
+    # Waiting votes have no row yet; the ID names the ballot entry
+    return [
+        {
+            "id": f"{member_id}:{sid}",
+            "member_id": member_id,
+            "suggestion_id": sid,
+            "picklejar_id": picklejar_id,
+            "points": points,
+            "created_at": submitted_at,
+        }
+        for sid, points in ballot.items()
+    ]
+
+
+class LogEntry(NamedTuple):
+    seq: int
+    picklejar_id: str
+    member_id: str
+    # None clears the member's ballot
+    ballot: Optional[Ballot]
+    submitted_at: datetime
+
+
+def _transient(error: Exception) -> bool:
+    """Whether applying may succeed later: the database was down or busy."""
+    if isinstance(error, DBAPIError) and error.connection_invalidated:
+        return True
+    return isinstance(error, (OperationalError, InterfaceError, PoolTimeoutError))
+
+
+class BallotLog:
+    """Accepted ballots in submission order, in a local SQLite file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS ballot_log ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "picklejar_id TEXT NOT NULL, member_id TEXT NOT NULL, "
+            "ballot TEXT, submitted_at TEXT NOT NULL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_ballot_log_member "
+            "ON ballot_log (picklejar_id, member_id, seq)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS ballot_dead_letters ("
+            "seq INTEGER PRIMARY KEY, "
+            "picklejar_id TEXT NOT NULL, member_id TEXT NOT NULL, "
+            "ballot TEXT, submitted_at TEXT NOT NULL, "
+            "failed_at TEXT NOT NULL, error TEXT NOT NULL)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            # An acknowledged ballot must be on disk
+            conn.execute("PRAGMA synchronous=FULL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _entry(row) -> LogEntry:
+        seq, picklejar_id, member_id, ballot, submitted_at = row
+        return LogEntry(
+            seq,
+            picklejar_id,
+            member_id,
+            json.loads(ballot) if ballot is not None else None,
+            datetime.fromisoformat(submitted_at),
+        )
+
+    def append(
+        self,
+        picklejar_id: str,
+        member_id: str,
+        ballot: Optional[Ballot],
+        submitted_at: datetime,
+    ) -> int:
+        return self._connection().execute(
+            "INSERT INTO ballot_log (picklejar_id, member_id, ballot, submitted_at) "
+            "VALUES (?, ?, ?, ?)",
+            (
+                picklejar_id,
+                member_id,
+                json.dumps(ballot) if ballot is not None else None,
+                submitted_at.isoformat(),
+            ),
+        ).lastrowid
+
+    def latest(self, picklejar_id: str, member_id: str) -> Optional[LogEntry]:
+        row = (
+            self._connection()
+            .execute(
+                "SELECT seq, picklejar_id, member_id, ballot, submitted_at "
+                "FROM ballot_log WHERE picklejar_id = ? AND member_id = ? "
+                "ORDER BY seq DESC LIMIT 1",
+                (picklejar_id, member_id),
+            )
+            .fetchone()
+        )
+        return self._entry(row) if row else None
+
+    def read(self, limit: int, picklejar_id: Optional[str] = None) -> List[LogEntry]:
+        """The oldest `limit` entries, of one jar if given."""
+        query = (
+            "SELECT seq, picklejar_id, member_id, ballot, submitted_at FROM ballot_log"
+        )
+        params = ()
+        if picklejar_id is not None:
+            query += " WHERE picklejar_id = ?"
+            params = (picklejar_id,)
+        rows = self._connection().execute(
+            query + " ORDER BY seq LIMIT ?", params + (limit,)
+        )
+        return [self._entry(row) for row in rows]
+
+    def remove(self, last_seq: int, picklejar_id: Optional[str] = None) -> None:
+        """Remove entries up to `last_seq`, of one jar if given."""
+        if picklejar_id is None:
+            self._connection().execute(
+                "DELETE FROM ballot_log WHERE seq <= ?", (last_seq,)
+            )
+        else:
+            self._connection().execute(
+                "DELETE FROM ballot_log WHERE seq <= ? AND picklejar_id = ?",
+                (last_seq, picklejar_id),
+            )
+
+    def dead_letter(self, entry: LogEntry, error: str) -> None:
+        """Keep an entry that cannot be applied; it leaves the log with its batch."""
+        self._connection().execute(
+            "INSERT OR REPLACE INTO ballot_dead_letters "
+            "(seq, picklejar_id, member_id, ballot, submitted_at, failed_at, error) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                entry.seq,
+                entry.picklejar_id,
+                entry.member_id,
+                json.dumps(entry.ballot) if entry.ballot is not None else None,
+                entry.submitted_at.isoformat(),
+                datetime.utcnow().isoformat(),
+                error,
+            ),
+        )
+
+    def count(self) -> int:
+        row = self._connection().execute("SELECT COUNT(*) FROM ballot_log").fetchone()
+        return row[0]
+
+    def dead_letter_count(self) -> int:
+        row = (
+            self._connection()
+            .execute("SELECT COUNT(*) FROM ballot_dead_letters")
+            .fetchone()
+        )
+        return row[0]
+
+
+class BallotQueue:
+    def __init__(
+        self,
+        path: str,
+        session_factory=SessionLocal,
+        batch_size: int = 500,
+        flush_seconds: float = 0.05,
+    ):
+        self.path = path
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._log: Optional[BallotLog] = None
+        self._apply_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+        self.submitted = 0
+        self.applied = 0
+        self.superseded = 0
+        self.failed = 0
+        self.batches = 0
+
+    @property
+    def log(self) -> BallotLog:
+        # Opened on first use so the file only exists in queued mode
+        if self._log is None:
+            self._log = BallotLog(self.path)
+        return self._log
+
+    def submit(
+        self, picklejar_id: str, member_id: str, ballot: Optional[Ballot]
+    ) -> datetime:
+        """Append a validated ballot (None to clear) and return its time."""
+        submitted_at = datetime.utcnow()
+        self.log.append(picklejar_id, member_id, ballot, submitted_at)
+        with self._stats_lock:
+            self.submitted += 1
+        return submitted_at
+
+    def pending_votes(self, picklejar_id: str, member_id: str) -> Optional[List[dict]]:
+        """
+        Return a member's waiting ballot as `VoteResponse`-shaped dicts
+        (empty if they cleared it), or None if nothing of theirs is waiting.
+        """
+        entry = self.log.latest(picklejar_id, member_id)
+        if entry is None:
+            return None
+        return queued_votes(
+            picklejar_id, member_id, entry.ballot or {}, entry.submitted_at
+        )
+
+    @contextmanager
+    def _applying(self):
+        # One applier per process, and per host through the lock file
+        with self._apply_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.path + ".lock", "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def apply_pending(self, picklejar_id: Optional[str] = None) -> int:
+        """
+        Apply waiting ballots, of one jar if given, until the log is empty.
+        Returns the number of log entries applied.
+
+        Raises, leaving the unapplied entries in the log, if the database
+        fails in a way that may pass (see `_transient`).
+        """
+        total = 0
+        with self._applying():
+            while True:
+                entries = self.log.read(self.batch_size, picklejar_id)
+                if not entries:
+                    return total
+                self._apply_batch(entries)
+                self.log.remove(entries[-1].seq, picklejar_id)
+                total += len(entries)
+
+    def apply_jar(self, picklejar_id: str) -> None:
+        """Apply a jar's waiting ballots, if ballots are queued at all."""
+        if queued_ingestion():
+            self.apply_pending(picklejar_id)
+
+    def apply_member(self, picklejar_id: str, member_id: str) -> None:
+        """
+        Apply a jar's waiting ballots if one of them is the member's, so the
+        member reads their own ballot back. Others wait for the next flush.
+        """
+        if queued_ingestion() and self.log.latest(picklejar_id, member_id):
+            self.apply_pending(picklejar_id)
+
+    def _apply_batch(self, entries: List[LogEntry]) -> None:
+        latest: Dict[tuple, LogEntry] = {}
+        for entry in entries:
+            latest[(entry.picklejar_id, entry.member_id)] = entry
+
+        try:
+            rejected = self._write(list(latest.values()))
+        except Exception as error:
+            if _transient(error):
+                raise
+            # Apply the entries one by one to find those that cannot be applied
+            logger.exception("Failed to apply a batch of queued ballots")
+            rejected = []
+            for entry in latest.values():
+                try:
+                    rejected += self._write([entry])
+                except Exception as error:
+                    if _transient(error):
+                        raise
+                    rejected.append((entry, f"{type(error).__name__}: {error}"))
+
+        for entry, error in rejected:
+            self.log.dead_letter(entry, error)
+            logger.error(
+                "Moved queued ballot %s of member %s in jar %s to dead letters: %s",
+                entry.seq,
+                entry.member_id,
+                entry.picklejar_id,
+                error,
+            )
+        with self._stats_lock:
+            self.superseded += len(entries) - len(latest)
+            self.failed += len(rejected)
+            self.batches += 1
+
+    def _write(self, entries: List[LogEntry]) -> List[Tuple[LogEntry, str]]:
+        """
+        Write entries in one transaction and return those rejected, with
+        the reason, because their jar is no longer voting.
+        """
+        db = self.session_factory()
+        try:
+            # A no-op UPDATE of the jars still voting locks their rows (the
+            # database, on SQLite), so a phase change cannot commit between
+            # this check and the ballots. It changes nothing, so the jars'
+            # versions and cached copies stay valid (see versioning.py)
+            voting = set(
+                db.execute(
+                    update(PickleJar)
+                    .where(
+                        PickleJar.id.in_({entry.picklejar_id for entry in entries}),
+                        PickleJar.status == "voting",
+                    )
+                    .values(version=PickleJar.version, updated_at=PickleJar.updated_at)
+                    .returning(PickleJar.id)
+                    .execution_options(synchronize_session=False)
+                ).scalars()
+            )
+
+            rejected = []
+            voted, cleared = [], []
+            # Jar -> event to publish, "ballot_submitted" if any member voted
+            event_types: Dict[str, str] = {}
+            for entry in entries:
+                if entry.picklejar_id not in voting:
+                    rejected.append((entry, "PickleJar is no longer in voting"))
+                elif entry.ballot is None:
+                    clear_ballot(db, entry.picklejar_id, entry.member_id)
+                    cleared.append(entry.member_id)
+                    event_types.setdefault(entry.picklejar_id, "ballot_cleared")
+                else:
+                    write_ballot(db, entry.picklejar_id, entry.member_id, entry.ballot)
+                    voted.append(entry.member_id)
+                    event_types[entry.picklejar_id] = "ballot_submitted"
+
+            for member_ids, has_voted in ((voted, True), (cleared, False)):
+                if member_ids:
+                    db.execute(
+                        update(Member)
+                        .where(Member.id.in_(member_ids))
+                        .values(
+                            has_voted=has_voted,
+                            ballot_version=Member.ballot_version + 1,
+                        )
+                        .execution_options(synchronize_session=False)
+                    )
+            db.commit()
+            with self._stats_lock:
+                self.applied += len(entries) - len(rejected)
+
+            for picklejar_id, event_type in event_types.items():
+                events.publish_participation(
+                    db, picklejar_id, event_type, include_tallies=True
+                )
+            return rejected
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        stopping = False
+        while True:
+            wait = self.flush_seconds
+            try:
+                self.apply_pending()
+            except Exception:
+                # Everything not applied is still in the log
+                logger.exception("Failed to apply queued ballots, will retry")
+                wait = max(wait, RETRY_SECONDS)
+            if stopping:
+                return
+            with self._condition:
+                if not self._stopping:
+                    self._condition.wait(wait)
+                stopping = self._stopping
+
+    def start(self) -> None:
+        """Apply entries left from a previous run, then keep applying."""
+        self._stopping = False
+        self._thread = threading.Thread(
+            target=self._run, name="ballot-queue", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread after applying what is left."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=30)
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.log.count(),
+            "submitted": self.submitted,
+            "applied": self.applied,
+            "superseded": self.superseded,
+            "failed": self.failed,
+            "dead_letters": self.log.dead_letter_count(),
+            "batches": self.batches,
+        }
+
+
+ballot_queue = BallotQueue(
+    settings.BALLOT_QUEUE_PATH,
+    batch_size=settings.BALLOT_QUEUE_BATCH_SIZE,
+    flush_seconds=settings.BALLOT_QUEUE_FLUSH_MS / 1000,
+)
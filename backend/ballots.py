@@ -0,0 +1,102 @@
+"""
+Packed ballot encoding and suggestion ordinals.
+
+With BALLOT_STORAGE=packed a member's ballot is stored as one
+`packed_ballots` row instead of one `votes` row per suggestion. Suggestions
+are numbered per jar (`Suggestion.ordinal`, assigned when they are created)
+and the ballot is a byte string of (ordinal, points) pairs, each a
+little-endian uint32, sorted by ordinal. A ballot over k suggestions takes
+8 * k bytes.
+
+`decode_totals` sums many ballots at once: the blobs are joined and viewed
+as one numpy record array, then points and vote counts per ordinal are
+accumulated with `np.bincount`, so no Python loop runs per vote.
+"""
+
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+from models import Suggestion
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.orm import Session
+
+ENTRY_DTYPE = np.dtype([("ordinal", "<u4"), ("points", "<u4")])
+
+
+def encode_entries(entries: Dict[int, int]) -> bytes:
+    """Encode {ordinal: points} as a packed ballot."""
+    packed = np.empty(len(entries), dtype=ENTRY_DTYPE)
+    packed["ordinal"] = list(entries)
+    packed["points"] = list(entries.values())
+    packed.sort(order="ordinal")
+    return packed.tobytes()
+
+
+def decode_entries(blob: bytes) -> Dict[int, int]:
+    """Decode a packed ballot into {ordinal: points}."""
+    packed = np.frombuffer(blob, dtype=ENTRY_DTYPE)
+    return dict(zip(packed["ordinal"].tolist(), packed["points"].tolist()))
+
+
+def decode_totals(
+    blobs: Iterable[bytes], size: int = 0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sum packed ballots into (points, vote_count) arrays indexed by ordinal.
+
+    The arrays have at least `size` entries (e.g. the number of suggestions
+    in the jar) so every ordinal can be indexed directly.
+    """
+    packed = np.frombuffer(b"".join(blobs), dtype=ENTRY_DTYPE)
+    ordinals = packed["ordinal"].astype(np.intp)
+    points = np.bincount(ordinals, weights=packed["points"], minlength=size)
+    counts = np.bincount(ordinals, minlength=size)
+    return points.astype(np.int64), counts
+
+
+def next_ordinal(db: Session, picklejar_id: str) -> int:
+    """
+    Return the next free suggestion ordinal for a jar.
+
+    Call after `bump_version`, which locks the jar row, so concurrent
+    suggestions in the same jar are numbered one after the other.
+    """
+    highest = db.execute(
+        select(func.max(Suggestion.ordinal)).where(
+            Suggestion.picklejar_id == picklejar_id
+        )
+    ).scalar()
+    return 0 if highest is None else highest + 1
+
+
+def suggestion_ordinals(
+    db: Session, picklejar_id: str, number_missing: bool = False
+) -> Dict[str, int]:
+    """
+    Return {suggestion_id: ordinal} for every suggestion in a jar.
+
+    Suggestions inserted without an ordinal (e.g. by hand) are left out, or
+    with `number_missing` numbered after the jar's highest ordinal, which
+    writes. Does not commit.
+    """
+    rows = db.execute(
+        select(Suggestion.id, Suggestion.ordinal).where(
+            Suggestion.picklejar_id == picklejar_id
+        )
+    ).all()
+
+    ordinals = {sid: ordinal for sid, ordinal in rows if ordinal is not None}
+    # UUIDv7 IDs sort in creation order
+    unnumbered = sorted(sid for sid, ordinal in rows if ordinal is None)
+    if unnumbered and number_missing:
+        start = next_ordinal(db, picklejar_id)
+        for offset, sid in enumerate(unnumbered):
+            ordinals[sid] = start + offset
+        suggestion_table = Suggestion.__table__
+        db.execute(
+            suggestion_table.update()
+            .where(suggestion_table.c.id == bindparam("sid"))
+            .values(ordinal=bindparam("new_ordinal")),
+            [{"sid": sid, "new_ordinal": ordinals[sid]} for sid in unnumbered],
+        )
+    return ordinals
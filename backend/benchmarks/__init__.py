@@ -0,0 +1,6 @@
+"""
+Micro-benchmarks for the PickleJar backend.
+
+Run them from the backend directory, e.g. `python -m benchmarks.ballot_upsert`.
+Each benchmark uses its own throwaway database unless one is passed in.
+"""
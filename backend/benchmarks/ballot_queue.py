@@ -0,0 +1,221 @@
+"""
+Compare direct and queued ballot ingestion under a burst of voters.
+
+Usage (from the backend directory):
+    python -m benchmarks.ballot_queue [--voters 1000] [--suggestions 20]
+                                      [--concurrency 32] [--seed 1]
+                                      [--ingestion both|direct|queued]
+
+Sets up one jar with `--voters` members in the voting phase, then submits
+every member's ballot at once through httpx's ASGI transport and reports
+vote throughput and p50/p99 latency. In queued mode it also reports how
+long the ballot queue takes to drain after the last response. Both modes
+then check the jar's results against the ballots that were sent.
+
+The app reads its settings at import time, so `both` runs each mode in a
+subprocess on its own temporary SQLite database.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def ballot(rng, suggestion_ids, points):
+    """Spread `points` randomly over a few suggestions."""
+    picks = rng.sample(suggestion_ids, min(len(suggestion_ids), 3))
+    allocation = defaultdict(int)
+    for _ in range(points):
+        allocation[rng.choice(picks)] += 1
+    return [{"suggestion_id": sid, "points": p} for sid, p in allocation.items()]
+
+
+async def call(client, method, url, **kwargs):
+    response = await client.request(method, url, **kwargs)
+    if response.status_code not in (200, 201):
+        raise RuntimeError(
+            f"{method} {url} returned {response.status_code}: {response.text[:200]}"
+        )
+    return response.json()
+
+
+async def run(args):
+    import httpx
+    from ballot_queue import ballot_queue, queued_ingestion
+    from database import Base, engine
+    from main import app
+
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(args.seed)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        jar = await call(
+            client, "POST", "/api/picklejars/", json={"title": "Ballot burst"}
+        )
+        jar_id = jar["id"]
+        await call(client, "POST", f"/api/picklejars/{jar_id}/start-suggesting")
+        member_ids = []
+        for i in range(args.voters):
+            member = await call(
+                client,
+                "POST",
+                f"/api/members/{jar_id}/join",
+                json={"phone_number": f"+1555{i:07d}"},
+            )
+            member_ids.append(member["id"])
+        suggestion_ids = []
+        for i in range(args.suggestions):
+            suggestion = await call(
+                client,
+                "POST",
+                f"/api/suggestions/{jar_id}/suggest",
+                params={"member_id": member_ids[i % args.voters]},
+                json={"title": f"Idea {i}"},
+            )
+            suggestion_ids.append(suggestion["id"])
+        await call(client, "POST", f"/api/picklejars/{jar_id}/start-voting")
+        points_per_voter = max(args.suggestions - 1, 1)
+
+        ballots = {
+            member_id: ballot(rng, suggestion_ids, points_per_voter)
+            for member_id in member_ids
+        }
+        expected = defaultdict(int)
+        for votes in ballots.values():
+            for vote in votes:
+                expected[vote["suggestion_id"]] += vote["points"]
+
+        if queued_ingestion():
+            ballot_queue.start()
+        limit = asyncio.Semaphore(args.concurrency)
+        latencies = []
+
+        async def vote(member_id):
+            async with limit:
+                started = time.perf_counter()
+                await call(
+                    client,
+                    "POST",
+                    f"/api/votes/{jar_id}/vote",
+                    params={"member_id": member_id},
+                    json={"votes": ballots[member_id]},
+                )
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(vote(member_id) for member_id in member_ids))
+        wall_seconds = time.perf_counter() - started
+
+        drain_seconds = None
+        if queued_ingestion():
+            while ballot_queue.log.count():
+                await asyncio.sleep(0.005)
+            drain_seconds = time.perf_counter() - started - wall_seconds
+            ballot_queue.stop()
+
+        results = await call(client, "GET", f"/api/picklejars/{jar_id}/results")
+
+    totals = {s["id"]: s["total_points"] for s in results["all_suggestions"]}
+    latencies.sort()
+    return {
+        "ingestion": os.environ["BALLOT_INGESTION"],
+        "voters": args.voters,
+        "wall_seconds": wall_seconds,
+        "throughput_rps": args.voters / wall_seconds,
+        "p50_ms": 1000 * percentile(latencies, 0.50),
+        "p99_ms": 1000 * percentile(latencies, 0.99),
+        "drain_seconds": drain_seconds,
+        "tallies_match": totals == {sid: expected[sid] for sid in suggestion_ids},
+        "members_voted": results["stats"]["members_voted"],
+    }
+
+
+def run_mode(args, ingestion):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # The app reads its settings at import time
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+        os.environ["BALLOT_QUEUE_PATH"] = os.path.join(tmp_dir, "ballots.db")
+        os.environ["BALLOT_INGESTION"] = ingestion
+        os.environ["RATE_LIMIT_ENABLED"] = "false"
+        os.environ["DEADLINE_SCHEDULER_ENABLED"] = "false"
+        return asyncio.run(run(args))
+
+
+def print_report(report):
+    drain = report["drain_seconds"]
+    print(
+        f"{report['ingestion']:<7} {report['voters']:>6} ballots in "
+        f"{report['wall_seconds']:6.2f}s ({report['throughput_rps']:7.1f} req/s)  "
+        f"p50 {report['p50_ms']:8.2f} ms  p99 {report['p99_ms']:8.2f} ms  "
+        f"drain {f'{drain:.2f}s' if drain is not None else '-':>6}  "
+        f"voted {report['members_voted']}  "
+        f"tallies {'match' if report['tallies_match'] else 'DIFFER'}"
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--voters", type=int, default=1000)
+    parser.add_argument("--suggestions", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--ingestion", choices=("both", "direct", "queued"), default="both"
+    )
+    parser.add_argument("--json", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.ingestion != "both":
+        report = run_mode(args, args.ingestion)
+        if args.json:
+            print(json.dumps(report))
+        else:
+            print_report(report)
+        return 0 if report["tallies_match"] else 1
+
+    failed = False
+    for ingestion in ("direct", "queued"):
+        output = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.ballot_queue",
+                "--voters",
+                str(args.voters),
+                "--suggestions",
+                str(args.suggestions),
+                "--concurrency",
+                str(args.concurrency),
+                "--seed",
+                str(args.seed),
+                "--ingestion",
+                ingestion,
+                "--json",
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        report = json.loads(output.strip().splitlines()[-1])
+        print_report(report)
+        failed = failed or not report["tallies_match"]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
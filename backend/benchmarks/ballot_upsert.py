@@ -0,0 +1,153 @@
+"""
+Compare ballot writes: delete-and-reinsert against the diff-based upsert.
+
+Usage (from the backend directory):
+    python -m benchmarks.ballot_upsert [--sizes 5 50 500] [--rounds 20]
+                                       [--database-url URL]
+
+For each ballot size a member first votes on every suggestion, then
+repeatedly moves one point between two suggestions, which is the common
+"nudge" edit. The statements issued and the median latency of one nudge
+(including the commit) are reported for both implementations. Without
+`--database-url` a temporary SQLite file is used.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from database import Base
+from models import Member, PickleJar, Suggestion, Vote
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from tallies import apply_ballot_diff, load_ballot, save_ballot, verify_tallies
+
+
+def delete_and_reinsert(db, picklejar_id, member_id, new_ballot):
+    """The previous submit_votes write path, kept here for comparison."""
+    old_ballot = load_ballot(db, picklejar_id, member_id)
+    db.query(Vote).filter(
+        Vote.member_id == member_id, Vote.picklejar_id == picklejar_id
+    ).delete()
+    new_votes = []
+    for suggestion_id, points in new_ballot.items():
+        db_vote = Vote(
+            member_id=member_id,
+            suggestion_id=suggestion_id,
+            picklejar_id=picklejar_id,
+            points=points,
+        )
+        db.add(db_vote)
+        new_votes.append(db_vote)
+    apply_ballot_diff(db, picklejar_id, old_ballot, new_ballot)
+    db.commit()
+    for vote in new_votes:
+        db.refresh(vote)
+
+
+def diff_upsert(db, picklejar_id, member_id, new_ballot):
+    save_ballot(db, picklejar_id, member_id, new_ballot)
+    db.commit()
+
+
+IMPLEMENTATIONS = {"delete+reinsert": delete_and_reinsert, "diff upsert": diff_upsert}
+
+
+def _create_jar(db, size):
+    picklejar = PickleJar(
+        title=f"Benchmark {size}", status="voting", points_per_voter=size * 2
+    )
+    db.add(picklejar)
+    db.flush()
+    member = Member(picklejar_id=picklejar.id, phone_number=f"+1555{size:07d}")
+    db.add(member)
+    db.flush()
+    suggestions = [
+        Suggestion(picklejar_id=picklejar.id, member_id=member.id, title=f"Idea {i}")
+        for i in range(size)
+    ]
+    db.add_all(suggestions)
+    db.commit()
+    return picklejar.id, member.id, [suggestion.id for suggestion in suggestions]
+
+
+def run(session_factory, engine, size, rounds, write):
+    statements = [0]
+
+    def count(*args):
+        statements[0] += 1
+
+    db = session_factory()
+    try:
+        picklejar_id, member_id, suggestion_ids = _create_jar(db, size)
+        ballot = {suggestion_id: 1 for suggestion_id in suggestion_ids}
+        write(db, picklejar_id, member_id, ballot)
+
+        event.listen(engine, "before_cursor_execute", count)
+        timings = []
+        counts = []
+        try:
+            for i in range(rounds):
+                # Move one point back and forth between the first two suggestions
+                giver, taker = suggestion_ids[i % 2], suggestion_ids[(i + 1) % 2]
+                ballot = dict(ballot)
+                ballot[taker] = ballot.get(taker, 0) + 1
+                ballot[giver] -= 1
+                if not ballot[giver]:
+                    del ballot[giver]
+
+                statements[0] = 0
+                started = time.perf_counter()
+                write(db, picklejar_id, member_id, ballot)
+                timings.append((time.perf_counter() - started) * 1000)
+                counts.append(statements[0])
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+
+        if verify_tallies(db, picklejar_id):
+            raise RuntimeError(f"Tallies out of step after {size}-suggestion run")
+        return statistics.median(counts), statistics.median(timings)
+    finally:
+        db.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 50, 500])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--database-url", help="Defaults to a temporary SQLite file")
+    args = parser.parse_args(argv)
+
+    tmp_dir = None
+    database_url = args.database_url
+    if not database_url:
+        tmp_dir = tempfile.TemporaryDirectory()
+        database_url = f"sqlite:///{os.path.join(tmp_dir.name, 'bench.db')}"
+
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+
+    print(
+        f"{'suggestions':>11}  {'implementation':<16} "
+        f"{'statements':>10}  {'median ms':>9}"
+    )
+    try:
+        for size in args.sizes:
+            for name, write in IMPLEMENTATIONS.items():
+                statements, latency = run(
+                    session_factory, engine, size, args.rounds, write
+                )
+                print(f"{size:>11}  {name:<16} {statements:>10.0f}  {latency:>9.2f}")
+    finally:
+        engine.dispose()
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+Time importing a large group with bulk-join against one join per member.
+
+Usage (from the backend directory):
+    python -m benchmarks.bulk_join [--members 10000] [--single 500]
+                                   [--format json|csv] [--database-url URL]
+
+Drives the FastAPI `app` through httpx's ASGI transport. Imports
+`--members` new members into a jar with one bulk-join request, then imports
+the same list again (every row already joined), reading the streamed
+report line by line. For comparison, `--single` members join a second jar
+one request at a time, and the per-member time is extrapolated to
+`--members`.
+
+Without `--database-url` a temporary SQLite file is used.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+
+def member_list(count, fmt):
+    if fmt == "csv":
+        lines = ["phone_number,display_name"]
+        lines += [f"+1555{i:07d},Member {i}" for i in range(count)]
+        return "\n".join(lines).encode(), "text/csv"
+    members = [
+        {"phone_number": f"+1555{i:07d}", "display_name": f"Member {i}"}
+        for i in range(count)
+    ]
+    return json.dumps(members).encode(), "application/json"
+
+
+async def bulk_import(client, jar_id, body, content_type):
+    started = time.perf_counter()
+    first_line = None
+    summary = None
+    async with client.stream(
+        "POST",
+        f"/api/members/{jar_id}/bulk-join",
+        content=body,
+        headers={"Content-Type": content_type},
+    ) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            if first_line is None:
+                first_line = time.perf_counter() - started
+            summary = json.loads(line)
+    return time.perf_counter() - started, first_line, summary["summary"]
+
+
+async def run(args):
+    import httpx
+    from database import Base, engine
+    from main import app
+
+    Base.metadata.create_all(bind=engine)
+    body, content_type = member_list(args.members, args.format)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as client:
+        jar = await client.post("/api/picklejars/", json={"title": "Bulk import"})
+        jar_id = jar.json()["id"]
+        for label in ("new members", "already joined"):
+            seconds, first_line, summary = await bulk_import(
+                client, jar_id, body, content_type
+            )
+            counts = ", ".join(f"{k} {v}" for k, v in summary.items() if v)
+            print(
+                f"bulk-join {label:<15} {seconds * 1000:9.1f} ms "
+                f"(first line after {first_line * 1000:.1f} ms; {counts})"
+            )
+
+        jar = await client.post("/api/picklejars/", json={"title": "One by one"})
+        jar_id = jar.json()["id"]
+        started = time.perf_counter()
+        for i in range(args.single):
+            response = await client.post(
+                f"/api/members/{jar_id}/join",
+                json={"phone_number": f"+1555{i:07d}", "display_name": f"Member {i}"},
+            )
+            response.raise_for_status()
+        per_member = (time.perf_counter() - started) / args.single
+        print(
+            f"join one by one           {per_member * 1000:9.2f} ms per member, "
+            f"~{per_member * args.members:.1f} s for {args.members}"
+        )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--members", type=int, default=10000)
+    parser.add_argument("--single", type=int, default=500)
+    parser.add_argument("--format", choices=("json", "csv"), default="json")
+    parser.add_argument("--database-url", help="Defaults to a temporary SQLite file")
+    args = parser.parse_args(argv)
+
+    tmp_dir = None
+    database_url = args.database_url
+    if not database_url:
+        tmp_dir = tempfile.TemporaryDirectory()
+        database_url = f"sqlite:///{os.path.join(tmp_dir.name, 'bulk.db')}"
+
+    # The app reads its settings at import time
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.environ["DEADLINE_SCHEDULER_ENABLED"] = "false"
+    os.environ.setdefault("BULK_JOIN_MAX_ROWS", str(args.members))
+
+    try:
+        asyncio.run(run(args))
+    finally:
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
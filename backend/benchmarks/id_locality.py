@@ -0,0 +1,163 @@
+"""
+Compare insert throughput for random (uuid4) and time-ordered (UUIDv7) IDs.
+
+Usage (from the backend directory):
+    python -m benchmarks.id_locality [--rows 1000000] [--batch-size 1000]
+                                     [--database-url URL]
+
+Inserts vote-shaped rows (a primary key, two indexed foreign key columns
+and a few values) in committed batches, once per ID scheme, into a fresh
+table each time. As in real traffic, a new member and suggestion ID is
+drawn every few rows, so foreign keys point at recently created parents.
+
+With uuid4 every insert lands on a random page of each index. Once the
+indexes outgrow the page cache, most inserts have to read a page first,
+so throughput falls as the table grows. UUIDv7 keys always append to the
+right edge of the indexes. The report shows overall and final-10%
+throughput, plus the size of the table and its indexes.
+
+Without `--database-url` each scheme gets its own temporary SQLite file.
+On PostgreSQL, the native uuid storage used by the models is measured as
+a third scheme.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+from models import UUIDString, generate_uuid
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    create_engine,
+    text,
+)
+
+TABLE_NAME = "id_locality_votes"
+
+
+def uuid4_string():
+    """The previous generate_uuid."""
+    return str(uuid.uuid4())
+
+
+# (name, id generator, column type)
+SCHEMES = [
+    ("uuid4 text", uuid4_string, String),
+    ("uuid7 text", generate_uuid, String),
+]
+POSTGRES_SCHEMES = [("uuid7 native", generate_uuid, UUIDString)]
+
+
+def _table(id_type):
+    metadata = MetaData()
+    table = Table(
+        TABLE_NAME,
+        metadata,
+        Column("id", id_type, primary_key=True),
+        Column("member_id", id_type, nullable=False),
+        Column("suggestion_id", id_type, nullable=False),
+        Column("picklejar_id", String, nullable=False),
+        Column("points", Integer, nullable=False),
+        Column("created_at", DateTime),
+        Index(f"ix_{TABLE_NAME}_member", "member_id", "picklejar_id"),
+        Index(f"ix_{TABLE_NAME}_suggestion", "suggestion_id"),
+    )
+    return metadata, table
+
+
+def _size_bytes(connection):
+    if connection.dialect.name == "postgresql":
+        return connection.execute(
+            text(f"SELECT pg_total_relation_size('{TABLE_NAME}')")
+        ).scalar()
+    page_count = connection.execute(text("PRAGMA page_count")).scalar()
+    page_size = connection.execute(text("PRAGMA page_size")).scalar()
+    return page_count * page_size
+
+
+def run(engine, generate, id_type, rows, batch_size):
+    metadata, table = _table(id_type)
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+
+    batch_seconds = []
+    member_id = suggestion_id = None
+    for start in range(0, rows, batch_size):
+        batch = []
+        for i in range(start, min(start + batch_size, rows)):
+            # A new member every 3 votes and a new suggestion every 10
+            if i % 3 == 0:
+                member_id = generate()
+            if i % 10 == 0:
+                suggestion_id = generate()
+            batch.append(
+                {
+                    "id": generate(),
+                    "member_id": member_id,
+                    "suggestion_id": suggestion_id,
+                    "picklejar_id": "benchmark",
+                    "points": i % 7,
+                    "created_at": None,
+                }
+            )
+        started = time.perf_counter()
+        with engine.begin() as connection:
+            connection.execute(table.insert(), batch)
+        batch_seconds.append(time.perf_counter() - started)
+
+    with engine.connect() as connection:
+        size = _size_bytes(connection)
+    metadata.drop_all(engine)
+
+    tail = batch_seconds[-max(1, len(batch_seconds) // 10) :]
+    tail_rows = min(rows, len(tail) * batch_size)
+    return {
+        "rows_per_second": rows / sum(batch_seconds),
+        "final_rows_per_second": tail_rows / sum(tail),
+        "size_mb": size / 1e6,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--database-url", help="Defaults to temporary SQLite files")
+    args = parser.parse_args(argv)
+
+    schemes = list(SCHEMES)
+    if args.database_url and args.database_url.startswith("postgresql"):
+        schemes += POSTGRES_SCHEMES
+
+    print(
+        f"{'scheme':<14} {'rows/s':>10} {'final 10% rows/s':>18} {'size MB':>9}"
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, generate, id_type in schemes:
+            url = args.database_url or "sqlite:///" + os.path.join(
+                tmp_dir, f"{name.replace(' ', '_')}.db"
+            )
+            engine = create_engine(url)
+            try:
+                result = run(engine, generate, id_type, args.rows, args.batch_size)
+            finally:
+                engine.dispose()
+            print(
+                f"{name:<14} {result['rows_per_second']:>10.0f} "
+                f"{result['final_rows_per_second']:>18.0f} "
+                f"{result['size_mb']:>9.1f}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""
+Compare join implementations under a burst of joins to one freshly shared jar.
+
+Usage (from the backend directory):
+    python -m benchmarks.join_storm [--joins 2000] [--threads 16]
+                                    [--repeat 0.2] [--database-url URL]
+
+`--threads` threads join members to a new jar as fast as they can, once
+per implementation. A `--repeat` fraction of the joins reuse a phone
+number that is joined at the same moment by another thread (a double tap,
+or the same person on two devices). Reported per implementation: join
+latency (p50/p99, including the commit), throughput, statements per join,
+joins that failed and members stored per phone number.
+
+The previous join (look up the member, insert if missing, commit, refresh)
+is kept here for comparison. Without `--database-url` a temporary SQLite
+file is used.
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from database import Base
+from joins import JoinRequest, upsert_members
+from models import Member, PickleJar
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import sessionmaker
+from versioning import bump_version
+
+
+def select_then_insert(db, picklejar_id, phone_number, display_name):
+    """The previous join_picklejar write path."""
+    db_picklejar = db.query(PickleJar).filter(PickleJar.id == picklejar_id).first()
+    existing_member = (
+        db.query(Member)
+        .filter(
+            Member.picklejar_id == picklejar_id,
+            Member.phone_number == phone_number,
+        )
+        .first()
+    )
+    if existing_member:
+        if display_name:
+            existing_member.display_name = display_name
+        if not db_picklejar.creator_phone:
+            db_picklejar.creator_phone = existing_member.phone_number
+        bump_version(db, picklejar_id)
+        db.commit()
+        db.refresh(existing_member)
+        return existing_member.id
+
+    if not db_picklejar.creator_phone:
+        db_picklejar.creator_phone = phone_number
+    db_member = Member(
+        picklejar_id=picklejar_id, phone_number=phone_number, display_name=display_name
+    )
+    db.add(db_member)
+    bump_version(db, picklejar_id)
+    db.commit()
+    db.refresh(db_member)
+    return db_member.id
+
+
+def upsert(db, picklejar_id, phone_number, display_name):
+    member, _, changed = upsert_members(
+        db, picklejar_id, [JoinRequest(phone_number, display_name)]
+    )[0]
+    if changed:
+        bump_version(
+            db,
+            picklejar_id,
+            creator_phone=func.coalesce(PickleJar.creator_phone, member.phone_number),
+        )
+    db.commit()
+    return member.id
+
+
+IMPLEMENTATIONS = {"select+insert": select_then_insert, "upsert": upsert}
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def phone_numbers(joins, repeat, rng):
+    """Phone numbers in join order, a `repeat` fraction next to a twin."""
+    phones = []
+    while len(phones) < joins:
+        phone = f"+1555{len(phones):07d}"
+        phones.append(phone)
+        if rng.random() < repeat:
+            phones.append(phone)
+    return phones[:joins]
+
+
+def run(session_factory, engine, join, phones, threads):
+    db = session_factory()
+    picklejar = PickleJar(title="Join storm", status="setup")
+    db.add(picklejar)
+    db.commit()
+    picklejar_id = picklejar.id
+    db.close()
+
+    statements = [0]
+
+    def count(*args):
+        statements[0] += 1
+
+    latencies = []
+    failures = [0]
+    lock = threading.Lock()
+    next_index = [0]
+
+    def worker():
+        db = session_factory()
+        try:
+            while True:
+                with lock:
+                    index = next_index[0]
+                    next_index[0] += 1
+                if index >= len(phones):
+                    return
+                started = time.perf_counter()
+                try:
+                    join(db, picklejar_id, phones[index], f"Member {index}")
+                except Exception:
+                    db.rollback()
+                    with lock:
+                        failures[0] += 1
+                    continue
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+        finally:
+            db.close()
+
+    event.listen(engine, "before_cursor_execute", count)
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    try:
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+    finally:
+        wall_seconds = time.perf_counter() - started
+        event.remove(engine, "before_cursor_execute", count)
+
+    db = session_factory()
+    try:
+        stored = Counter(
+            db.execute(
+                select(Member.phone_number).where(Member.picklejar_id == picklejar_id)
+            ).scalars()
+        )
+        creator_phone = db.get(PickleJar, picklejar_id).creator_phone
+    finally:
+        db.close()
+
+    latencies.sort()
+    return {
+        "p50_ms": 1000 * percentile(latencies, 0.50),
+        "p99_ms": 1000 * percentile(latencies, 0.99),
+        "throughput": len(latencies) / wall_seconds,
+        "statements": statements[0] / len(phones),
+        "failed": failures[0],
+        "duplicates": sum(count - 1 for count in stored.values()),
+        "missing": len(set(phones) - set(stored)),
+        "creator_set": creator_phone is not None,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--joins", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--repeat", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database-url", help="Defaults to a temporary SQLite file")
+    args = parser.parse_args(argv)
+
+    tmp_dir = None
+    database_url = args.database_url
+    if not database_url:
+        tmp_dir = tempfile.TemporaryDirectory()
+        database_url = f"sqlite:///{os.path.join(tmp_dir.name, 'bench.db')}"
+
+    engine = create_engine(
+        database_url, pool_size=args.threads, max_overflow=0, pool_timeout=60
+    )
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    phones = phone_numbers(args.joins, args.repeat, random.Random(args.seed))
+
+    print(
+        f"{len(phones)} joins ({len(phones) - len(set(phones))} repeated numbers) "
+        f"from {args.threads} threads"
+    )
+    print(
+        f"{'implementation':<14} {'p50 ms':>8} {'p99 ms':>8} {'joins/s':>8} "
+        f"{'stmts':>6} {'failed':>6} {'dupes':>6} {'missing':>7} {'creator':>7}"
+    )
+    try:
+        for name, join in IMPLEMENTATIONS.items():
+            result = run(session_factory, engine, join, phones, args.threads)
+            print(
+                f"{name:<14} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+                f"{result['throughput']:>8.1f} {result['statements']:>6.1f} "
+                f"{result['failed']:>6} {result['duplicates']:>6} "
+                f"{result['missing']:>7} {'yes' if result['creator_set'] else 'no':>7}"
+            )
+    finally:
+        engine.dispose()
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
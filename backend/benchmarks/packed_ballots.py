@@ -0,0 +1,169 @@
+"""
+Compare vote rows with packed ballots: storage size and tally time.
+
+Usage (from the backend directory):
+    python -m benchmarks.packed_ballots [--jars 2000] [--members 30]
+                                        [--suggestions 20] [--picks 4]
+                                        [--repeat 200] [--seed 1]
+
+Writes the same synthetic ballots twice into temporary SQLite files: once
+as `votes` rows (BALLOT_STORAGE=rows) and once as `packed_ballots` rows
+(BALLOT_STORAGE=packed). Each member spreads their points over `--picks`
+suggestions.
+
+Reports the file size per ballot, then the time to total one jar's
+ballots: a SUM/COUNT ... GROUP BY over the vote rows of its suggestions
+(through ix_votes_suggestion) versus reading its packed rows and summing
+them with `ballots.decode_totals`.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from ballots import decode_totals, encode_entries
+from models import PackedBallot, Vote, generate_uuid
+from sqlalchemy import create_engine, func, select
+
+
+def _ballots(args):
+    rng = random.Random(args.seed)
+    picks = min(args.picks, args.suggestions)
+    for jar_number in range(args.jars):
+        jar_id = f"jar{jar_number:07d}"
+        suggestion_ids = [generate_uuid() for _ in range(args.suggestions)]
+        for _ in range(args.members):
+            ordinals = rng.sample(range(args.suggestions), picks)
+            ballot = {ordinal: rng.randint(1, 5) for ordinal in ordinals}
+            yield jar_id, generate_uuid(), suggestion_ids, ballot
+
+
+def _file_size(engine):
+    with engine.connect() as connection:
+        page_count = connection.exec_driver_sql("PRAGMA page_count").scalar()
+        page_size = connection.exec_driver_sql("PRAGMA page_size").scalar()
+    return page_count * page_size
+
+
+def load(rows_engine, packed_engine, args):
+    vote_table = Vote.__table__
+    ballot_table = PackedBallot.__table__
+    vote_table.metadata.create_all(rows_engine, tables=[vote_table])
+    ballot_table.metadata.create_all(packed_engine, tables=[ballot_table])
+
+    now = datetime.utcnow()
+    votes, packed = [], []
+    jar_suggestions = {}
+
+    def flush():
+        with rows_engine.begin() as connection:
+            connection.execute(vote_table.insert(), votes)
+        with packed_engine.begin() as connection:
+            connection.execute(ballot_table.insert(), packed)
+        votes.clear()
+        packed.clear()
+
+    for jar_id, member_id, suggestion_ids, ballot in _ballots(args):
+        jar_suggestions[jar_id] = suggestion_ids
+        votes.extend(
+            {
+                "id": generate_uuid(),
+                "member_id": member_id,
+                "suggestion_id": suggestion_ids[ordinal],
+                "picklejar_id": jar_id,
+                "points": points,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for ordinal, points in ballot.items()
+        )
+        packed.append(
+            {
+                "picklejar_id": jar_id,
+                "member_id": member_id,
+                "entries": encode_entries(ballot),
+                "created_at": now,
+                "updated_at": now,
+            }
+        )
+        if len(packed) >= 5000:
+            flush()
+    if packed:
+        flush()
+    return jar_suggestions
+
+
+def time_tallies(rows_engine, packed_engine, jar_suggestions, args):
+    rng = random.Random(args.seed + 1)
+    jar_ids = rng.choices(sorted(jar_suggestions), k=args.repeat)
+
+    timings = {}
+    with rows_engine.connect() as connection:
+        started = time.perf_counter()
+        for jar_id in jar_ids:
+            connection.execute(
+                select(Vote.suggestion_id, func.sum(Vote.points), func.count(Vote.id))
+                .where(Vote.suggestion_id.in_(jar_suggestions[jar_id]))
+                .group_by(Vote.suggestion_id)
+            ).all()
+        timings["rows"] = (time.perf_counter() - started) / len(jar_ids)
+
+    with packed_engine.connect() as connection:
+        started = time.perf_counter()
+        for jar_id in jar_ids:
+            blobs = connection.execute(
+                select(PackedBallot.entries).where(PackedBallot.picklejar_id == jar_id)
+            ).scalars()
+            decode_totals(blobs, args.suggestions)
+        timings["packed"] = (time.perf_counter() - started) / len(jar_ids)
+    return timings
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--jars", type=int, default=2000)
+    parser.add_argument("--members", type=int, default=30)
+    parser.add_argument("--suggestions", type=int, default=20)
+    parser.add_argument("--picks", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    ballots = args.jars * args.members
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        rows_engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'rows.db')}")
+        packed_engine = create_engine(
+            f"sqlite:///{os.path.join(tmp_dir, 'packed.db')}"
+        )
+        try:
+            jar_suggestions = load(rows_engine, packed_engine, args)
+            sizes = {
+                "rows": _file_size(rows_engine),
+                "packed": _file_size(packed_engine),
+            }
+            timings = time_tallies(
+                rows_engine, packed_engine, jar_suggestions, args
+            )
+        finally:
+            rows_engine.dispose()
+            packed_engine.dispose()
+
+    print(
+        f"{ballots} ballots of {min(args.picks, args.suggestions)} votes "
+        f"in {args.jars} jars"
+    )
+    print(f"{'storage':<8} {'bytes/ballot':>13} {'jar tally ms':>13}")
+    for name in ("rows", "packed"):
+        print(
+            f"{name:<8} {sizes[name] / ballots:>13.0f} "
+            f"{1000 * timings[name]:>13.3f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
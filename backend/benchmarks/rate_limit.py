@@ -0,0 +1,99 @@
+"""
+Measure the per-request overhead of the rate-limit middleware.
+
+Usage (from the backend directory):
+    python -m benchmarks.rate_limit [--requests 100000] [--clients 1000]
+
+Drives a no-op ASGI app directly, with and without `RateLimitMiddleware`,
+so the difference is the middleware's own cost. Requests rotate over
+`--clients` client addresses and a handful of jars, mixing reads and
+writes, with budgets high enough that nothing is rejected. A final run
+with a tiny budget reports the cost of rejecting a request.
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+from rate_limit import InMemoryTokenBucketStore, RateLimitMiddleware
+
+
+async def noop_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def send(message):
+    pass
+
+
+def build_scopes(count, clients):
+    scopes = []
+    for i in range(count):
+        jar_id = f"jar{i % 16:05d}"
+        method, path = (
+            ("POST", f"/api/votes/{jar_id}/vote")
+            if i % 5 == 0
+            else ("GET", f"/api/picklejars/{jar_id}")
+        )
+        scopes.append(
+            {
+                "type": "http",
+                "method": method,
+                "path": path,
+                "headers": [],
+                "client": (f"10.0.{(i % clients) // 256}.{(i % clients) % 256}", 5000),
+            }
+        )
+    return scopes
+
+
+async def drive(app, scopes) -> float:
+    started = time.perf_counter()
+    for scope in scopes:
+        await app(scope, receive, send)
+    return time.perf_counter() - started
+
+
+def limited(requests, period=60):
+    return RateLimitMiddleware(
+        noop_app,
+        InMemoryTokenBucketStore(),
+        read_requests=requests,
+        write_requests=requests,
+        jar_read_requests=requests,
+        jar_write_requests=requests,
+        period_seconds=period,
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100000)
+    parser.add_argument("--clients", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    scopes = build_scopes(args.requests, args.clients)
+    # Warm up both paths before timing
+    asyncio.run(drive(noop_app, scopes[:1000]))
+    asyncio.run(drive(limited(10**9), scopes[:1000]))
+
+    baseline = asyncio.run(drive(noop_app, scopes))
+    allowed = asyncio.run(drive(limited(10**9), scopes))
+    rejected = asyncio.run(drive(limited(1, period=10**6), scopes))
+
+    per_request = 1e6 / args.requests
+    print(f"no middleware:      {baseline * per_request:6.2f} us/request")
+    print(f"allowed requests:   {allowed * per_request:6.2f} us/request")
+    print(f"rejected requests:  {rejected * per_request:6.2f} us/request")
+    print(f"middleware overhead: {(allowed - baseline) * per_request:5.2f} us/request")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""
+Time each scoring rule of the tally engine on a synthetic jar.
+
+Usage (from the backend directory):
+    python -m benchmarks.scoring [--members 10000] [--suggestions 1000]
+                                 [--picks 5] [--repeat 20] [--seed 1]
+
+Builds a `BallotMatrix` in memory (no database) where every member spreads
+points over `--picks` suggestions, drawn so a few suggestions are far more
+popular than the rest, as in real jars. Then times `rank_suggestions` for
+every registered rule and prints the median and worst time per rule.
+Loading the ballots from the database is not included.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+
+import numpy as np
+from scoring import RULES, BallotMatrix, rank_suggestions
+
+
+def synthetic_ballots(members, suggestions, picks, seed):
+    rng = np.random.default_rng(seed)
+    popularity = rng.pareto(1.2, suggestions) + 1
+    popularity /= popularity.sum()
+    matrix = np.zeros((members, suggestions), dtype=np.int32)
+    rows = np.arange(members)
+    for _ in range(picks):
+        columns = rng.choice(suggestions, members, p=popularity)
+        matrix[rows, columns] += rng.integers(1, 5, members, dtype=np.int32)
+    return BallotMatrix.from_dense([str(row) for row in rows], matrix)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--members", type=int, default=10000)
+    parser.add_argument("--suggestions", type=int, default=1000)
+    parser.add_argument("--picks", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    ballots = synthetic_ballots(args.members, args.suggestions, args.picks, args.seed)
+    points = np.bincount(
+        ballots.columns, weights=ballots.points, minlength=args.suggestions
+    ).astype(np.int64)
+    vote_counts = np.bincount(ballots.columns, minlength=args.suggestions)
+
+    print(
+        f"{args.members} members x {args.suggestions} suggestions, "
+        f"{len(ballots.rows)} votes"
+    )
+    print(f"{'rule':<10} {'median ms':>10} {'max ms':>8}  winner")
+    for name, rule in RULES.items():
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            ranking = rank_suggestions(rule, points, vote_counts, ballots)
+            timings.append(time.perf_counter() - started)
+        print(
+            f"{name:<10} {1000 * statistics.median(timings):>10.2f} "
+            f"{1000 * max(timings):>8.2f}  {ranking.order[0]}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
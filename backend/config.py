@@ -16,6 +16,8 @@ class Settings(BaseSettings):
 
     # Database
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./picklejar.db")
+    # Serve routes with async handlers on an async engine (aiosqlite/asyncpg)
+    ASYNC_DATABASE: bool = os.getenv("ASYNC_DATABASE", "false").lower() == "true"
 
     # CORS - Allow production domains
     CORS_ORIGINS: str = os.getenv(
@@ -53,10 +55,89 @@ class Settings(BaseSettings):
     DEFAULT_MAX_SUGGESTIONS: int = 1
     MAX_PICKLEJAR_DURATION_DAYS: int = 7
 
-    # Rate Limiting (for future use)
-    RATE_LIMIT_ENABLED: bool = False
-    RATE_LIMIT_REQUESTS: int = 100
-    RATE_LIMIT_PERIOD: int = 60  # seconds
+    # Deadline scheduler (advances phases when deadlines pass)
+    DEADLINE_SCHEDULER_ENABLED: bool = (
+        os.getenv("DEADLINE_SCHEDULER_ENABLED", "true").lower() == "true"
+    )
+    DEADLINE_RECHECK_SECONDS: int = int(os.getenv("DEADLINE_RECHECK_SECONDS", "60"))
+
+    # HTTP caching: how long clients may reuse a completed jar's results when
+    # the request pins the jar version (GET /results?version=N)
+    COMPLETED_JAR_MAX_AGE: int = int(os.getenv("COMPLETED_JAR_MAX_AGE", "86400"))
+
+    # Query monitoring: log statements slower than SLOW_QUERY_MS (0 disables)
+    # and flag requests that run one statement more than QUERY_REPEAT_LIMIT
+    # times. With QUERY_BUDGET_STRICT (tests/CI) such requests fail instead.
+    SLOW_QUERY_MS: float = float(os.getenv("SLOW_QUERY_MS", "200"))
+    QUERY_REPEAT_LIMIT: int = int(os.getenv("QUERY_REPEAT_LIMIT", "10"))
+    QUERY_BUDGET_STRICT: bool = (
+        os.getenv("QUERY_BUDGET_STRICT", "false").lower() == "true"
+    )
+
+    # Serve request, SQL and pool metrics at /metrics (Prometheus format)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+    # Jar cache: process-local LRU of PickleJar rows. Use the "sqlite"
+    # channel to share invalidations between workers on one host.
+    JAR_CACHE_ENABLED: bool = os.getenv("JAR_CACHE_ENABLED", "true").lower() == "true"
+    JAR_CACHE_SIZE: int = int(os.getenv("JAR_CACHE_SIZE", "1024"))
+    JAR_CACHE_TTL_SECONDS: float = float(os.getenv("JAR_CACHE_TTL_SECONDS", "30"))
+    JAR_CACHE_CHANNEL: str = os.getenv("JAR_CACHE_CHANNEL", "memory")
+    JAR_CACHE_SQLITE_PATH: str = os.getenv(
+        "JAR_CACHE_SQLITE_PATH", "./picklejar_cache.db"
+    )
+
+    # Rate Limiting: token buckets per client and per PickleJar, with
+    # separate read (GET/HEAD) and write budgets per RATE_LIMIT_PERIOD
+    RATE_LIMIT_ENABLED: bool = (
+        os.getenv("RATE_LIMIT_ENABLED", "false").lower() == "true"
+    )
+    RATE_LIMIT_REQUESTS: int = int(os.getenv("RATE_LIMIT_REQUESTS", "100"))
+    RATE_LIMIT_WRITE_REQUESTS: int = int(os.getenv("RATE_LIMIT_WRITE_REQUESTS", "30"))
+    RATE_LIMIT_JAR_REQUESTS: int = int(os.getenv("RATE_LIMIT_JAR_REQUESTS", "1000"))
+    RATE_LIMIT_JAR_WRITE_REQUESTS: int = int(
+        os.getenv("RATE_LIMIT_JAR_WRITE_REQUESTS", "300")
+    )
+    RATE_LIMIT_PERIOD: int = int(os.getenv("RATE_LIMIT_PERIOD", "60"))  # seconds
+    # Header carrying the real client IP behind a proxy (e.g. Fly-Client-IP);
+    # empty uses the connection's address
+    RATE_LIMIT_CLIENT_HEADER: str = os.getenv("RATE_LIMIT_CLIENT_HEADER", "")
+
+    # Live events (SSE): "memory" for a single process, "sqlite" to share
+    # events between workers on one host through a local file
+    EVENTS_BACKEND: str = os.getenv("EVENTS_BACKEND", "memory")
+    EVENTS_SQLITE_PATH: str = os.getenv("EVENTS_SQLITE_PATH", "./picklejar_events.db")
+    # How long a disconnected client can resume a jar's stream; idle jars'
+    # in-memory histories are dropped after this
+    EVENTS_RESUME_SECONDS: float = float(os.getenv("EVENTS_RESUME_SECONDS", "300"))
+
+    # Ballot storage: "rows" keeps one votes row per allocation; "packed"
+    # stores each member's ballot as one packed_ballots row (see ballots.py)
+    BALLOT_STORAGE: str = os.getenv("BALLOT_STORAGE", "rows")
+
+    # Member heartbeats: last_active times are buffered in memory and
+    # written in one batch every HEARTBEAT_FLUSH_SECONDS; beyond
+    # HEARTBEAT_MAX_PENDING buffered members, further heartbeats are dropped
+    HEARTBEAT_FLUSH_SECONDS: float = float(os.getenv("HEARTBEAT_FLUSH_SECONDS", "10"))
+    HEARTBEAT_MAX_PENDING: int = int(os.getenv("HEARTBEAT_MAX_PENDING", "100000"))
+
+    # Most rows, and body bytes, a single bulk-join request may import
+    BULK_JOIN_MAX_ROWS: int = int(os.getenv("BULK_JOIN_MAX_ROWS", "20000"))
+    BULK_JOIN_MAX_BYTES: int = int(os.getenv("BULK_JOIN_MAX_BYTES", "2097152"))
+
+    # Ballot ingestion: "direct" writes each ballot in its request; "queued"
+    # appends it to a local log that a background thread applies in batches
+    # (see ballot_queue.py)
+    BALLOT_INGESTION: str = os.getenv("BALLOT_INGESTION", "direct")
+    BALLOT_QUEUE_PATH: str = os.getenv("BALLOT_QUEUE_PATH", "./picklejar_ballots.db")
+    BALLOT_QUEUE_BATCH_SIZE: int = int(os.getenv("BALLOT_QUEUE_BATCH_SIZE", "500"))
+    BALLOT_QUEUE_FLUSH_MS: float = float(os.getenv("BALLOT_QUEUE_FLUSH_MS", "50"))
+
+    # Results: how suggestions are ranked ("points", "borda", "approval" or
+    # "irv"; see scoring.py). Approval counts ballots giving at least
+    # APPROVAL_THRESHOLD points.
+    SCORING_RULE: str = os.getenv("SCORING_RULE", "points")
+    APPROVAL_THRESHOLD: int = int(os.getenv("APPROVAL_THRESHOLD", "1"))
 
     # Feature Flags
     ENABLE_STRUCTURED_LOCATION: bool = (
@@ -1,6 +1,12 @@
+import logging
 import os
+import time
+from contextvars import ContextVar
+from typing import Optional
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from config import settings
@@ -32,10 +38,147 @@ engine = create_engine(
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def get_async_database_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto the matching async driver."""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    for prefix in ("postgresql+psycopg2://", "postgresql://"):
+        if url.startswith(prefix):
+            return url.replace(prefix, "postgresql+asyncpg://", 1)
+    return url
+
+
+# Async engine, only created when the app is configured to use it
+async_engine = None
+AsyncSessionLocal = None
+if settings.ASYNC_DATABASE:
+    async_engine = create_async_engine(
+        get_async_database_url(DATABASE_URL),
+        echo=settings.DEBUG,
+        **pool_config
+    )
+    # Objects stay loaded after commit: attribute refreshes can't run lazily
+    # once a response is being serialized outside the session's greenlet.
+    AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine, autoflush=False, expire_on_commit=False
+    )
+
 # Create Base class for models
 Base = declarative_base()
 
 
+def upsert_insert(db, table):
+    """
+    INSERT for `table` in the session's dialect, which supports
+    `on_conflict_do_update` (PostgreSQL and SQLite 3.24+).
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table)
+    if dialect == "sqlite":
+        return sqlite.insert(table)
+    raise NotImplementedError(f"Upserts are not supported on {dialect}")
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """Raised in strict mode when a request repeats one statement too often."""
+
+
+class RequestQueries:
+    """Statements run while handling one HTTP request, counted by SQL text."""
+
+    __slots__ = ("scope", "counts")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.counts = {}
+
+    @property
+    def route(self) -> str:
+        # The router stores the matched route in the scope once it resolves it
+        route = self.scope.get("route")
+        path = getattr(route, "path", None) or self.scope.get("path", "?")
+        return f"{self.scope.get('method', '')} {path}"
+
+
+_request_queries: ContextVar[Optional[RequestQueries]] = ContextVar(
+    "request_queries", default=None
+)
+
+
+def _format_parameters(parameters, limit: int = 500) -> str:
+    text = repr(parameters)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """
+    Log slow statements and flag statements repeated within one request.
+
+    A statement shape is its SQL text, which SQLAlchemy emits with bound
+    placeholders, so the same query for different rows counts as one shape.
+    """
+    elapsed_ms = (time.perf_counter() - context._query_started) * 1000
+    queries = _request_queries.get()
+
+    if settings.SLOW_QUERY_MS and elapsed_ms >= settings.SLOW_QUERY_MS:
+        logger.warning(
+            "Slow query (%.1f ms) in %s: %s | parameters: %s",
+            elapsed_ms,
+            queries.route if queries else "background task",
+            statement,
+            _format_parameters(parameters),
+        )
+
+    if queries is None or not settings.QUERY_REPEAT_LIMIT:
+        return
+    count = queries.counts.get(statement, 0) + 1
+    queries.counts[statement] = count
+    if count == settings.QUERY_REPEAT_LIMIT + 1:
+        message = (
+            f"Possible N+1 in {queries.route}: statement ran more than "
+            f"{settings.QUERY_REPEAT_LIMIT} times: {statement}"
+        )
+        if settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+def install_query_hooks(target_engine) -> None:
+    """Attach the slow-query log and repeated-statement check to an engine."""
+    event.listen(target_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(target_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+install_query_hooks(engine)
+if async_engine is not None:
+    install_query_hooks(async_engine.sync_engine)
+
+
+class QueryTrackingMiddleware:
+    """ASGI middleware giving each HTTP request its own statement counts."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _request_queries.set(RequestQueries(scope))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_queries.reset(token)
+
+
 # Dependency to get database session
 def get_db():
     """
@@ -52,3 +195,12 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """
+    Async counterpart of get_db, yielding an AsyncSession.
+    Only available when settings.ASYNC_DATABASE is enabled.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,427 @@
+"""
+Live PickleJar events, streamed to clients as Server-Sent Events.
+
+Handlers publish an event after they commit a change (status change, member
+joined, suggestion added, ballot submitted). `GET /api/picklejars/{id}/events`
+streams them to every open tab, so clients no longer poll the detail, member
+and results endpoints to notice changes.
+
+Events are stored by a pluggable backend:
+- `InMemoryEventBackend` (default) keeps a short history per jar in this
+  process.
+- `SQLiteEventBackend` writes events to a local SQLite file so several
+  uvicorn workers on the same host share one event stream. It is a local
+  stand-in for a shared broker such as Redis.
+
+Every payload is a full snapshot of what changed (status, participation
+counts, tallies), so a burst of events of the same type can be coalesced
+into the latest one without losing information. Building the participation
+and tally snapshots costs two aggregate queries, so while nobody is
+subscribed to a jar they are skipped and the event is stored with an empty
+payload; a client that resumes onto such an event reloads what it shows.
+
+A client resuming from an event the backend no longer has, or from an ID it
+never issued (e.g. one from before a restart of the in-memory backend), gets
+a `resync` event instead of a silently incomplete stream.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from config import settings
+from sqlalchemy.orm import Session
+from tallies import jar_tallies, participation_counts
+
+
+@dataclass(frozen=True)
+class JarEvent:
+    """A single change to a PickleJar."""
+
+    id: int
+    picklejar_id: str
+    type: str
+    data: dict
+
+
+class EventBackend:
+    """Storage for published events. Event IDs increase monotonically."""
+
+    # Whether publishes from other processes can appear without a local
+    # notification, in which case subscribers must poll.
+    shared = False
+
+    def append(self, picklejar_id: str, event_type: str, data: dict) -> JarEvent:
+        raise NotImplementedError
+
+    def events_since(self, picklejar_id: str, last_id: int) -> Optional[List[JarEvent]]:
+        """
+        Return events with an ID greater than `last_id`, oldest first.
+
+        Returns None when events after `last_id` have already been dropped
+        from the history, so the client must resync from the REST endpoints.
+        """
+        raise NotImplementedError
+
+    def latest_id(self, picklejar_id: str) -> int:
+        raise NotImplementedError
+
+    def prune(self, keep: Set[str], max_age: float) -> None:
+        """
+        Forget the history of jars not in `keep` whose latest event is older
+        than `max_age` seconds. Resuming from such a jar's events resyncs.
+        """
+
+
+class InMemoryEventBackend(EventBackend):
+    """
+    Per-process event history with a bounded number of events per jar.
+
+    IDs start from the boot time in microseconds, so they never repeat
+    across restarts and an ID from an earlier boot is older than every
+    event this process has.
+    """
+
+    def __init__(self, history_size: int = 100):
+        self.history_size = history_size
+        self._lock = threading.Lock()
+        self._next_id = time.time_ns() // 1000
+        # Events at or below the horizon are gone for jars without a history:
+        # they predate this boot or belonged to a pruned history
+        self._horizon = self._next_id - 1
+        self._history: Dict[str, deque] = {}
+        # Highest event ID evicted from each jar's history
+        self._evicted: Dict[str, int] = {}
+        # time.monotonic() of each jar's latest event
+        self._published_at: Dict[str, float] = {}
+
+    def append(self, picklejar_id, event_type, data):
+        with self._lock:
+            event = JarEvent(self._next_id, picklejar_id, event_type, data)
+            self._next_id += 1
+            history = self._history.get(picklejar_id)
+            if history is None:
+                history = self._start_history(picklejar_id)
+            if len(history) == history.maxlen:
+                self._evicted[picklejar_id] = history[0].id
+            history.append(event)
+            self._published_at[picklejar_id] = time.monotonic()
+            return event
+
+    def _start_history(self, picklejar_id: str) -> deque:
+        history = self._history[picklejar_id] = deque(maxlen=self.history_size)
+        self._evicted[picklejar_id] = self._horizon
+        self._published_at[picklejar_id] = time.monotonic()
+        return history
+
+    def events_since(self, picklejar_id, last_id):
+        with self._lock:
+            if last_id < self._evicted.get(picklejar_id, self._horizon):
+                return None
+            return [e for e in self._history.get(picklejar_id, ()) if e.id > last_id]
+
+    def latest_id(self, picklejar_id):
+        with self._lock:
+            history = self._history.get(picklejar_id)
+            if history:
+                return history[-1].id
+            return self._evicted.get(picklejar_id, self._horizon)
+
+    def prune(self, keep, max_age):
+        cutoff = time.monotonic() - max_age
+        with self._lock:
+            stale = [
+                jar_id
+                for jar_id, published_at in self._published_at.items()
+                if published_at < cutoff and jar_id not in keep
+            ]
+            if not stale:
+                return
+            # Pin the current horizon for subscribed jars without events yet,
+            # so raising it does not resync their streams
+            for jar_id in keep:
+                if jar_id not in self._history:
+                    self._start_history(jar_id)
+            for jar_id in stale:
+                history = self._history.pop(jar_id)
+                if history:
+                    self._horizon = max(self._horizon, history[-1].id)
+                del self._evicted[jar_id]
+                del self._published_at[jar_id]
+
+
+class SQLiteEventBackend(EventBackend):
+    """
+    Event history in a local SQLite file shared by every worker on a host.
+
+    Subscribers poll the file because other processes cannot notify them
+    directly. Each jar keeps its latest `history_size` events; the highest
+    trimmed ID is remembered so stale resumes can be detected.
+    """
+
+    shared = True
+
+    def __init__(self, path: str, history_size: int = 100):
+        self.path = path
+        self.history_size = history_size
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jar_events ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "picklejar_id TEXT NOT NULL, type TEXT NOT NULL, data TEXT NOT NULL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_jar_events_jar_id "
+            "ON jar_events (picklejar_id, id)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jar_event_trims ("
+            "picklejar_id TEXT PRIMARY KEY, evicted_id INTEGER NOT NULL)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def append(self, picklejar_id, event_type, data):
+        conn = self._connection()
+        encoded = json.dumps(data, default=str)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            event_id = conn.execute(
+                "INSERT INTO jar_events (picklejar_id, type, data) VALUES (?, ?, ?)",
+                (picklejar_id, event_type, encoded),
+            ).lastrowid
+            cutoff = conn.execute(
+                "SELECT id FROM jar_events WHERE picklejar_id = ? "
+                "ORDER BY id DESC LIMIT 1 OFFSET ?",
+                (picklejar_id, self.history_size),
+            ).fetchone()
+            if cutoff:
+                conn.execute(
+                    "DELETE FROM jar_events WHERE picklejar_id = ? AND id <= ?",
+                    (picklejar_id, cutoff[0]),
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO jar_event_trims (picklejar_id, evicted_id) "
+                    "VALUES (?, ?)",
+                    (picklejar_id, cutoff[0]),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return JarEvent(event_id, picklejar_id, event_type, data)
+
+    def _evicted_id(self, picklejar_id) -> int:
+        row = self._connection().execute(
+            "SELECT evicted_id FROM jar_event_trims WHERE picklejar_id = ?",
+            (picklejar_id,),
+        ).fetchone()
+        return row[0] if row else 0
+
+    def events_since(self, picklejar_id, last_id):
+        if last_id < self._evicted_id(picklejar_id):
+            return None
+        rows = self._connection().execute(
+            "SELECT id, type, data FROM jar_events "
+            "WHERE picklejar_id = ? AND id > ? ORDER BY id",
+            (picklejar_id, last_id),
+        ).fetchall()
+        return [JarEvent(row[0], picklejar_id, row[1], json.loads(row[2])) for row in rows]
+
+    def latest_id(self, picklejar_id):
+        row = self._connection().execute(
+            "SELECT MAX(id) FROM jar_events WHERE picklejar_id = ?", (picklejar_id,)
+        ).fetchone()
+        return row[0] or self._evicted_id(picklejar_id)
+
+
+def coalesce(events: List[JarEvent]) -> List[JarEvent]:
+    """Keep only the latest event of each type, in publication order."""
+    latest = {}
+    for event in events:
+        latest.pop(event.type, None)
+        latest[event.type] = event
+    return list(latest.values())
+
+
+def format_sse(event: JarEvent) -> str:
+    data = json.dumps(event.data, default=str, separators=(",", ":"))
+    return f"id: {event.id}\nevent: {event.type}\ndata: {data}\n\n"
+
+
+class EventBroker:
+    """
+    Publishes events to a backend and wakes up waiting subscribers.
+
+    Histories of jars nobody is subscribed to are pruned once their latest
+    event is older than `resume_seconds`, the time a disconnected client has
+    to resume without a resync.
+    """
+
+    def __init__(
+        self,
+        backend: EventBackend,
+        coalesce_seconds: float = 0.25,
+        keepalive_seconds: float = 15.0,
+        poll_seconds: float = 0.5,
+        resume_seconds: float = 300.0,
+    ):
+        self.backend = backend
+        self.coalesce_seconds = coalesce_seconds
+        self.keepalive_seconds = keepalive_seconds
+        self.poll_seconds = poll_seconds
+        self.resume_seconds = resume_seconds
+        self._lock = threading.Lock()
+        self._waiters: Dict[str, set] = defaultdict(set)
+        self._pruned_at = time.monotonic()
+
+    def publish(self, picklejar_id: str, event_type: str, data: dict) -> JarEvent:
+        """Store an event and wake this process's subscribers for the jar."""
+        event = self.backend.append(picklejar_id, event_type, data)
+        with self._lock:
+            waiters = list(self._waiters.get(picklejar_id, ()))
+            prune = time.monotonic() - self._pruned_at >= self.resume_seconds
+            if prune:
+                self._pruned_at = time.monotonic()
+                subscribed = set(self._waiters)
+        for loop, wakeup in waiters:
+            # Handlers may run in threadpool workers, so hop onto the loop
+            loop.call_soon_threadsafe(wakeup.set)
+        if prune:
+            self.backend.prune(subscribed, self.resume_seconds)
+        return event
+
+    async def _read(self, method, *args):
+        """Call a backend read, off the event loop if it does file I/O."""
+        if self.backend.shared:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    def has_subscribers(self, picklejar_id: str) -> bool:
+        """
+        Whether anyone may be streaming the jar. Always true for a shared
+        backend, whose subscribers may be in other processes.
+        """
+        if self.backend.shared:
+            return True
+        with self._lock:
+            return picklejar_id in self._waiters
+
+    def _subscribe(self, picklejar_id: str):
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._waiters[picklejar_id].add(waiter)
+        return waiter
+
+    def _unsubscribe(self, picklejar_id: str, waiter) -> None:
+        with self._lock:
+            self._waiters[picklejar_id].discard(waiter)
+            if not self._waiters[picklejar_id]:
+                del self._waiters[picklejar_id]
+
+    async def stream(
+        self, picklejar_id: str, last_event_id: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """
+        Yield SSE frames for a jar, starting after `last_event_id`.
+
+        Without a `last_event_id` only new events are sent. When the client
+        resumes from an event that is no longer in the history, or from an
+        ID past the latest one, a `resync` event tells it to reload the jar
+        from the REST endpoints.
+        """
+        yield f"retry: {int(self.poll_seconds * 4000)}\n\n"
+
+        latest_id = await self._read(self.backend.latest_id, picklejar_id)
+        cursor = last_event_id
+        if cursor is None:
+            cursor = latest_id
+        elif cursor > latest_id:
+            # Not an ID this backend issued, e.g. one from before a restart
+            cursor = latest_id
+            yield format_sse(JarEvent(cursor, picklejar_id, "resync", {}))
+
+        _, wakeup = waiter = self._subscribe(picklejar_id)
+        idle_since = time.monotonic()
+        try:
+            while True:
+                # Cleared before reading so a publish during the read is not missed
+                wakeup.clear()
+                events = await self._read(
+                    self.backend.events_since, picklejar_id, cursor
+                )
+                if events is None:
+                    cursor = await self._read(self.backend.latest_id, picklejar_id)
+                    yield format_sse(JarEvent(cursor, picklejar_id, "resync", {}))
+                    continue
+
+                if events:
+                    for event in coalesce(events):
+                        yield format_sse(event)
+                    cursor = events[-1].id
+                    idle_since = time.monotonic()
+
+                if time.monotonic() - idle_since >= self.keepalive_seconds:
+                    yield ": keepalive\n\n"
+                    idle_since = time.monotonic()
+
+                timeout = self.keepalive_seconds
+                if self.backend.shared:
+                    timeout = self.poll_seconds
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    continue
+                # Let the rest of a burst arrive so it goes out as one frame per type
+                await asyncio.sleep(self.coalesce_seconds)
+        finally:
+            self._unsubscribe(picklejar_id, waiter)
+
+
+def _create_backend() -> EventBackend:
+    if settings.EVENTS_BACKEND == "sqlite":
+        return SQLiteEventBackend(settings.EVENTS_SQLITE_PATH)
+    return InMemoryEventBackend()
+
+
+broker = EventBroker(_create_backend(), resume_seconds=settings.EVENTS_RESUME_SECONDS)
+
+
+def publish(picklejar_id: str, event_type: str, data: dict) -> None:
+    """Publish an event for a PickleJar. Call after the change is committed."""
+    broker.publish(picklejar_id, event_type, data)
+
+
+def publish_status(picklejar_id: str, new_status: str) -> None:
+    publish(picklejar_id, "status", {"status": new_status})
+
+
+def publish_participation(
+    db: Session, picklejar_id: str, event_type: str, include_tallies: bool = False
+) -> None:
+    """
+    Publish a participation snapshot (and optionally suggestion tallies).
+
+    Used for member, suggestion and ballot events so each event carries the
+    current counts clients would otherwise re-fetch. Without subscribers
+    the queries are skipped and the event carries no snapshot.
+    """
+    if not broker.has_subscribers(picklejar_id):
+        publish(picklejar_id, event_type, {})
+        return
+    data = {"participation": participation_counts(db, picklejar_id)}
+    if include_tallies:
+        data["tallies"] = jar_tallies(db, picklejar_id)
+    publish(picklejar_id, event_type, data)
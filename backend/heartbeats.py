@@ -0,0 +1,186 @@
+"""
+Write-coalescing buffer for `Member.last_active`.
+
+Looking up a member's session, joining, renaming, suggesting and voting all
+mark the member as active. Instead of writing the column in the request's
+transaction, handlers call `heartbeats.record`, which keeps only the latest
+time per member in memory. A daemon thread flushes the buffer every
+HEARTBEAT_FLUSH_SECONDS with one executemany UPDATE, and `stop` flushes
+whatever is left at shutdown. Session lookups therefore never write.
+
+The UPDATE only moves `last_active` forward, so flushes from several
+workers, or a flush that lands after a newer write, never set it back.
+Heartbeats are best effort: when more than HEARTBEAT_MAX_PENDING members
+are waiting, heartbeats for further members are dropped and counted, and a
+failed flush puts its heartbeats back into the buffer. `stats` reports the
+pending and dropped counts and the flush lag (how long the oldest heartbeat
+waited), which are exported at /metrics.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+from config import settings
+from database import SessionLocal
+from models import Member
+from sqlalchemy import bindparam, or_
+
+logger = logging.getLogger(__name__)
+
+
+class HeartbeatBuffer:
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        flush_seconds: float = 10.0,
+        max_pending: int = 100000,
+        clock: Callable[[], datetime] = datetime.utcnow,
+    ):
+        self.session_factory = session_factory
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.clock = clock
+        # member_id -> (last seen, monotonic time first buffered)
+        self._pending: Dict[str, Tuple[datetime, float]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+        self.recorded = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.flush_failures = 0
+        self.rows_written = 0
+        self.last_flush_lag = 0.0
+        self.max_flush_lag = 0.0
+
+    def record(self, member_id: str, seen_at: Optional[datetime] = None) -> datetime:
+        """Note that a member was active and return the recorded time."""
+        seen_at = seen_at or self.clock()
+        with self._lock:
+            self.recorded += 1
+            self._buffer(str(member_id), seen_at, time.monotonic())
+        return seen_at
+
+    def _buffer(self, member_id: str, seen_at: datetime, since: float) -> None:
+        # Caller holds self._lock
+        current = self._pending.get(member_id)
+        if current is None:
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pending[member_id] = (seen_at, since)
+        else:
+            self._pending[member_id] = (
+                max(current[0], seen_at),
+                min(current[1], since),
+            )
+
+    def flush(self) -> int:
+        """Write every buffered heartbeat in one transaction; return the count."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+
+            oldest = min(since for _, since in batch.values())
+            member_table = Member.__table__
+            db = self.session_factory()
+            try:
+                db.execute(
+                    member_table.update()
+                    .where(
+                        member_table.c.id == bindparam("member_id"),
+                        or_(
+                            member_table.c.last_active.is_(None),
+                            member_table.c.last_active < bindparam("seen_at"),
+                        ),
+                    )
+                    .values(last_active=bindparam("seen_at")),
+                    [
+                        {"member_id": member_id, "seen_at": seen_at}
+                        for member_id, (seen_at, _) in batch.items()
+                    ],
+                )
+                db.commit()
+            except Exception:
+                db.rollback()
+                with self._lock:
+                    self.flush_failures += 1
+                    for member_id, (seen_at, since) in batch.items():
+                        self._buffer(member_id, seen_at, since)
+                raise
+            finally:
+                db.close()
+
+            lag = time.monotonic() - oldest
+            with self._lock:
+                self.flushes += 1
+                self.rows_written += len(batch)
+                self.last_flush_lag = lag
+                self.max_flush_lag = max(self.max_flush_lag, lag)
+            return len(batch)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                if not self._stopping:
+                    self._condition.wait(self.flush_seconds)
+                stopping = self._stopping
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to flush member heartbeats")
+            if stopping:
+                return
+
+    def start(self) -> None:
+        """Start flushing in the background."""
+        self._stopping = False
+        self._thread = threading.Thread(
+            target=self._run, name="heartbeat-flusher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread after a final flush."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        else:
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to flush member heartbeats")
+
+    def stats(self) -> dict:
+        with self._lock:
+            oldest = min((since for _, since in self._pending.values()), default=None)
+            return {
+                "pending": len(self._pending),
+                "oldest_pending_seconds": (
+                    time.monotonic() - oldest if oldest is not None else 0.0
+                ),
+                "recorded": self.recorded,
+                "dropped": self.dropped,
+                "flushes": self.flushes,
+                "flush_failures": self.flush_failures,
+                "rows_written": self.rows_written,
+                "last_flush_lag_seconds": self.last_flush_lag,
+                "max_flush_lag_seconds": self.max_flush_lag,
+            }
+
+
+heartbeats = HeartbeatBuffer(
+    flush_seconds=settings.HEARTBEAT_FLUSH_SECONDS,
+    max_pending=settings.HEARTBEAT_MAX_PENDING,
+)
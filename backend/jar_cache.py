@@ -0,0 +1,282 @@
+"""
+Process-local cache of PickleJar rows.
+
+Almost every endpoint starts by loading its jar by primary key, often
+several times per page view. `get_jar` serves an immutable `JarSnapshot`
+of the row from a bounded LRU cache with a TTL instead.
+
+Cached entries are never updated in place. Handlers that change a jar call
+`bump_version` (see `versioning.py`), which marks the jar on the session;
+once that session commits, the jar is dropped from the cache and published
+on an invalidation channel so other workers drop it as well:
+- `InMemoryInvalidationChannel` (default) delivers within this process and
+  is what tests use.
+- `SQLiteInvalidationChannel` shares invalidations between workers on one
+  host through a local file. Every lookup first applies invalidations
+  published by other workers, so a committed change is never served stale.
+
+The TTL bounds staleness from writes made outside the API (scripts, manual
+SQL). Handlers that modify the jar row itself still load it through the
+session.
+"""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Callable, Iterable, List, Optional
+
+from config import settings
+from models import PickleJar
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Session.info key holding the jar IDs to invalidate when the session commits
+_PENDING_KEY = "jar_cache_pending"
+
+
+@dataclass(frozen=True)
+class JarSnapshot:
+    """Read-only copy of a PickleJar row."""
+
+    id: str
+    title: str
+    description: Optional[str]
+    points_per_voter: Optional[int]
+    max_suggestions_per_member: int
+    suggestion_deadline: Optional[datetime]
+    voting_deadline: Optional[datetime]
+    hangout_datetime: Optional[datetime]
+    status: str
+    is_active: bool
+    version: int
+    created_at: datetime
+    updated_at: datetime
+    creator_phone: Optional[str]
+
+    @classmethod
+    def from_row(cls, picklejar: PickleJar) -> "JarSnapshot":
+        return cls(**{f.name: getattr(picklejar, f.name) for f in fields(cls)})
+
+
+class InvalidationChannel:
+    """
+    Delivers jar invalidations to every cache subscribed to the channel.
+
+    Subscribers receive a list of jar IDs, or None when they must drop
+    everything because invalidations may have been missed.
+    """
+
+    def __init__(self):
+        self._subscribers: List[Callable[[Optional[List[str]]], None]] = []
+
+    def subscribe(self, callback: Callable[[Optional[List[str]]], None]) -> None:
+        self._subscribers.append(callback)
+
+    def _deliver(self, picklejar_ids: Optional[List[str]]) -> None:
+        for callback in self._subscribers:
+            callback(picklejar_ids)
+
+    def publish(self, picklejar_ids: List[str]) -> None:
+        self._deliver(picklejar_ids)
+
+    def poll(self) -> None:
+        """Deliver invalidations published by other processes, if any."""
+
+
+class InMemoryInvalidationChannel(InvalidationChannel):
+    """Invalidations reach subscribers in this process only."""
+
+
+class SQLiteInvalidationChannel(InvalidationChannel):
+    """
+    Invalidations shared through a local SQLite file by the workers on a host.
+
+    Publishing appends one row per jar. `poll` reads rows appended since the
+    last poll by other processes. Only the latest `history_size` rows are
+    kept; a subscriber that fell further behind is told to drop everything.
+    """
+
+    def __init__(self, path: str, history_size: int = 10000):
+        super().__init__()
+        self.path = path
+        self.history_size = history_size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._own_ids = set()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jar_cache_invalidations ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, picklejar_id TEXT NOT NULL)"
+        )
+        row = conn.execute("SELECT MAX(id) FROM jar_cache_invalidations").fetchone()
+        self._cursor = row[0] or 0
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def publish(self, picklejar_ids):
+        conn = self._connection()
+        last_id = 0
+        for picklejar_id in picklejar_ids:
+            last_id = conn.execute(
+                "INSERT INTO jar_cache_invalidations (picklejar_id) VALUES (?)",
+                (picklejar_id,),
+            ).lastrowid
+            with self._lock:
+                self._own_ids.add(last_id)
+        conn.execute(
+            "DELETE FROM jar_cache_invalidations WHERE id <= ?",
+            (last_id - self.history_size,),
+        )
+        super().publish(picklejar_ids)
+
+    def poll(self):
+        conn = self._connection()
+        with self._lock:
+            cursor = self._cursor
+            rows = conn.execute(
+                "SELECT id, picklejar_id FROM jar_cache_invalidations "
+                "WHERE id > ? ORDER BY id",
+                (cursor,),
+            ).fetchall()
+            if not rows:
+                return
+            self._cursor = rows[-1][0]
+            # IDs start at 1, so a fresh file's first rows can be missed too
+            missed = rows[0][0] > cursor + 1
+            picklejar_ids = []
+            for row_id, picklejar_id in rows:
+                if row_id in self._own_ids:
+                    self._own_ids.discard(row_id)
+                else:
+                    picklejar_ids.append(picklejar_id)
+
+        if missed:
+            # Rows trimmed before this worker read them may hide changes
+            self._deliver(None)
+        elif picklejar_ids:
+            self._deliver(picklejar_ids)
+
+
+class JarCache:
+    """Bounded LRU cache of `JarSnapshot`s with a TTL and hit/miss counters."""
+
+    def __init__(
+        self,
+        channel: InvalidationChannel,
+        max_size: int = 1024,
+        ttl_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.channel = channel
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # Bumped on every invalidation so a row loaded before a concurrent
+        # invalidation is not stored afterwards
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        channel.subscribe(self._drop)
+
+    def get(self, db: Session, picklejar_id: str) -> Optional[JarSnapshot]:
+        """Return the jar's snapshot, loading it through `db` on a miss."""
+        self.channel.poll()
+        with self._lock:
+            entry = self._entries.get(picklejar_id)
+            if entry is not None and entry[0] > self.clock():
+                self._entries.move_to_end(picklejar_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+
+        db_picklejar = db.query(PickleJar).filter(PickleJar.id == picklejar_id).first()
+        if db_picklejar is None:
+            return None
+        snapshot = JarSnapshot.from_row(db_picklejar)
+
+        with self._lock:
+            if self.max_size > 0 and generation == self._generation:
+                self._entries[picklejar_id] = (self.clock() + self.ttl_seconds, snapshot)
+                self._entries.move_to_end(picklejar_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return snapshot
+
+    def invalidate(self, picklejar_ids: Iterable[str]) -> None:
+        """Drop jars here and in every other cache on the channel."""
+        self.channel.publish(list(picklejar_ids))
+
+    def _drop(self, picklejar_ids: Optional[List[str]]) -> None:
+        with self._lock:
+            self._generation += 1
+            if picklejar_ids is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                return
+            for picklejar_id in picklejar_ids:
+                if self._entries.pop(picklejar_id, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self) -> None:
+        self._drop(None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+def _create_channel() -> InvalidationChannel:
+    if settings.JAR_CACHE_CHANNEL == "sqlite":
+        return SQLiteInvalidationChannel(settings.JAR_CACHE_SQLITE_PATH)
+    return InMemoryInvalidationChannel()
+
+
+jar_cache = JarCache(
+    _create_channel(),
+    max_size=settings.JAR_CACHE_SIZE if settings.JAR_CACHE_ENABLED else 0,
+    ttl_seconds=settings.JAR_CACHE_TTL_SECONDS,
+)
+
+
+def get_jar(db: Session, picklejar_id: str) -> Optional[JarSnapshot]:
+    """Look up a PickleJar through the cache. Returns None if it does not exist."""
+    return jar_cache.get(db, picklejar_id)
+
+
+def invalidate_on_commit(db: Session, picklejar_id: str) -> None:
+    """Drop the jar from every cache once `db` commits."""
+    db.info.setdefault(_PENDING_KEY, set()).add(picklejar_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session) -> None:
+    picklejar_ids = session.info.pop(_PENDING_KEY, None)
+    if picklejar_ids:
+        jar_cache.invalidate(picklejar_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
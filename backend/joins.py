@@ -0,0 +1,256 @@
+"""
+Joining members to a PickleJar with INSERT ... ON CONFLICT upserts.
+
+A phone number joins a jar at most once, enforced by the unique index
+`uq_members_picklejar_phone` on (picklejar_id, phone_number). Instead of
+looking for an existing member and inserting when there is none, joins go
+straight to `INSERT ... ON CONFLICT (picklejar_id, phone_number) DO UPDATE
+... RETURNING`, which PostgreSQL and SQLite (3.35+) both support. The
+returned row is the new member or the one that already existed. Two
+concurrent joins with the same number therefore resolve to the same member
+instead of one of them failing on the index.
+
+Each row gets its member ID up front, so a returned ID equal to the one
+sent means the member was inserted rather than found. The DO UPDATE only
+runs when a rejoin brings a new display name; other rejoins return no row,
+so those members are read back with a SELECT and reported as unchanged.
+
+`bulk_join` imports a host's list of members (see `parse_member_list` for
+the CSV and JSON formats) through the same upsert, with SQLAlchemy packing
+up to a thousand rows into each INSERT, and reports what happened to every
+row.
+"""
+
+import csv
+import io
+import json
+import re
+from datetime import datetime
+from typing import Iterator, List, NamedTuple, Optional, Sequence
+
+from database import upsert_insert
+from models import Member, generate_uuid
+from sqlalchemy import Row, select
+from sqlalchemy.orm import Session
+
+# Same bounds as MemberCreate
+PHONE_MIN_DIGITS = 10
+PHONE_MAX_LENGTH = 20
+DISPLAY_NAME_MAX_LENGTH = 100
+
+_NOT_PHONE_CHARACTERS = re.compile(r"[^\d+]")
+_PHONE_COLUMNS = ("phone_number", "phone")
+_NAME_COLUMNS = ("display_name", "name")
+
+
+class JoinRequest(NamedTuple):
+    phone_number: str
+    display_name: Optional[str] = None
+
+
+class Joined(NamedTuple):
+    member: Row
+    created: bool
+    # Inserted, or its display name was replaced
+    changed: bool
+
+
+class BulkJoinRow(NamedTuple):
+    """Outcome of one row of a bulk join (rows are numbered from 1)."""
+
+    row: int
+    phone_number: str
+    # created, updated (display name replaced), existing, duplicate or invalid
+    status: str
+    member_id: Optional[str] = None
+    detail: Optional[str] = None
+
+
+def normalize_phone(phone_number: str) -> str:
+    """Keep only the digits and '+' of a phone number."""
+    return _NOT_PHONE_CHARACTERS.sub("", phone_number)
+
+
+def upsert_members(
+    db: Session,
+    picklejar_id: str,
+    requests: Sequence[JoinRequest],
+    columns: Optional[Sequence] = None,
+) -> List[Joined]:
+    """
+    Join every request's phone number to the jar and return the members in
+    request order, with `columns` (default all; always include `id` and
+    `phone_number`). A display name given for a member who already joined
+    replaces theirs; otherwise the member is unchanged. Display names must
+    be None rather than blank.
+
+    Phone numbers must already be normalized and distinct. Does not commit.
+    """
+    if not requests:
+        return []
+    now = datetime.utcnow()
+    ids = [generate_uuid() for _ in requests]
+    columns = columns or Member.__table__.c
+    insert = upsert_insert(db, Member.__table__)
+    name = insert.excluded.display_name
+    statement = insert.on_conflict_do_update(
+        index_elements=["picklejar_id", "phone_number"],
+        set_={"display_name": name},
+        where=name.is_not(None) & name.is_distinct_from(insert.table.c.display_name),
+    ).returning(*columns)
+    # Several rows run as multi-row INSERTs (SQLAlchemy's insertmanyvalues)
+    rows = db.execute(
+        statement,
+        [
+            {
+                "id": member_id,
+                "picklejar_id": picklejar_id,
+                "phone_number": request.phone_number,
+                "display_name": request.display_name,
+                "is_verified": False,
+                "has_suggested": False,
+                "has_voted": False,
+                "is_active": True,
+                "joined_at": now,
+                "last_active": now,
+            }
+            for member_id, request in zip(ids, requests)
+        ],
+    )
+    # RETURNING order is not guaranteed for several rows, so match by phone
+    members = {row.phone_number: row for row in rows}
+    changed = set(members)
+    unchanged = [r.phone_number for r in requests if r.phone_number not in changed]
+    for start in range(0, len(unchanged), 1000):
+        members.update(
+            (row.phone_number, row)
+            for row in db.execute(
+                select(*columns).where(
+                    Member.picklejar_id == picklejar_id,
+                    Member.phone_number.in_(unchanged[start : start + 1000]),
+                )
+            )
+        )
+    joined = []
+    for member_id, request in zip(ids, requests):
+        member = members[request.phone_number]
+        joined.append(
+            Joined(
+                member,
+                str(member.id) == member_id,
+                request.phone_number in changed,
+            )
+        )
+    return joined
+
+
+def _csv_entries(text: str) -> Iterator[tuple]:
+    rows = [row for row in csv.reader(io.StringIO(text)) if any(map(str.strip, row))]
+    if not rows:
+        return
+    phone_column, name_column = 0, 1
+    header = [cell.strip().lower() for cell in rows[0]]
+    if any(column in header for column in _PHONE_COLUMNS):
+        phone_column = next(header.index(c) for c in _PHONE_COLUMNS if c in header)
+        name_column = next(
+            (header.index(c) for c in _NAME_COLUMNS if c in header), None
+        )
+        rows = rows[1:]
+    for row in rows:
+        phone = row[phone_column] if phone_column < len(row) else ""
+        name = None
+        if name_column is not None and name_column < len(row):
+            name = row[name_column]
+        yield phone, name
+
+
+def _json_entries(members) -> Iterator[tuple]:
+    if not isinstance(members, list):
+        raise ValueError("Expected a JSON list of members")
+    for member in members:
+        if isinstance(member, str):
+            yield member, None
+        elif isinstance(member, dict):
+            yield member.get("phone_number", ""), member.get("display_name")
+        else:
+            yield "", None
+
+
+def parse_member_list(body: bytes, content_type: str) -> List[tuple]:
+    """
+    Parse a bulk join body into (phone number, display name) pairs.
+
+    JSON bodies are a list of `{"phone_number", "display_name"}` objects or
+    of phone numbers. CSV bodies (`text/csv`) have the phone number in the
+    first column and the display name in the second, or in the columns a
+    header row names `phone_number` and `display_name`. Raises ValueError
+    if the body cannot be parsed.
+    """
+    media_type = content_type.split(";")[0].strip().lower()
+    try:
+        text = body.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValueError("Body must be UTF-8")
+    if media_type == "text/csv":
+        return list(_csv_entries(text))
+    try:
+        members = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON: {e}")
+    return list(_json_entries(members))
+
+
+def _invalid(phone: str, cleaned: str, name) -> Optional[str]:
+    if len(phone) > PHONE_MAX_LENGTH:
+        return f"Phone number must be at most {PHONE_MAX_LENGTH} characters"
+    if len(cleaned) < PHONE_MIN_DIGITS:
+        return f"Phone number must be at least {PHONE_MIN_DIGITS} digits"
+    if name is not None and not isinstance(name, str):
+        return "Display name must be a string"
+    if name is not None and len(name) > DISPLAY_NAME_MAX_LENGTH:
+        return f"Display name must be at most {DISPLAY_NAME_MAX_LENGTH} characters"
+    return None
+
+
+def bulk_join(
+    db: Session, picklejar_id: str, entries: List[tuple]
+) -> List[BulkJoinRow]:
+    """
+    Join (phone number, display name) pairs to the jar and return one
+    outcome per entry. Numbers are normalized like `get_member_by_phone`
+    does; a number seen earlier in the list is reported as a duplicate and
+    skipped. Does not commit.
+    """
+    outcomes: List[Optional[BulkJoinRow]] = [None] * len(entries)
+    first_row = {}
+    requests, request_rows = [], []
+    for index, (raw_phone, name) in enumerate(entries):
+        row = index + 1
+        if not isinstance(raw_phone, str):
+            detail = "Phone number must be a string"
+            outcomes[index] = BulkJoinRow(row, "", "invalid", detail=detail)
+            continue
+        phone = normalize_phone(raw_phone)
+        error = _invalid(raw_phone, phone, name)
+        if error:
+            outcomes[index] = BulkJoinRow(row, raw_phone, "invalid", detail=error)
+            continue
+        if name is not None:
+            name = name.strip() or None
+        if phone in first_row:
+            detail = f"Same number as row {first_row[phone]}"
+            outcomes[index] = BulkJoinRow(row, phone, "duplicate", detail=detail)
+            continue
+        first_row[phone] = row
+        requests.append(JoinRequest(phone, name))
+        request_rows.append(index)
+
+    joined = upsert_members(
+        db, picklejar_id, requests, columns=[Member.id, Member.phone_number]
+    )
+    for index, (member, created, changed) in zip(request_rows, joined):
+        outcome = "created" if created else "updated" if changed else "existing"
+        outcomes[index] = BulkJoinRow(
+            index + 1, member.phone_number, outcome, member_id=str(member.id)
+        )
+    return outcomes
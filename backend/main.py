@@ -1,46 +1,140 @@
-from database import Base, engine
+from contextlib import asynccontextmanager
+
+import metrics
+from ballot_queue import ballot_queue, queued_ingestion
+from config import settings
+from database import QueryTrackingMiddleware, async_engine, engine
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from routers import members, picklejars, suggestions, votes
+from heartbeats import heartbeats
+from jar_cache import jar_cache
+from rate_limit import RateLimitMiddleware, middleware_options
+from routers import async_routes, members, picklejars, suggestions, votes
+from scheduler import scheduler
 
 # Create database tables
-# Base.metadata.create_all(bind=engine)  # Disabled - tables created manually in Supabase
+# Base.metadata.create_all(bind=engine)  # Disabled - schema is managed by Alembic (alembic upgrade head)
 
-app = FastAPI(
-    title="PickleJar API",
-    description="API for democratic group hangout planning",
-    version="1.0.0",
-    docs_url="/docs",
-    redoc_url="/redoc",
-)
 
-# Configure CORS
-from config import settings
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Advance jars whose deadlines passed while the server was down, then
+    # keep advancing them in the background
+    if settings.DEADLINE_SCHEDULER_ENABLED:
+        scheduler.start()
+    heartbeats.start()
+    # Applies ballots left in the queue by a previous run first
+    if queued_ingestion():
+        ballot_queue.start()
+    yield
+    scheduler.stop()
+    ballot_queue.stop()
+    # Write the last buffered last_active times before exiting
+    heartbeats.stop()
+
+
+def _select_router(module, async_database: bool):
+    """Serve a router's async variant when routes are async."""
+    if async_database:
+        return async_routes.build_async_router(module.router)
+    return module.router
+
+
+def create_app(async_database: bool = settings.ASYNC_DATABASE) -> FastAPI:
+    """
+    Assemble the API. With `async_database` the routes are served as async
+    handlers on the async engine (see routers/async_routes.py), which
+    requires ASYNC_DATABASE to have created it.
+    """
+    app = FastAPI(
+        title="PickleJar API",
+        description="API for democratic group hangout planning",
+        version="1.0.0",
+        docs_url="/docs",
+        redoc_url="/redoc",
+        lifespan=lifespan,
+    )
+
+    # Per-request statement counts for the query hooks in database.py
+    app.add_middleware(QueryTrackingMiddleware)
+
+    # Rate limiting sits inside CORS so 429 responses still carry CORS headers
+    if settings.RATE_LIMIT_ENABLED:
+        app.add_middleware(RateLimitMiddleware, **middleware_options())
+
+    # Configure CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.cors_origins_list + [
+            "https://api.depickle.me",
+            "https://depickle.me",
+            "https://www.depickle.me",
+        ],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+
+    # Include routers
+    app.include_router(
+        _select_router(picklejars, async_database),
+        prefix="/api/picklejars",
+        tags=["PickleJars"],
+    )
+    app.include_router(
+        _select_router(suggestions, async_database),
+        prefix="/api/suggestions",
+        tags=["Suggestions"],
+    )
+    app.include_router(
+        _select_router(votes, async_database),
+        prefix="/api/votes",
+        tags=["Votes"],
+    )
+    app.include_router(
+        _select_router(members, async_database),
+        prefix="/api/members",
+        tags=["Members"],
+    )
+
+    @app.get("/")
+    async def root():
+        return {
+            "message": "Welcome to PickleJar API",
+            "docs": "/docs",
+            "version": "1.0.0",
+        }
+
+    # A plain def so the ballot log's SQLite counts run on the threadpool
+    @app.get("/health")
+    def health_check():
+        return {
+            "status": "healthy",
+            "jar_cache": jar_cache.stats(),
+            "heartbeats": heartbeats.stats(),
+            "ballot_queue": ballot_queue.stats() if queued_ingestion() else None,
+        }
+
+    if settings.METRICS_ENABLED:
+
+        @app.get("/metrics", include_in_schema=False)
+        async def prometheus_metrics():
+            return PlainTextResponse(
+                metrics.render(jar_cache.stats(), heartbeats.stats()),
+                media_type="text/plain; version=0.0.4",
+            )
+
+        # Must run after every route is registered
+        metrics.instrument_routes(app)
+
+    return app
+
+
+if settings.METRICS_ENABLED:
+    metrics.instrument_engine(engine, "sync")
+    if async_engine is not None:
+        metrics.instrument_engine(async_engine.sync_engine, "async")
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.cors_origins_list + [
-        "https://api.depickle.me",
-        "https://depickle.me",
-        "https://www.depickle.me",
-    ],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Include routers
-app.include_router(picklejars.router, prefix="/api/picklejars", tags=["PickleJars"])
-app.include_router(suggestions.router, prefix="/api/suggestions", tags=["Suggestions"])
-app.include_router(votes.router, prefix="/api/votes", tags=["Votes"])
-app.include_router(members.router, prefix="/api/members", tags=["Members"])
-
-
-@app.get("/")
-async def root():
-    return {"message": "Welcome to PickleJar API", "docs": "/docs", "version": "1.0.0"}
-
-
-@app.get("/health")
-async def health_check():
-    return {"status": "healthy"}
+app = create_app()
@@ -0,0 +1,265 @@
+"""
+Request, database and cache metrics in the Prometheus text format.
+
+`instrument_routes` wraps each route's ASGI app once at startup, so every
+route gets its own preallocated `RouteMetrics` and recording a request is a
+few counter increments: no label strings or metric objects are built per
+request. For each route template (e.g. `/api/votes/{picklejar_id}/vote`) it
+records a latency histogram, in-flight requests, responses by status code,
+and the number and duration of SQL statements the request issued.
+
+`instrument_engine` attaches statement timing to an engine and times pool
+checkouts. `render` produces the `/metrics` response body, including the
+jar cache and heartbeat buffer statistics passed in.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram. Bucket counts are stored non-cumulatively."""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str, lines: List[str]) -> None:
+        prefix = labels + "," if labels else ""
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+
+
+class RequestStats:
+    """SQL activity of the request currently being handled."""
+
+    __slots__ = ("statements", "db_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+
+
+class RouteMetrics:
+    __slots__ = ("labels", "in_flight", "latency", "statements", "db_time", "statuses")
+
+    def __init__(self, path: str, method: str):
+        self.labels = f'route="{path}",method="{method}"'
+        self.in_flight = 0
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.statements = Histogram(STATEMENT_BUCKETS)
+        self.db_time = Histogram(LATENCY_BUCKETS)
+        self.statuses: Dict[int, int] = {}
+
+
+class EngineMetrics:
+    __slots__ = ("labels", "pool", "checkout_wait", "lock")
+
+    def __init__(self, name: str, pool):
+        self.labels = f'engine="{name}"'
+        self.pool = pool
+        self.checkout_wait = Histogram(POOL_WAIT_BUCKETS)
+        self.lock = threading.Lock()
+
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar(
+    "metrics_current_request", default=None
+)
+_routes: List[RouteMetrics] = []
+_engines: List[EngineMetrics] = []
+
+
+def _instrument_route_app(app, route_metrics: RouteMetrics):
+    async def instrumented(scope, receive, send):
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = RequestStats()
+        token = _current_request.set(stats)
+        route_metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await app(scope, receive, send_with_status)
+        finally:
+            route_metrics.latency.observe(time.perf_counter() - started)
+            route_metrics.in_flight -= 1
+            route_metrics.statuses[status_code] = (
+                route_metrics.statuses.get(status_code, 0) + 1
+            )
+            route_metrics.statements.observe(stats.statements)
+            route_metrics.db_time.observe(stats.db_seconds)
+            _current_request.reset(token)
+
+    return instrumented
+
+
+def instrument_routes(app) -> None:
+    """Wrap every HTTP route of `app`. Call once all routes are registered."""
+    for route in app.routes:
+        methods = getattr(route, "methods", None)
+        if not methods:
+            continue
+        route_metrics = RouteMetrics(route.path, ",".join(sorted(methods)))
+        _routes.append(route_metrics)
+        route.app = _instrument_route_app(route.app, route_metrics)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_request.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += time.perf_counter() - context._metrics_started
+
+
+def instrument_engine(engine, name: str) -> None:
+    """Record statement counts/time per request and pool checkout waits."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+    engine_metrics = EngineMetrics(name, engine.pool)
+    _engines.append(engine_metrics)
+
+    pool = engine.pool
+    connect = pool.connect
+
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            waited = time.perf_counter() - started
+            with engine_metrics.lock:
+                engine_metrics.checkout_wait.observe(waited)
+
+    pool.connect = timed_connect
+
+
+def _pool_gauge(pool, method: str) -> Optional[int]:
+    value = getattr(pool, method, None)
+    return value() if callable(value) else None
+
+
+def _header(lines: List[str], name: str, kind: str, help_text: str) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def render(
+    jar_cache_stats: Optional[dict] = None, heartbeat_stats: Optional[dict] = None
+) -> str:
+    """Render every metric in the Prometheus text exposition format."""
+    lines: List[str] = []
+
+    name = "picklejar_http_request_duration_seconds"
+    _header(lines, name, "histogram", "Request latency by route template.")
+    for route in _routes:
+        route.latency.render(name, route.labels, lines)
+
+    name = "picklejar_http_requests_in_flight"
+    _header(lines, name, "gauge", "Requests currently being handled by route.")
+    for route in _routes:
+        lines.append(f"{name}{{{route.labels}}} {route.in_flight}")
+
+    name = "picklejar_http_responses_total"
+    _header(lines, name, "counter", "Responses by route and status code.")
+    for route in _routes:
+        for status_code, count in sorted(route.statuses.items()):
+            lines.append(f'{name}{{{route.labels},status="{status_code}"}} {count}')
+
+    name = "picklejar_db_statements_per_request"
+    _header(lines, name, "histogram", "SQL statements issued per request.")
+    for route in _routes:
+        route.statements.render(name, route.labels, lines)
+
+    name = "picklejar_db_seconds_per_request"
+    _header(lines, name, "histogram", "Time spent executing SQL per request.")
+    for route in _routes:
+        route.db_time.render(name, route.labels, lines)
+
+    name = "picklejar_db_pool_checkout_seconds"
+    _header(lines, name, "histogram", "Time waited for a pooled connection.")
+    for engine in _engines:
+        with engine.lock:
+            engine.checkout_wait.render(name, engine.labels, lines)
+
+    for method, help_text in (
+        ("size", "Configured pool size."),
+        ("checkedout", "Connections currently checked out."),
+        ("overflow", "Connections open beyond the pool size."),
+    ):
+        name = f"picklejar_db_pool_{method}"
+        _header(lines, name, "gauge", help_text)
+        for engine in _engines:
+            value = _pool_gauge(engine.pool, method)
+            if value is not None:
+                lines.append(f"{name}{{{engine.labels}}} {value}")
+
+    if jar_cache_stats is not None:
+        name = "picklejar_jar_cache_size"
+        _header(lines, name, "gauge", "Jars currently cached in this worker.")
+        lines.append(f"{name} {jar_cache_stats['size']}")
+        for key in ("hits", "misses", "evictions", "invalidations"):
+            name = f"picklejar_jar_cache_{key}_total"
+            _header(lines, name, "counter", f"Jar cache {key} in this worker.")
+            lines.append(f"{name} {jar_cache_stats[key]}")
+
+    if heartbeat_stats is not None:
+        for key, kind, help_text in (
+            ("pending", "gauge", "Members with a buffered last_active time."),
+            (
+                "oldest_pending_seconds",
+                "gauge",
+                "Age of the oldest buffered heartbeat.",
+            ),
+            (
+                "last_flush_lag_seconds",
+                "gauge",
+                "How long the oldest heartbeat of the last flush waited.",
+            ),
+            ("max_flush_lag_seconds", "gauge", "Longest flush lag seen."),
+            ("recorded", "counter", "Heartbeats recorded."),
+            ("dropped", "counter", "Heartbeats dropped with the buffer full."),
+            ("flushes", "counter", "Heartbeat flushes that wrote rows."),
+            ("flush_failures", "counter", "Heartbeat flushes that failed."),
+            ("rows_written", "counter", "last_active updates sent by flushes."),
+        ):
+            name = f"picklejar_heartbeat_{key}"
+            if kind == "counter":
+                name += "_total"
+            _header(lines, name, kind, help_text)
+            lines.append(f"{name} {heartbeat_stats[key]}")
+
+    lines.append("")
+    return "\n".join(lines)
@@ -1,3 +1,6 @@
+import os
+import secrets
+import time
 import uuid
 from datetime import datetime
 
@@ -9,21 +12,77 @@ from sqlalchemy import (
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
+    LargeBinary,
     String,
     Text,
 )
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import relationship
+from sqlalchemy.types import TypeDecorator
+
+# Lowercase letters and digits without the look-alikes 0/o and 1/i/l
+SHORT_ID_ALPHABET = "23456789abcdefghjkmnpqrstuvwxyz"
+SHORT_ID_LENGTH = 8
+
+NIL_UUID = "00000000-0000-0000-0000-000000000000"
+
+
+def format_uuid7(unix_ms: int, random_bits: int) -> str:
+    """Build a UUIDv7 string from a Unix time in milliseconds and 74 random bits"""
+    value = (
+        (unix_ms & 0xFFFFFFFFFFFF) << 80
+        | 0x7 << 76
+        | (random_bits >> 62 & 0xFFF) << 64
+        | 0b10 << 62
+        | random_bits & 0x3FFFFFFFFFFFFFFF
+    )
+    h = f"{value:032x}"
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
 
 
 def generate_uuid():
-    """Generate a unique ID for resources"""
-    return str(uuid.uuid4())
+    """
+    Generate a unique ID for resources.
+
+    IDs are UUIDv7: they start with the creation time, so new rows land at
+    the end of primary key and foreign key indexes instead of at random
+    pages.
+    """
+    random_bits = int.from_bytes(os.urandom(10), "big")
+    return format_uuid7(time.time_ns() // 1000000, random_bits)
 
 
 def generate_short_id():
-    """Generate a shorter, URL-friendly ID for PickleJars"""
-    return str(uuid.uuid4())[:8]
+    """Generate a shorter, URL-friendly ID for PickleJars (31^8, about 8.5e11 values)"""
+    return "".join(secrets.choice(SHORT_ID_ALPHABET) for _ in range(SHORT_ID_LENGTH))
+
+
+class UUIDString(TypeDecorator):
+    """
+    A UUID held as a string in Python.
+
+    Stored in PostgreSQL's native 16-byte uuid type and as text elsewhere.
+    A value that is not a UUID cannot match a stored ID, so it is bound as
+    the nil UUID instead of making PostgreSQL reject the query.
+    """
+
+    impl = String
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(postgresql.UUID(as_uuid=False))
+        return dialect.type_descriptor(String())
+
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name != "postgresql":
+            return value
+        try:
+            return str(uuid.UUID(value))
+        except (TypeError, ValueError):
+            return NIL_UUID
 
 
 class PickleJar(Base):
@@ -53,6 +112,11 @@ class PickleJar(Base):
     )  # setup, suggesting, voting, completed, cancelled
     is_active = Column(Boolean, default=True)
 
+    # Incremented by every change to the jar or its members and suggestions;
+    # used as the ETag for conditional GETs. Ballots count on the members'
+    # `ballot_version` instead, so voters do not all write this row
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
     # Metadata
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -79,8 +143,13 @@ class Member(Base):
     """
 
     __tablename__ = "members"
+    __table_args__ = (
+        # One member per phone number per PickleJar; also serves phone lookups
+        Index("uq_members_picklejar_phone", "picklejar_id", "phone_number", unique=True),
+        Index("ix_members_picklejar_active", "picklejar_id", "is_active"),
+    )
 
-    id = Column(String, primary_key=True, default=generate_uuid)
+    id = Column(UUIDString, primary_key=True, default=generate_uuid)
     picklejar_id = Column(String, ForeignKey("picklejars.id"), nullable=False)
 
     # Identity
@@ -95,6 +164,9 @@ class Member(Base):
     has_suggested = Column(Boolean, default=False)
     has_voted = Column(Boolean, default=False)
     is_active = Column(Boolean, default=True)
+    # Incremented by every ballot the member submits or clears; summed into
+    # the jar's ETag while it is voting (see versioning.py)
+    ballot_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Metadata
     joined_at = Column(DateTime, default=datetime.utcnow)
@@ -118,10 +190,19 @@ class Suggestion(Base):
     """
 
     __tablename__ = "suggestions"
+    __table_args__ = (
+        Index("ix_suggestions_picklejar_active", "picklejar_id", "is_active"),
+        Index("ix_suggestions_picklejar_member", "picklejar_id", "member_id"),
+        Index(
+            "uq_suggestions_picklejar_ordinal", "picklejar_id", "ordinal", unique=True
+        ),
+    )
 
-    id = Column(String, primary_key=True, default=generate_uuid)
+    id = Column(UUIDString, primary_key=True, default=generate_uuid)
     picklejar_id = Column(String, ForeignKey("picklejars.id"), nullable=False)
-    member_id = Column(String, ForeignKey("members.id"), nullable=False)
+    member_id = Column(UUIDString, ForeignKey("members.id"), nullable=False)
+    # Position within the jar (0, 1, 2, ...); packed ballots refer to it
+    ordinal = Column(Integer, nullable=True)
 
     # Content
     title = Column(String, nullable=False)
@@ -166,10 +247,14 @@ class Vote(Base):
     """
 
     __tablename__ = "votes"
+    __table_args__ = (
+        Index("ix_votes_member_picklejar", "member_id", "picklejar_id"),
+        Index("ix_votes_suggestion", "suggestion_id"),
+    )
 
-    id = Column(String, primary_key=True, default=generate_uuid)
-    member_id = Column(String, ForeignKey("members.id"), nullable=False)
-    suggestion_id = Column(String, ForeignKey("suggestions.id"), nullable=False)
+    id = Column(UUIDString, primary_key=True, default=generate_uuid)
+    member_id = Column(UUIDString, ForeignKey("members.id"), nullable=False)
+    suggestion_id = Column(UUIDString, ForeignKey("suggestions.id"), nullable=False)
     picklejar_id = Column(String, ForeignKey("picklejars.id"), nullable=False)
 
     # Vote content
@@ -185,3 +270,86 @@ class Vote(Base):
 
     def __repr__(self):
         return f"<Vote(id={self.id}, points={self.points})>"
+
+
+class PackedBallot(Base):
+    """
+    A member's whole ballot in one row, used when BALLOT_STORAGE is "packed".
+    `entries` holds (suggestion ordinal, points) pairs as little-endian
+    uint32s, 8 bytes per voted suggestion; see ballots.py.
+    """
+
+    __tablename__ = "packed_ballots"
+
+    picklejar_id = Column(String, ForeignKey("picklejars.id"), primary_key=True)
+    member_id = Column(UUIDString, ForeignKey("members.id"), primary_key=True)
+
+    # Ballot content
+    entries = Column(LargeBinary, nullable=False)
+
+    # Metadata
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return (
+            f"<PackedBallot(picklejar_id={self.picklejar_id}, "
+            f"member_id={self.member_id}, entries={len(self.entries) // 8})>"
+        )
+
+
+class SuggestionTally(Base):
+    """
+    Materialized vote totals for a Suggestion.
+    Kept in step with the votes table by the voting endpoints so results
+    can be read without summing every Vote row.
+    """
+
+    __tablename__ = "suggestion_tallies"
+    __table_args__ = (Index("ix_suggestion_tallies_picklejar", "picklejar_id"),)
+
+    suggestion_id = Column(
+        UUIDString, ForeignKey("suggestions.id"), primary_key=True
+    )
+    picklejar_id = Column(String, ForeignKey("picklejars.id"), nullable=False)
+
+    # Totals
+    points = Column(Integer, nullable=False, default=0)
+    vote_count = Column(Integer, nullable=False, default=0)
+
+    # Metadata
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return (
+            f"<SuggestionTally(suggestion_id={self.suggestion_id}, "
+            f"points={self.points}, vote_count={self.vote_count})>"
+        )
+
+
+class ResultsSnapshot(Base):
+    """
+    The results of a completed PickleJar, encoded once as the JSON body of
+    `GET /results`. Written when the jar completes and deleted when it is
+    reverted to voting; only served while `version` matches the jar's.
+    """
+
+    __tablename__ = "results_snapshots"
+
+    picklejar_id = Column(String, ForeignKey("picklejars.id"), primary_key=True)
+
+    # The jar version and scoring rule the body was built for
+    version = Column(Integer, nullable=False)
+    scoring_rule = Column(String, nullable=False)
+
+    # Pre-encoded ResultsResponse
+    body = Column(LargeBinary, nullable=False)
+
+    # Metadata
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return (
+            f"<ResultsSnapshot(picklejar_id={self.picklejar_id}, "
+            f"version={self.version}, bytes={len(self.body)})>"
+        )
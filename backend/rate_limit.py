@@ -0,0 +1,194 @@
+"""
+Token-bucket rate limiting for the API.
+
+`RateLimitMiddleware` charges every `/api/` request to two buckets: one for
+the client and one for the PickleJar named in the path, each with separate
+budgets for reads (GET/HEAD) and writes. A request that finds either bucket
+empty gets `429 Too Many Requests` with a `Retry-After` header before it
+reaches a handler or takes a database connection.
+
+Buckets live in a `TokenBucketStore`. `InMemoryTokenBucketStore` keeps them
+per process; a shared store (e.g. Redis) can be plugged in by implementing
+`take`. The middleware is a plain ASGI middleware so the per-request cost
+stays at a few dictionary lookups.
+"""
+
+import json
+import math
+import threading
+import time
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from config import settings
+
+READ_METHODS = frozenset({"GET", "HEAD"})
+
+# Path prefixes whose next segment is a PickleJar ID, except for the listed
+# sub-resources that are addressed by their own ID instead
+JAR_SCOPED_PREFIXES = {
+    "picklejars": frozenset(),
+    "members": frozenset({"member"}),
+    "suggestions": frozenset({"suggestion"}),
+    "votes": frozenset(),
+}
+
+
+class TokenBucketStore:
+    """Storage for token buckets, keyed by any hashable value."""
+
+    def take(
+        self, key: Hashable, capacity: float, refill_per_second: float, now: float
+    ) -> float:
+        """
+        Take one token from the bucket at `key`.
+
+        Returns 0.0 when a token was taken, otherwise the number of seconds
+        until one becomes available.
+        """
+        raise NotImplementedError
+
+
+class InMemoryTokenBucketStore(TokenBucketStore):
+    """
+    Per-process buckets.
+
+    Once `max_buckets` exist, buckets that have refilled completely are
+    dropped, since a full bucket is the same as a new one. If that frees
+    nothing, every bucket is reset.
+    """
+
+    def __init__(self, max_buckets: int = 100000):
+        self.max_buckets = max_buckets
+        self._lock = threading.Lock()
+        self._buckets: Dict[Hashable, list] = {}
+
+    def take(self, key, capacity, refill_per_second, now):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_buckets:
+                    self._prune(now)
+                    if len(self._buckets) >= self.max_buckets:
+                        self._buckets.clear()
+                self._buckets[key] = [capacity - 1.0, now, capacity, refill_per_second]
+                return 0.0
+
+            tokens = min(capacity, bucket[0] + (now - bucket[1]) * refill_per_second)
+            bucket[1] = now
+            if tokens >= 1.0:
+                bucket[0] = tokens - 1.0
+                return 0.0
+            bucket[0] = tokens
+            return (1.0 - tokens) / refill_per_second
+
+    def _prune(self, now: float) -> None:
+        self._buckets = {
+            key: bucket
+            for key, bucket in self._buckets.items()
+            if bucket[0] + (now - bucket[1]) * bucket[3] < bucket[2]
+        }
+
+
+class RateLimitMiddleware:
+    """ASGI middleware enforcing per-client and per-jar token buckets."""
+
+    def __init__(
+        self,
+        app,
+        store: TokenBucketStore,
+        read_requests: int,
+        write_requests: int,
+        jar_read_requests: int,
+        jar_write_requests: int,
+        period_seconds: float,
+        client_header: Optional[str] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.app = app
+        self.store = store
+        self.period_seconds = period_seconds
+        # (capacity, refill per second) for each bucket kind
+        self.limits: Dict[str, Tuple[float, float]] = {
+            kind: (float(requests), requests / period_seconds)
+            for kind, requests in (
+                ("read", read_requests),
+                ("write", write_requests),
+                ("jar_read", jar_read_requests),
+                ("jar_write", jar_write_requests),
+            )
+        }
+        self.client_header = client_header.lower().encode() if client_header else None
+        self.clock = clock
+
+    def _client_id(self, scope) -> str:
+        if self.client_header:
+            for name, value in scope["headers"]:
+                if name == self.client_header:
+                    return value.decode("latin-1")
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    @staticmethod
+    def _jar_id(path: str) -> Optional[str]:
+        # /api/<resource>/<jar id>/...
+        parts = path.split("/", 4)
+        if len(parts) < 4 or not parts[3]:
+            return None
+        excluded = JAR_SCOPED_PREFIXES.get(parts[2])
+        if excluded is None or parts[3] in excluded:
+            return None
+        return parts[3]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+
+        kind = "read" if scope["method"] in READ_METHODS else "write"
+        now = self.clock()
+
+        capacity, rate = self.limits[kind]
+        retry_after = self.store.take(
+            ("client", kind, self._client_id(scope)), capacity, rate, now
+        )
+        if not retry_after:
+            jar_id = self._jar_id(scope["path"])
+            if jar_id is not None:
+                capacity, rate = self.limits["jar_" + kind]
+                retry_after = self.store.take(
+                    ("jar", kind, jar_id), capacity, rate, now
+                )
+
+        if retry_after:
+            await self._reject(send, retry_after)
+            return
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def _reject(send, retry_after: float) -> None:
+        body = json.dumps({"detail": "Too many requests, please slow down"}).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+def middleware_options() -> dict:
+    """Keyword arguments for `RateLimitMiddleware` built from the settings."""
+    return {
+        "store": InMemoryTokenBucketStore(),
+        "read_requests": settings.RATE_LIMIT_REQUESTS,
+        "write_requests": settings.RATE_LIMIT_WRITE_REQUESTS,
+        "jar_read_requests": settings.RATE_LIMIT_JAR_REQUESTS,
+        "jar_write_requests": settings.RATE_LIMIT_JAR_WRITE_REQUESTS,
+        "period_seconds": settings.RATE_LIMIT_PERIOD,
+        "client_header": settings.RATE_LIMIT_CLIENT_HEADER or None,
+    }
@@ -0,0 +1,211 @@
+"""
+Results of a jar in the voting or completed phase, and the frozen copy
+served once it is completed.
+
+`build_results` ranks a jar's suggestions under a scoring rule (see
+scoring.py). A completed jar's results cannot change until the host
+reverts it to voting, so completion (the endpoint and the voting deadline
+alike) calls `freeze_results` in the same transaction, which encodes the
+`ResultsResponse` once into `results_snapshots`. `get_results` then serves
+those bytes with a single-row read. `thaw_results` deletes the snapshot in
+the transaction that reverts the jar.
+
+A snapshot records the jar version it was built for and is ignored once the
+jar's version moves on. Edits to a completed jar freeze its results again
+when they commit (see `bump_version`). Reads never store a snapshot, so
+results of jars completed before snapshots existed, or under a changed
+SCORING_RULE, are built on every view.
+"""
+
+from typing import Optional, Union
+
+from config import settings
+from jar_cache import JarSnapshot
+from models import Member, PickleJar, ResultsSnapshot, Suggestion, SuggestionTally
+from schemas import (
+    PickleJarStatsResponse,
+    ResultsResponse,
+    SuggestionWithVotesResponse,
+    WinnerResponse,
+)
+from scoring import RULES, load_ballot_matrix, rank_suggestions
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+from tallies import participation_counts
+
+
+def build_results(
+    db: Session,
+    db_picklejar: JarSnapshot,
+    counts: dict,
+    rule_name: Optional[str] = None,
+) -> ResultsResponse:
+    """
+    Build the results for a jar in the voting or completed phase.
+
+    `counts` is the jar's `participation_counts`, passed in so callers that
+    already loaded them do not query them twice. Suggestions are ranked by
+    the scoring rule `rule_name` (default SCORING_RULE); rules other than
+    cumulative points load the jar's ballots.
+    """
+    rule = RULES[rule_name or settings.SCORING_RULE]
+
+    # Get all suggestions with their materialized vote totals. Authors are only
+    # revealed once the jar is completed, so the member join is skipped otherwise.
+    reveal_authors = db_picklejar.status == "completed"
+    columns = [Suggestion, SuggestionTally.points, SuggestionTally.vote_count]
+    if reveal_authors:
+        columns.append(Member.phone_number)
+
+    query = db.query(*columns).outerjoin(
+        SuggestionTally, SuggestionTally.suggestion_id == Suggestion.id
+    )
+    if reveal_authors:
+        query = query.outerjoin(Member, Member.id == Suggestion.member_id)
+    # Creation order, the last tie-breaker
+    suggestions = (
+        query.filter(Suggestion.picklejar_id == db_picklejar.id)
+        .order_by(Suggestion.created_at, Suggestion.id)
+        .all()
+    )
+
+    points = [row[1] or 0 for row in suggestions]
+    vote_counts = [row[2] or 0 for row in suggestions]
+    ballots = None
+    if rule.needs_ballots:
+        ballots = load_ballot_matrix(
+            db, db_picklejar.id, [row[0].id for row in suggestions]
+        )
+    ranking = rank_suggestions(
+        rule, points, vote_counts, ballots, settings.APPROVAL_THRESHOLD
+    )
+
+    # Best first under the scoring rule
+    suggestions_with_votes = [
+        {
+            "suggestion": suggestions[index][0],
+            "total_points": points[index],
+            "vote_count": vote_counts[index],
+            "member_phone": suggestions[index][3] if reveal_authors else None,
+            "rank": int(ranking.ranks[index]),
+            "score": float(ranking.scores[index]),
+        }
+        for index in ranking.order.tolist()
+    ]
+
+    # Get all suggestions
+    all_suggestions = [
+        SuggestionWithVotesResponse(
+            id=s["suggestion"].id,
+            picklejar_id=s["suggestion"].picklejar_id,
+            title=s["suggestion"].title,
+            description=s["suggestion"].description,
+            location=s["suggestion"].location,
+            structured_location=s["suggestion"].structured_location,
+            latitude=s["suggestion"].latitude,
+            longitude=s["suggestion"].longitude,
+            map_bounds=s["suggestion"].map_bounds,
+            geo_source=s["suggestion"].geo_source,
+            location_confidence=s["suggestion"].location_confidence,
+            location_last_verified_at=s["suggestion"].location_last_verified_at,
+            estimated_cost=s["suggestion"].estimated_cost,
+            is_active=s["suggestion"].is_active,
+            created_at=s["suggestion"].created_at,
+            total_points=s["total_points"],
+            member_id=s["suggestion"].member_id,
+            member_phone=s["member_phone"],
+            rank=s["rank"],
+            score=s["score"],
+        )
+        for s in suggestions_with_votes
+    ]
+
+    # Get winner
+    winner = None
+    if suggestions_with_votes:
+        winner = WinnerResponse(
+            suggestion=all_suggestions[0],
+            total_points=suggestions_with_votes[0]["total_points"],
+            vote_count=suggestions_with_votes[0]["vote_count"],
+        )
+
+    stats = PickleJarStatsResponse(
+        picklejar_id=db_picklejar.id,
+        total_members=counts["member_count"],
+        total_suggestions=counts["suggestion_count"],
+        members_suggested=counts["members_who_suggested"],
+        members_voted=counts["members_who_voted"],
+        total_votes_cast=counts["total_votes_cast"],
+        status=db_picklejar.status,
+    )
+
+    return ResultsResponse(
+        picklejar=db_picklejar,
+        winner=winner,
+        all_suggestions=all_suggestions,
+        stats=stats,
+        scoring_rule=rule.name,
+    )
+
+
+def frozen_results(
+    db: Session, picklejar: Union[PickleJar, JarSnapshot]
+) -> Optional[bytes]:
+    """
+    Return the stored results body of a completed jar, or None if there is
+    no snapshot for its current version and the configured scoring rule.
+    """
+    if picklejar.status != "completed":
+        return None
+    return db.execute(
+        select(ResultsSnapshot.body).where(
+            ResultsSnapshot.picklejar_id == picklejar.id,
+            ResultsSnapshot.version == picklejar.version,
+            ResultsSnapshot.scoring_rule == settings.SCORING_RULE,
+        )
+    ).scalar()
+
+
+def store_results(db: Session, results: ResultsResponse, version: int) -> bytes:
+    """
+    Store the encoded results of a completed jar for `version`, replacing
+    any older snapshot, and return the encoded body. Does not commit.
+    """
+    picklejar_id = results.picklejar.id
+    body = results.model_dump_json().encode()
+    db.execute(
+        delete(ResultsSnapshot).where(ResultsSnapshot.picklejar_id == picklejar_id)
+    )
+    db.execute(
+        insert(ResultsSnapshot).values(
+            picklejar_id=picklejar_id,
+            version=version,
+            scoring_rule=results.scoring_rule,
+            body=body,
+        )
+    )
+    return body
+
+
+def freeze_results(db: Session, picklejar_id: str) -> bytes:
+    """
+    Build and store the results of a jar that is being completed.
+
+    Call after the jar's status is set and `bump_version` has run, in the
+    same transaction, so the snapshot carries the version the commit
+    publishes. Does not commit.
+    """
+    db.flush()
+    jar_row = db.execute(
+        select(*PickleJar.__table__.c).where(PickleJar.id == picklejar_id)
+    ).one()
+    picklejar = JarSnapshot.from_row(jar_row)
+    results = build_results(db, picklejar, participation_counts(db, picklejar_id))
+    return store_results(db, results, picklejar.version)
+
+
+def thaw_results(db: Session, picklejar_id: str) -> None:
+    """Delete the stored results of a jar. Does not commit."""
+    db.execute(
+        delete(ResultsSnapshot).where(ResultsSnapshot.picklejar_id == picklejar_id)
+    )
@@ -2,6 +2,6 @@
 Routers package for PickleJar API endpoints.
 """
 
-from . import members, picklejars, suggestions, votes
+from . import async_routes, members, picklejars, suggestions, votes
 
-__all__ = ["picklejars", "members", "suggestions", "votes"]
+__all__ = ["picklejars", "members", "suggestions", "votes", "async_routes"]
@@ -0,0 +1,128 @@
+"""
+Async versions of the PickleJar routers.
+
+Each sync handler that depends on `get_db` is wrapped in an `async def`
+endpoint that depends on `get_async_db` instead and runs the original
+handler body through `AsyncSession.run_sync`. The handler logic stays in one
+place, while database I/O goes through the async driver (aiosqlite/asyncpg)
+on the event loop instead of occupying a threadpool worker per request.
+
+A handler body runs on the event loop, so it must not wait on anything but
+the async session. Handlers that also do blocking I/O are marked with
+`keep_sync` and stay sync handlers on the threadpool; blocking work done
+before a handler runs belongs in a plain `def` dependency, which FastAPI
+runs on the threadpool either way.
+
+With JAR_CACHE_CHANNEL=sqlite or EVENTS_BACKEND=sqlite every handler stays
+sync: each jar lookup polls the cache's invalidation file and commits and
+events write to local SQLite files, blocking calls that would stall the
+event loop while another worker holds the file's lock.
+"""
+
+import functools
+import inspect
+from typing import Callable
+
+from config import settings
+from database import get_async_db, get_db
+from fastapi import APIRouter, Depends, params
+from fastapi.routing import APIRoute
+
+# APIRoute attributes passed through unchanged to the async route
+ROUTE_OPTIONS = [
+    "response_model",
+    "status_code",
+    "tags",
+    "dependencies",
+    "summary",
+    "description",
+    "response_description",
+    "responses",
+    "deprecated",
+    "methods",
+    "operation_id",
+    "response_model_include",
+    "response_model_exclude",
+    "response_model_by_alias",
+    "response_model_exclude_unset",
+    "response_model_exclude_defaults",
+    "response_model_exclude_none",
+    "include_in_schema",
+    "response_class",
+    "name",
+    "openapi_extra",
+]
+
+
+def keep_sync(when: Callable[[], bool] = lambda: True):
+    """
+    Keep a handler sync (threadpool, sync session) when routes are served
+    async, if `when()` is true when the router is built.
+    """
+
+    def mark(endpoint):
+        endpoint.keep_sync = when
+        return endpoint
+
+    return mark
+
+
+def local_file_channels() -> bool:
+    """Whether the jar cache or live events share state through SQLite files."""
+    return settings.JAR_CACHE_CHANNEL == "sqlite" or settings.EVENTS_BACKEND == "sqlite"
+
+
+def _db_parameter(signature: inspect.Signature):
+    for parameter in signature.parameters.values():
+        if (
+            isinstance(parameter.default, params.Depends)
+            and parameter.default.dependency is get_db
+        ):
+            return parameter
+    return None
+
+
+def to_async_endpoint(endpoint):
+    """
+    Wrap a sync handler using `Depends(get_db)` as an async handler.
+
+    Handlers without a database dependency, or marked with `keep_sync`, are
+    returned unchanged, as is every handler while `local_file_channels()`.
+    """
+    signature = inspect.signature(endpoint)
+    db_parameter = _db_parameter(signature)
+    keep = getattr(endpoint, "keep_sync", None)
+    if db_parameter is None or local_file_channels() or (keep is not None and keep()):
+        return endpoint
+
+    @functools.wraps(endpoint)
+    async def async_endpoint(**kwargs):
+        db = kwargs.pop(db_parameter.name)
+        return await db.run_sync(
+            lambda sync_db: endpoint(**kwargs, **{db_parameter.name: sync_db})
+        )
+
+    async_endpoint.__signature__ = signature.replace(
+        parameters=[
+            parameter.replace(default=Depends(get_async_db))
+            if parameter.name == db_parameter.name
+            else parameter
+            for parameter in signature.parameters.values()
+        ]
+    )
+    return async_endpoint
+
+
+def build_async_router(sync_router: APIRouter) -> APIRouter:
+    """Build a router serving the same routes as `sync_router` asynchronously."""
+    router = APIRouter()
+    for route in sync_router.routes:
+        if not isinstance(route, APIRoute):
+            router.routes.append(route)
+            continue
+        router.add_api_route(
+            route.path,
+            to_async_endpoint(route.endpoint),
+            **{option: getattr(route, option) for option in ROUTE_OPTIONS},
+        )
+    return router
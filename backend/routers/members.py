@@ -1,8 +1,30 @@
-from datetime import datetime
-from typing import List
+import json
+from collections import Counter
+from typing import Iterator, List, Optional
 
+import events
+from config import settings
 from database import get_db
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Request,
+    Response,
+    status,
+)
+from fastapi.responses import StreamingResponse
+from heartbeats import heartbeats
+from jar_cache import get_jar
+from joins import (
+    BulkJoinRow,
+    JoinRequest,
+    bulk_join,
+    normalize_phone,
+    parse_member_list,
+    upsert_members,
+)
 from models import Member, PickleJar
 from schemas import (
     MemberCreate,
@@ -10,7 +32,9 @@ from schemas import (
     MemberStatusResponse,
     MessageResponse,
 )
+from sqlalchemy import func
 from sqlalchemy.orm import Session
+from versioning import ballot_version, bump_version, not_modified
 
 router = APIRouter()
 
@@ -26,9 +50,14 @@ def join_picklejar(
     """
     Join a PickleJar as a member.
     If already joined with this phone number, returns existing member.
+
+    The member is inserted or found with one upsert (see joins.py), and
+    the first member to join becomes the jar's creator in the UPDATE that
+    bumps its version. A rejoin that changes nothing leaves the version
+    alone.
     """
     # Check if PickleJar exists
-    db_picklejar = db.query(PickleJar).filter(PickleJar.id == picklejar_id).first()
+    db_picklejar = get_jar(db, picklejar_id)
     if not db_picklejar:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -41,58 +70,182 @@ def join_picklejar(
             detail="This PickleJar is no longer active",
         )
 
-    # Check if member already exists
-    existing_member = (
-        db.query(Member)
-        .filter(
-            Member.picklejar_id == picklejar_id,
-            Member.phone_number == member_data.phone_number,
+    member, created, changed = upsert_members(
+        db,
+        picklejar_id,
+        [JoinRequest(member_data.phone_number, member_data.display_name)],
+    )[0]
+    if changed:
+        bump_version(
+            db,
+            picklejar_id,
+            creator_phone=func.coalesce(PickleJar.creator_phone, member.phone_number),
         )
-        .first()
-    )
+    db.commit()
+
+    if created:
+        events.publish_participation(db, picklejar_id, "member_joined")
+    else:
+        heartbeats.record(member.id)
+
+    return member
 
-    if existing_member:
-        # Update last active time
-        existing_member.last_active = datetime.utcnow()
-        if member_data.display_name:
-            existing_member.display_name = member_data.display_name
-        if not db_picklejar.creator_phone:
-            db_picklejar.creator_phone = existing_member.phone_number
-        db.commit()
-        db.refresh(existing_member)
-        return existing_member
-
-    # Create new member
-    if not db_picklejar.creator_phone:
-        db_picklejar.creator_phone = member_data.phone_number
-
-    db_member = Member(
-        picklejar_id=picklejar_id,
-        phone_number=member_data.phone_number,
-        display_name=member_data.display_name,
+
+def _too_large(limit: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"At most {limit} per request",
     )
 
-    db.add(db_member)
+
+async def _bulk_join_body(request: Request) -> bytes:
+    # Stop reading as soon as the body outgrows the limit, whatever
+    # Content-Length claims
+    limit = settings.BULK_JOIN_MAX_BYTES
+    too_large = _too_large(f"{limit} bytes")
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > limit:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            raise too_large
+    return bytes(body)
+
+
+async def _member_list(request: Request) -> List[tuple]:
+    """Read a bulk join body (JSON, or CSV with `Content-Type: text/csv`)."""
+    content_type = request.headers.get("content-type", "application/json")
+    body = await _bulk_join_body(request)
+    try:
+        entries = parse_member_list(body, content_type)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if not entries:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="No members to join"
+        )
+    if len(entries) > settings.BULK_JOIN_MAX_ROWS:
+        raise _too_large(f"{settings.BULK_JOIN_MAX_ROWS} members")
+    return entries
+
+
+def _bulk_join_report(outcomes: List[BulkJoinRow]) -> Iterator[str]:
+    # One JSON object per line, then a summary line, sent in chunks
+    counts = Counter(outcome.status for outcome in outcomes)
+    for start in range(0, len(outcomes), 1000):
+        yield "".join(
+            json.dumps({k: v for k, v in outcome._asdict().items() if v is not None})
+            + "\n"
+            for outcome in outcomes[start : start + 1000]
+        )
+    yield json.dumps(
+        {
+            "summary": {
+                outcome: counts[outcome]
+                for outcome in (
+                    "created",
+                    "updated",
+                    "existing",
+                    "duplicate",
+                    "invalid",
+                )
+            }
+        }
+    ) + "\n"
+
+
+@router.post(
+    "/{picklejar_id}/bulk-join",
+    response_class=StreamingResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "example": [
+                        {"phone_number": "+1234567890", "display_name": "Ada"}
+                    ]
+                },
+                "text/csv": {"example": "phone_number,display_name\n+1234567890,Ada"},
+            },
+        }
+    },
+)
+def bulk_join_members(
+    picklejar_id: str,
+    entries: List[tuple] = Depends(_member_list),
+    db: Session = Depends(get_db),
+):
+    """
+    Join a list of members to a PickleJar in one request.
+
+    The body is a JSON list of `{"phone_number", "display_name"}` objects
+    (or of phone numbers), or a CSV file with `Content-Type: text/csv`.
+    Numbers are cleaned like `get_member_by_phone` does and joined with the
+    same upsert as `join_picklejar`, in batches, in one transaction. The
+    response streams one JSON line per row (`created`, `updated`,
+    `existing`, `duplicate` or `invalid`) followed by a summary line.
+    Bodies over BULK_JOIN_MAX_BYTES or BULK_JOIN_MAX_ROWS rows get 413.
+    """
+    db_picklejar = get_jar(db, picklejar_id)
+    if not db_picklejar:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"PickleJar with id {picklejar_id} not found",
+        )
+
+    if not db_picklejar.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="This PickleJar is no longer active",
+        )
+
+    outcomes = bulk_join(db, picklejar_id, entries)
+    joined = [o for o in outcomes if o.status in ("created", "updated", "existing")]
+    if any(o.status in ("created", "updated") for o in joined):
+        first_phone = joined[0].phone_number
+        bump_version(
+            db,
+            picklejar_id,
+            creator_phone=func.coalesce(PickleJar.creator_phone, first_phone),
+        )
     db.commit()
-    db.refresh(db_member)
+    if any(o.status == "created" for o in outcomes):
+        events.publish_participation(db, picklejar_id, "member_joined")
 
-    return db_member
+    return StreamingResponse(
+        _bulk_join_report(outcomes), media_type="application/x-ndjson"
+    )
 
 
 @router.get("/{picklejar_id}/members", response_model=List[MemberStatusResponse])
-def get_picklejar_members(picklejar_id: str, db: Session = Depends(get_db)):
+def get_picklejar_members(
+    picklejar_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
     """
     Get all members in a PickleJar (anonymized view).
     Shows participation status but not personal details.
+    Supports conditional requests via the jar's ETag.
     """
     # Check if PickleJar exists
-    db_picklejar = db.query(PickleJar).filter(PickleJar.id == picklejar_id).first()
+    db_picklejar = get_jar(db, picklejar_id)
     if not db_picklejar:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"PickleJar with id {picklejar_id} not found",
         )
 
+    cached = not_modified(
+        db_picklejar, if_none_match, response, ballots=ballot_version(db, db_picklejar)
+    )
+    if cached:
+        return cached
+
     members = (
         db.query(Member)
         .filter(Member.picklejar_id == picklejar_id, Member.is_active == True)
@@ -137,7 +290,7 @@ def get_member_by_phone(
     Useful for session management.
     """
     # Clean phone number
-    cleaned_phone = "".join(c for c in phone_number if c.isdigit() or c == "+")
+    cleaned_phone = normalize_phone(phone_number)
 
     db_member = (
         db.query(Member)
@@ -155,9 +308,8 @@ def get_member_by_phone(
             detail=f"Member with phone {phone_number} not found in this PickleJar",
         )
 
-    # Update last active
-    db_member.last_active = datetime.utcnow()
-    db.commit()
+    # Buffered, so the lookup stays a pure read
+    heartbeats.record(db_member.id)
 
     return db_member
 
@@ -178,7 +330,8 @@ def update_display_name(
         )
 
     db_member.display_name = display_name
-    db_member.last_active = datetime.utcnow()
+    heartbeats.record(db_member.id)
+    bump_version(db, db_member.picklejar_id)
     db.commit()
     db.refresh(db_member)
 
@@ -199,8 +352,11 @@ def leave_picklejar(member_id: str, db: Session = Depends(get_db)):
         )
 
     db_member.is_active = False
+    bump_version(db, db_member.picklejar_id)
     db.commit()
 
+    events.publish_participation(db, db_member.picklejar_id, "member_left")
+
     return MessageResponse(
         message="Successfully left PickleJar",
         detail=f"You have been removed from the group",
@@ -1,24 +1,70 @@
 from datetime import datetime
-from typing import List
+from typing import List, Optional, Sequence, Union
 
+import events
+from ballot_queue import ballot_queue, queued_ingestion
+from config import settings
 from database import get_db
-from fastapi import APIRouter, Depends, HTTPException, status
-from models import Member, PickleJar, Suggestion
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
+from jar_cache import JarSnapshot, get_jar
+from models import Member, PickleJar, Suggestion, generate_short_id
+from results import (
+    build_results,
+    freeze_results,
+    frozen_results,
+    thaw_results,
+)
+from routers.async_routes import keep_sync
+from scheduler import scheduler
 from schemas import (
+    MemberStatusResponse,
     MessageResponse,
     PickleJarCreate,
     PickleJarDetailResponse,
     PickleJarResponse,
+    PickleJarSnapshotResponse,
     PickleJarStatsResponse,
     PickleJarUpdate,
     ResultsResponse,
-    SuggestionWithVotesResponse,
-    WinnerResponse,
+    VoteSummaryResponse,
 )
+from scoring import RULES
+from sqlalchemy import exists, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from tallies import member_votes, participation_counts
+from transitions import (
+    if_match_versions,
+    points_per_voter,
+    suggestion_count,
+    transition_status,
+)
+from versioning import ballot_version, bump_version, not_modified
+from voting_context import get_voting_context, invalidate_voting_context_on_commit
 
 router = APIRouter()
 
+# Short IDs to try before giving up. A collision needs an ID space that is
+# already crowded, so a second draw nearly always succeeds
+SHORT_ID_ATTEMPTS = 5
+
+
+def _insert_with_short_id(db: Session, db_picklejar: PickleJar) -> None:
+    """Commit a new PickleJar, drawing a new short ID if one is taken."""
+    for _ in range(SHORT_ID_ATTEMPTS):
+        db_picklejar.id = generate_short_id()
+        db.add(db_picklejar)
+        try:
+            db.commit()
+            return
+        except IntegrityError:
+            db.rollback()
+    raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Could not allocate a PickleJar ID, please try again",
+    )
+
 
 @router.post("/", response_model=PickleJarResponse, status_code=status.HTTP_201_CREATED)
 def create_picklejar(picklejar: PickleJarCreate, db: Session = Depends(get_db)):
@@ -43,8 +89,7 @@ def create_picklejar(picklejar: PickleJarCreate, db: Session = Depends(get_db)):
         status="setup",
     )
 
-    db.add(db_picklejar)
-    db.commit()
+    _insert_with_short_id(db, db_picklejar)
     db.refresh(db_picklejar)
 
     # Automatically add creator as first member only if a phone was provided
@@ -58,66 +103,49 @@ def create_picklejar(picklejar: PickleJarCreate, db: Session = Depends(get_db)):
         db.add(creator_member)
         db.commit()
 
-    return db_picklejar
-
+    scheduler.schedule_jar(db_picklejar)
 
-def _check_and_update_status(db_picklejar: PickleJar, db: Session):
-    """
-    Lazy check for deadline expiration.
-    Updates status if deadlines have passed.
-    """
-    now = datetime.utcnow()
-    changed = False
+    return db_picklejar
 
-    # Check suggestion deadline
-    if (
-        db_picklejar.status == "suggesting"
-        and db_picklejar.suggestion_deadline
-        and now > db_picklejar.suggestion_deadline
-    ):
-        # Check if there are any suggestions before advancing
-        suggestion_count = (
-            db.query(Suggestion)
-            .filter(Suggestion.picklejar_id == db_picklejar.id)
-            .count()
-        )
 
-        # Only advance if there are suggestions (otherwise we can't calculate points)
-        if suggestion_count > 0:
-            # Derive points_per_voter logic (same as start_voting_phase)
-            if suggestion_count > 1:
-                db_picklejar.points_per_voter = max(suggestion_count - 1, 1)
-            else:
-                db_picklejar.points_per_voter = 1
-
-            db_picklejar.status = "voting"
-            changed = True
-
-    # Check voting deadline
-    # Note: We check this even if we just transitioned to voting
-    if (
-        db_picklejar.status == "voting"
-        and db_picklejar.voting_deadline
-        and now > db_picklejar.voting_deadline
-    ):
-        db_picklejar.status = "completed"
-        changed = True
-
-    if changed:
-        db_picklejar.updated_at = now
-        db.commit()
-        db.refresh(db_picklejar)
+def _detail_response(db_picklejar: JarSnapshot, counts: dict) -> PickleJarDetailResponse:
+    """Combine a jar row with its `participation_counts`."""
+    return PickleJarDetailResponse(
+        id=db_picklejar.id,
+        title=db_picklejar.title,
+        description=db_picklejar.description,
+        points_per_voter=db_picklejar.points_per_voter,
+        max_suggestions_per_member=db_picklejar.max_suggestions_per_member,
+        suggestion_deadline=db_picklejar.suggestion_deadline,
+        voting_deadline=db_picklejar.voting_deadline,
+        hangout_datetime=db_picklejar.hangout_datetime,
+        status=db_picklejar.status,
+        is_active=db_picklejar.is_active,
+        created_at=db_picklejar.created_at,
+        updated_at=db_picklejar.updated_at,
+        creator_phone=db_picklejar.creator_phone,
+        member_count=counts["member_count"],
+        suggestion_count=counts["suggestion_count"],
+        members_who_suggested=counts["members_who_suggested"],
+        members_who_voted=counts["members_who_voted"],
+    )
 
 
 @router.get("/{picklejar_id}", response_model=PickleJarDetailResponse)
-def get_picklejar(picklejar_id: str, db: Session = Depends(get_db)):
+def get_picklejar(
+    picklejar_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
     """
     Get a PickleJar by ID with member and suggestion counts.
 
-    Performs a lazy check on deadlines: if suggestion or voting deadlines
-    have passed, the status is automatically updated before returning.
+    This is a pure read: phases are advanced at their deadlines by the
+    background scheduler in `scheduler.py`. Supports conditional requests
+    via the jar's ETag.
     """
-    db_picklejar = db.query(PickleJar).filter(PickleJar.id == picklejar_id).first()
+    db_picklejar = get_jar(db, picklejar_id)
 
     if not db_picklejar:
         raise HTTPException(
@@ -125,42 +153,49 @@ def get_picklejar(picklejar_id: str, db: Session = Depends(get_db)):
             detail=f"PickleJar with id {picklejar_id} not found",
         )
 
-    # Lazy check for deadlines
-    _check_and_update_status(db_picklejar, db)
+    cached = not_modified(
+        db_picklejar, if_none_match, response, ballots=ballot_version(db, db_picklejar)
+    )
+    if cached:
+        return cached
 
     # Get counts
-    members = db.query(Member).filter(Member.picklejar_id == picklejar_id).all()
-    suggestions = (
-        db.query(Suggestion).filter(Suggestion.picklejar_id == picklejar_id).all()
-    )
+    counts = participation_counts(db, picklejar_id)
 
-    member_count = len(members)
-    suggestion_count = len(suggestions)
-    members_who_suggested = sum(1 for m in members if m.has_suggested)
-    members_who_voted = sum(1 for m in members if m.has_voted)
+    return _detail_response(db_picklejar, counts)
 
-    # Convert to response model
-    response = PickleJarDetailResponse(
-        id=db_picklejar.id,
-        title=db_picklejar.title,
-        description=db_picklejar.description,
-        points_per_voter=db_picklejar.points_per_voter,
-        max_suggestions_per_member=db_picklejar.max_suggestions_per_member,
-        suggestion_deadline=db_picklejar.suggestion_deadline,
-        voting_deadline=db_picklejar.voting_deadline,
-        hangout_datetime=db_picklejar.hangout_datetime,
-        status=db_picklejar.status,
-        is_active=db_picklejar.is_active,
-        created_at=db_picklejar.created_at,
-        updated_at=db_picklejar.updated_at,
-        creator_phone=db_picklejar.creator_phone,
-        member_count=member_count,
-        suggestion_count=suggestion_count,
-        members_who_suggested=members_who_suggested,
-        members_who_voted=members_who_voted,
-    )
 
-    return response
+@router.get("/{picklejar_id}/events")
+def stream_picklejar_events(
+    picklejar_id: str,
+    last_event_id: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """
+    Stream live changes to a PickleJar as Server-Sent Events.
+
+    Event types: `status`, `member_joined`, `member_left`, `suggestion_added`,
+    `suggestion_removed`, `ballot_submitted` and `ballot_cleared`. Each event
+    carries a snapshot (new status, participation counts and, for ballots,
+    suggestion tallies), and bursts of the same type are coalesced into the
+    latest one. Reconnecting clients resume after the `Last-Event-ID` header;
+    a `resync` event means they should reload the jar instead.
+    """
+    if not get_jar(db, picklejar_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"PickleJar with id {picklejar_id} not found",
+        )
+
+    resume_from = None
+    if last_event_id and last_event_id.isdigit():
+        resume_from = int(last_event_id)
+
+    return StreamingResponse(
+        events.broker.stream(picklejar_id, resume_from),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.patch("/{picklejar_id}", response_model=PickleJarResponse)
@@ -180,38 +215,124 @@ def update_picklejar(
 
     # Update fields if provided
     update_data = picklejar.model_dump(exclude_unset=True)
+    if "status" in update_data:
+        # Phase changes have their own conditional transitions
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=(
+                "Status cannot be updated directly; use start-suggesting, "
+                "start-voting, complete, revert-to-* or DELETE"
+            ),
+        )
     for field, value in update_data.items():
         setattr(db_picklejar, field, value)
 
     db_picklejar.updated_at = datetime.utcnow()
+    bump_version(db, picklejar_id)
     db.commit()
     db.refresh(db_picklejar)
 
+    scheduler.schedule_jar(db_picklejar)
+
     return db_picklejar
 
 
-@router.post("/{picklejar_id}/start-suggesting", response_model=MessageResponse)
-def start_suggesting_phase(picklejar_id: str, db: Session = Depends(get_db)):
-    """
-    Move PickleJar to the 'suggesting' phase.
+def _transition(
+    db: Session,
+    picklejar_id: str,
+    from_status: Union[str, Sequence[str]],
+    to_status: str,
+    action: str,
+    if_match: Optional[str],
+    *conditions,
+    unmet: Optional[HTTPException] = None,
+    **kwargs,
+):
     """
-    db_picklejar = db.query(PickleJar).filter(PickleJar.id == picklejar_id).first()
+    Run a phase transition (see transitions.py) and return the updated row.
 
-    if not db_picklejar:
+    Only a transition that matched nothing reads the jar, to tell a missing
+    jar (404), a different phase (400) or a stale `If-Match` (412) apart.
+    `unmet` is raised when none of those apply, i.e. one of `conditions`
+    failed; otherwise the jar changed under the request (409).
+    """
+    versions = if_match_versions(picklejar_id, if_match)
+    row = transition_status(
+        db,
+        picklejar_id,
+        from_status,
+        to_status,
+        *conditions,
+        versions=versions,
+        **kwargs,
+    )
+    if row is not None:
+        return row
+
+    # Release the write lock SQLite took for the UPDATE before reading
+    db.rollback()
+    current = db.execute(
+        select(PickleJar.status, PickleJar.version).where(PickleJar.id == picklejar_id)
+    ).first()
+    if current is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"PickleJar with id {picklejar_id} not found",
         )
-
-    if db_picklejar.status != "setup":
+    from_statuses = [from_status] if isinstance(from_status, str) else from_status
+    if current.status not in from_statuses:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Cannot start suggesting phase from status '{db_picklejar.status}'",
+            detail=f"Cannot {action} from status '{current.status}'",
+        )
+    if versions is not None and current.version not in versions:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="PickleJar has changed since it was loaded",
         )
+    raise unmet or HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="PickleJar changed during the request, please try again",
+    )
 
-    db_picklejar.status = "suggesting"
-    db_picklejar.updated_at = datetime.utcnow()
+
+def _apply_queued_ballots(picklejar_id: str) -> None:
+    """
+    Dependency applying a jar's waiting ballots before its phase changes.
+
+    A plain function, so FastAPI runs it on the threadpool: applying opens
+    its own session and may wait on the log's lock file, which must not
+    block the event loop when routes are async.
+    """
+    ballot_queue.apply_jar(picklejar_id)
+
+
+def _apply_members_ballot(picklejar_id: str, member_id: Optional[str] = None) -> None:
+    """
+    Dependency applying the jar's waiting ballots when the requesting member
+    has one waiting, so results and the snapshot include their own ballot
+    (and its ETag changes with it). Runs on the threadpool, like
+    `_apply_queued_ballots`.
+    """
+    if member_id:
+        ballot_queue.apply_member(picklejar_id, member_id)
+
+
+@router.post("/{picklejar_id}/start-suggesting", response_model=MessageResponse)
+def start_suggesting_phase(
+    picklejar_id: str,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """
+    Move PickleJar to the 'suggesting' phase.
+    """
+    db_picklejar = _transition(
+        db, picklejar_id, "setup", "suggesting", "start suggesting phase", if_match
+    )
     db.commit()
+    events.publish_status(picklejar_id, "suggesting")
+    scheduler.schedule_jar(db_picklejar)
 
     return MessageResponse(
         message="Suggesting phase started",
@@ -220,7 +341,11 @@ def start_suggesting_phase(picklejar_id: str, db: Session = Depends(get_db)):
 
 
 @router.post("/{picklejar_id}/start-voting", response_model=MessageResponse)
-def start_voting_phase(picklejar_id: str, db: Session = Depends(get_db)):
+def start_voting_phase(
+    picklejar_id: str,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
     """
     Move PickleJar to the 'voting' phase.
 
@@ -231,73 +356,57 @@ def start_voting_phase(picklejar_id: str, db: Session = Depends(get_db)):
     This value is then enforced by the voting endpoint and should not be
     configured directly by clients.
     """
-    db_picklejar = db.query(PickleJar).filter(PickleJar.id == picklejar_id).first()
-
-    if not db_picklejar:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"PickleJar with id {picklejar_id} not found",
-        )
-
-    if db_picklejar.status != "suggesting":
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Cannot start voting phase from status '{db_picklejar.status}'",
-        )
-
-    # Check if there are any suggestions
-    suggestion_count = (
-        db.query(Suggestion).filter(Suggestion.picklejar_id == picklejar_id).count()
-    )
-
-    if suggestion_count == 0:
-        raise HTTPException(
+    # Counted in the UPDATE, so a suggestion added meanwhile is included
+    row = _transition(
+        db,
+        picklejar_id,
+        "suggesting",
+        "voting",
+        "start voting phase",
+        if_match,
+        exists().where(Suggestion.picklejar_id == picklejar_id),
+        unmet=HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Cannot start voting with no suggestions",
-        )
-
-    # Derive points_per_voter from the number of suggestions (n - 1, with a minimum of 1)
-    if suggestion_count > 1:
-        db_picklejar.points_per_voter = max(suggestion_count - 1, 1)
-    else:
-        # If there is only one suggestion, fall back to 1 point
-        db_picklejar.points_per_voter = 1
-
-    db_picklejar.status = "voting"
-    db_picklejar.updated_at = datetime.utcnow()
+        ),
+        points_per_voter=points_per_voter(picklejar_id),
+        returning=[suggestion_count(picklejar_id).label("suggestion_count")],
+    )
+    invalidate_voting_context_on_commit(db, picklejar_id)
     db.commit()
+    events.publish_status(picklejar_id, "voting")
+    db_picklejar = JarSnapshot.from_row(row)
+    scheduler.schedule_jar(db_picklejar)
+    # Ballots are validated against this from now on (see voting_context.py)
+    get_voting_context(db, db_picklejar)
 
     return MessageResponse(
         message="Voting phase started",
         detail=(
-            f"Members can now vote on {suggestion_count} suggestion(s) with "
+            f"Members can now vote on {row.suggestion_count} suggestion(s) with "
             f"up to {db_picklejar.points_per_voter} point(s) each"
         ),
     )
 
 
-@router.post("/{picklejar_id}/complete", response_model=MessageResponse)
-def complete_picklejar(picklejar_id: str, db: Session = Depends(get_db)):
+# Ballots accepted by the ballot queue count towards the frozen results
+@router.post(
+    "/{picklejar_id}/complete",
+    response_model=MessageResponse,
+    dependencies=[Depends(_apply_queued_ballots)],
+)
+def complete_picklejar(
+    picklejar_id: str,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
     """
     Complete the PickleJar and reveal results.
     """
-    db_picklejar = db.query(PickleJar).filter(PickleJar.id == picklejar_id).first()
-
-    if not db_picklejar:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"PickleJar with id {picklejar_id} not found",
-        )
-
-    if db_picklejar.status != "voting":
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Cannot complete from status '{db_picklejar.status}'",
-        )
-
-    db_picklejar.status = "completed"
-    db_picklejar.updated_at = datetime.utcnow()
+    _transition(db, picklejar_id, "voting", "completed", "complete", if_match)
+    freeze_results(db, picklejar_id)
     db.commit()
+    events.publish_status(picklejar_id, "completed")
 
     return MessageResponse(
         message="PickleJar completed",
@@ -306,27 +415,17 @@ def complete_picklejar(picklejar_id: str, db: Session = Depends(get_db)):
 
 
 @router.post("/{picklejar_id}/revert-to-setup", response_model=MessageResponse)
-def revert_to_setup(picklejar_id: str, db: Session = Depends(get_db)):
+def revert_to_setup(
+    picklejar_id: str,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
     """
     Revert PickleJar to the 'setup' phase.
     """
-    db_picklejar = db.query(PickleJar).filter(PickleJar.id == picklejar_id).first()
-
-    if not db_picklejar:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"PickleJar with id {picklejar_id} not found",
-        )
-
-    if db_picklejar.status != "suggesting":
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Cannot revert to setup from status '{db_picklejar.status}'",
-        )
-
-    db_picklejar.status = "setup"
-    db_picklejar.updated_at = datetime.utcnow()
+    _transition(db, picklejar_id, "suggesting", "setup", "revert to setup", if_match)
     db.commit()
+    events.publish_status(picklejar_id, "setup")
 
     return MessageResponse(
         message="Reverted to setup phase",
@@ -334,28 +433,27 @@ def revert_to_setup(picklejar_id: str, db: Session = Depends(get_db)):
     )
 
 
-@router.post("/{picklejar_id}/revert-to-suggesting", response_model=MessageResponse)
-def revert_to_suggesting(picklejar_id: str, db: Session = Depends(get_db)):
+@router.post(
+    "/{picklejar_id}/revert-to-suggesting",
+    response_model=MessageResponse,
+    dependencies=[Depends(_apply_queued_ballots)],
+)
+def revert_to_suggesting(
+    picklejar_id: str,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
     """
     Revert PickleJar to the 'suggesting' phase.
     """
-    db_picklejar = db.query(PickleJar).filter(PickleJar.id == picklejar_id).first()
-
-    if not db_picklejar:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"PickleJar with id {picklejar_id} not found",
-        )
-
-    if db_picklejar.status != "voting":
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Cannot revert to suggesting from status '{db_picklejar.status}'",
-        )
-
-    db_picklejar.status = "suggesting"
-    db_picklejar.updated_at = datetime.utcnow()
+    db_picklejar = _transition(
+        db, picklejar_id, "voting", "suggesting", "revert to suggesting", if_match
+    )
+    # Suggestions can change again, so the next voting round needs a new context
+    invalidate_voting_context_on_commit(db, picklejar_id)
     db.commit()
+    events.publish_status(picklejar_id, "suggesting")
+    scheduler.schedule_jar(db_picklejar)
 
     return MessageResponse(
         message="Reverted to suggesting phase",
@@ -364,27 +462,21 @@ def revert_to_suggesting(picklejar_id: str, db: Session = Depends(get_db)):
 
 
 @router.post("/{picklejar_id}/revert-to-voting", response_model=MessageResponse)
-def revert_to_voting(picklejar_id: str, db: Session = Depends(get_db)):
+def revert_to_voting(
+    picklejar_id: str,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
     """
     Revert PickleJar to the 'voting' phase.
     """
-    db_picklejar = db.query(PickleJar).filter(PickleJar.id == picklejar_id).first()
-
-    if not db_picklejar:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"PickleJar with id {picklejar_id} not found",
-        )
-
-    if db_picklejar.status != "completed":
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Cannot revert to voting from status '{db_picklejar.status}'",
-        )
-
-    db_picklejar.status = "voting"
-    db_picklejar.updated_at = datetime.utcnow()
+    db_picklejar = _transition(
+        db, picklejar_id, "completed", "voting", "revert to voting", if_match
+    )
+    thaw_results(db, picklejar_id)
     db.commit()
+    events.publish_status(picklejar_id, "voting")
+    scheduler.schedule_jar(db_picklejar)
 
     return MessageResponse(
         message="Reverted to voting phase",
@@ -397,7 +489,7 @@ def get_picklejar_stats(picklejar_id: str, db: Session = Depends(get_db)):
     """
     Get statistics for a PickleJar.
     """
-    db_picklejar = db.query(PickleJar).filter(PickleJar.id == picklejar_id).first()
+    db_picklejar = get_jar(db, picklejar_id)
 
     if not db_picklejar:
         raise HTTPException(
@@ -405,31 +497,55 @@ def get_picklejar_stats(picklejar_id: str, db: Session = Depends(get_db)):
             detail=f"PickleJar with id {picklejar_id} not found",
         )
 
-    members = db.query(Member).filter(Member.picklejar_id == picklejar_id).all()
-    suggestions = (
-        db.query(Suggestion).filter(Suggestion.picklejar_id == picklejar_id).all()
-    )
-
-    total_votes = sum(len(suggestion.votes) for suggestion in suggestions)
+    counts = participation_counts(db, picklejar_id)
 
     return PickleJarStatsResponse(
         picklejar_id=picklejar_id,
-        total_members=len(members),
-        total_suggestions=len(suggestions),
-        members_suggested=sum(1 for m in members if m.has_suggested),
-        members_voted=sum(1 for m in members if m.has_voted),
-        total_votes_cast=total_votes,
+        total_members=counts["member_count"],
+        total_suggestions=counts["suggestion_count"],
+        members_suggested=counts["members_who_suggested"],
+        members_voted=counts["members_who_voted"],
+        total_votes_cast=counts["total_votes_cast"],
         status=db_picklejar.status,
     )
 
 
-@router.get("/{picklejar_id}/results", response_model=ResultsResponse)
-def get_results(picklejar_id: str, db: Session = Depends(get_db)):
+@router.get(
+    "/{picklejar_id}/results",
+    response_model=ResultsResponse,
+    dependencies=[Depends(_apply_members_ballot)],
+)
+def get_results(
+    picklejar_id: str,
+    response: Response,
+    rule: Optional[str] = None,
+    version: Optional[int] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
     """
     Get final results for a completed PickleJar.
     Only available after voting is complete.
+    Supports conditional requests via the jar's ETag. Once the jar is
+    completed the results are served from the snapshot stored at completion
+    (see results.py).
+
+    `rule` ranks the suggestions by another scoring rule than the configured
+    one: points, borda, approval or irv. `version` pins the request to the
+    jar version in its ETag; the frozen results of that version never
+    change, so they may be cached for COMPLETED_JAR_MAX_AGE. With queued
+    ballot ingestion, `member_id` makes the results include that member's
+    ballot even if it is still waiting in the queue.
     """
-    db_picklejar = db.query(PickleJar).filter(PickleJar.id == picklejar_id).first()
+    if rule is not None and rule not in RULES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown scoring rule '{rule}'. Use one of: {', '.join(RULES)}",
+        )
+
+    # Other members' ballots still waiting in the ballot queue are left to
+    # its next flush; completing the jar applies them before results are frozen
+    db_picklejar = get_jar(db, picklejar_id)
 
     if not db_picklejar:
         raise HTTPException(
@@ -443,108 +559,169 @@ def get_results(picklejar_id: str, db: Session = Depends(get_db)):
             detail="Results are only available during or after voting phase",
         )
 
-    # Get all suggestions with their votes
-    suggestions = (
-        db.query(Suggestion).filter(Suggestion.picklejar_id == picklejar_id).all()
+    # A completed jar's results were encoded when it completed
+    default_rule = rule is None or rule == settings.SCORING_RULE
+    pinned = (
+        default_rule
+        and version == db_picklejar.version
+        and db_picklejar.status == "completed"
+    )
+    cached = not_modified(
+        db_picklejar,
+        if_none_match,
+        response,
+        immutable=pinned,
+        ballots=ballot_version(db, db_picklejar),
+    )
+    if cached:
+        return cached
+
+    if default_rule:
+        frozen = frozen_results(db, db_picklejar)
+        if frozen is not None:
+            return Response(
+                content=frozen, media_type="application/json", headers=response.headers
+            )
+
+    # Reads never write: a jar completed before snapshots existed has its
+    # results built on every view
+    return build_results(
+        db, db_picklejar, participation_counts(db, picklejar_id), rule
     )
 
-    suggestions_with_votes = []
-    for suggestion in suggestions:
-        total_points = sum(vote.points for vote in suggestion.votes)
-        suggestions_with_votes.append(
-            {
-                "suggestion": suggestion,
-                "total_points": total_points,
-                "vote_count": len(suggestion.votes),
-            }
-        )
 
-    # Sort by points (descending)
-    suggestions_with_votes.sort(key=lambda x: x["total_points"], reverse=True)
-
-    # Get winner
-    winner = None
-    if suggestions_with_votes:
-        top_suggestion = suggestions_with_votes[0]
-        winner = WinnerResponse(
-            suggestion=SuggestionWithVotesResponse(
-                id=top_suggestion["suggestion"].id,
-                picklejar_id=top_suggestion["suggestion"].picklejar_id,
-                title=top_suggestion["suggestion"].title,
-                description=top_suggestion["suggestion"].description,
-                location=top_suggestion["suggestion"].location,
-                estimated_cost=top_suggestion["suggestion"].estimated_cost,
-                is_active=top_suggestion["suggestion"].is_active,
-                created_at=top_suggestion["suggestion"].created_at,
-                total_points=top_suggestion["total_points"],
-                member_id=top_suggestion["suggestion"].member_id,
-                member_phone=top_suggestion["suggestion"].member.phone_number
-                if db_picklejar.status == "completed"
-                else None,
-            ),
-            total_points=top_suggestion["total_points"],
-            vote_count=top_suggestion["vote_count"],
-        )
+@router.get(
+    "/{picklejar_id}/snapshot",
+    response_model=PickleJarSnapshotResponse,
+    dependencies=[Depends(_apply_members_ballot)],
+)
+# Reads the ballot queue's log for the member's waiting ballot
+@keep_sync(when=queued_ingestion)
+def get_picklejar_snapshot(
+    picklejar_id: str,
+    response: Response,
+    member_id: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """
+    Get everything the shared jar page needs in one response.
+
+    Combines the jar detail, anonymized members, active suggestions, the
+    requesting member's own record and votes (when `member_id` is given) and
+    the results (during voting or once completed). The same anonymity rules
+    as the individual endpoints apply. Uses at most seven queries (eight with
+    packed ballot storage, up to three more for a SCORING_RULE that reads
+    ballots) regardless of jar size, and never writes. With queued ballot
+    ingestion a ballot of the member still in the queue is applied first,
+    so their votes, the results and the ETag include it.
+    """
+    db_picklejar = get_jar(db, picklejar_id)
 
-    # Get all suggestions
-    all_suggestions = [
-        SuggestionWithVotesResponse(
-            id=s["suggestion"].id,
-            picklejar_id=s["suggestion"].picklejar_id,
-            title=s["suggestion"].title,
-            description=s["suggestion"].description,
-            location=s["suggestion"].location,
-            estimated_cost=s["suggestion"].estimated_cost,
-            is_active=s["suggestion"].is_active,
-            created_at=s["suggestion"].created_at,
-            total_points=s["total_points"],
-            member_id=s["suggestion"].member_id,
-            member_phone=s["suggestion"].member.phone_number
-            if db_picklejar.status == "completed"
-            else None,
+    if not db_picklejar:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"PickleJar with id {picklejar_id} not found",
         )
-        for s in suggestions_with_votes
-    ]
 
-    # Get stats
-    members = db.query(Member).filter(Member.picklejar_id == picklejar_id).all()
-    total_votes = sum(s["vote_count"] for s in suggestions_with_votes)
+    cached = not_modified(
+        db_picklejar, if_none_match, response, ballots=ballot_version(db, db_picklejar)
+    )
+    if cached:
+        return cached
 
-    stats = PickleJarStatsResponse(
-        picklejar_id=picklejar_id,
-        total_members=len(members),
-        total_suggestions=len(suggestions),
-        members_suggested=sum(1 for m in members if m.has_suggested),
-        members_voted=sum(1 for m in members if m.has_voted),
-        total_votes_cast=total_votes,
-        status=db_picklejar.status,
+    counts = participation_counts(db, picklejar_id)
+
+    members = (
+        db.query(Member)
+        .filter(Member.picklejar_id == picklejar_id, Member.is_active == True)
+        .all()
+    )
+    suggestions = (
+        db.query(Suggestion)
+        .filter(Suggestion.picklejar_id == picklejar_id, Suggestion.is_active == True)
+        .all()
     )
 
-    return ResultsResponse(
-        picklejar=db_picklejar,
-        winner=winner,
-        all_suggestions=all_suggestions,
-        stats=stats,
+    db_member = None
+    vote_summary = None
+    if member_id:
+        db_member = (
+            db.query(Member)
+            .filter(Member.id == member_id, Member.picklejar_id == picklejar_id)
+            .first()
+        )
+        if not db_member:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Member not found in this PickleJar",
+            )
+
+        votes = None
+        if queued_ingestion():
+            votes = ballot_queue.pending_votes(picklejar_id, member_id)
+        if votes is None:
+            votes = member_votes(db, picklejar_id, member_id)
+        # Same n - 1 rule as the votes endpoints, computed here without
+        # persisting it so the snapshot stays a pure read
+        points_per_voter = db_picklejar.points_per_voter
+        if not points_per_voter or points_per_voter <= 0:
+            points_per_voter = max(counts["member_count"] - 1, 1)
+        total_points = sum(vote["points"] for vote in votes)
+        vote_summary = VoteSummaryResponse(
+            total_points_allocated=total_points,
+            remaining_points=points_per_voter - total_points,
+            votes=votes,
+        )
+
+    results = None
+    if db_picklejar.status in ["completed", "voting"]:
+        frozen = frozen_results(db, db_picklejar)
+        if frozen is not None:
+            results = ResultsResponse.model_validate_json(frozen)
+        else:
+            results = build_results(db, db_picklejar, counts)
+
+    return PickleJarSnapshotResponse(
+        picklejar=_detail_response(db_picklejar, counts),
+        members=[
+            MemberStatusResponse(
+                display_name=member.display_name or "Anonymous",
+                has_suggested=member.has_suggested,
+                has_voted=member.has_voted,
+                joined_at=member.joined_at,
+            )
+            for member in members
+        ],
+        suggestions=suggestions,
+        member=db_member,
+        votes=vote_summary,
+        results=results,
     )
 
 
 @router.delete("/{picklejar_id}", response_model=MessageResponse)
-def delete_picklejar(picklejar_id: str, db: Session = Depends(get_db)):
+def delete_picklejar(
+    picklejar_id: str,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
     """
     Delete a PickleJar (soft delete by setting is_active to False).
     """
-    db_picklejar = db.query(PickleJar).filter(PickleJar.id == picklejar_id).first()
-
-    if not db_picklejar:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"PickleJar with id {picklejar_id} not found",
-        )
-
-    db_picklejar.is_active = False
-    db_picklejar.status = "cancelled"
-    db_picklejar.updated_at = datetime.utcnow()
+    db_picklejar = _transition(
+        db,
+        picklejar_id,
+        ("setup", "suggesting", "voting", "completed"),
+        "cancelled",
+        "cancel",
+        if_match,
+        is_active=False,
+    )
+    invalidate_voting_context_on_commit(db, picklejar_id)
     db.commit()
+    events.publish_status(picklejar_id, "cancelled")
+    scheduler.cancel(picklejar_id)
 
     return MessageResponse(
         message="PickleJar deleted successfully",
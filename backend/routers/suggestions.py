@@ -1,10 +1,14 @@
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
+import events
+from ballots import next_ordinal
 from config import settings
 from database import get_db
-from fastapi import APIRouter, Depends, HTTPException, status
-from models import Member, PickleJar, Suggestion
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from heartbeats import heartbeats
+from jar_cache import get_jar
+from models import Member, Suggestion
 from schemas import (
     MessageResponse,
     SuggestionCreate,
@@ -12,6 +16,7 @@ from schemas import (
     SuggestionUpdate,
 )
 from sqlalchemy.orm import Session
+from versioning import bump_version, not_modified
 
 router = APIRouter()
 
@@ -113,7 +118,7 @@ def create_suggestion(
     Requires member_id as query parameter for authentication.
     """
     # Check if PickleJar exists and is in correct phase
-    db_picklejar = db.query(PickleJar).filter(PickleJar.id == picklejar_id).first()
+    db_picklejar = get_jar(db, picklejar_id)
     if not db_picklejar:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -173,28 +178,43 @@ def create_suggestion(
 
     # Update member status
     db_member.has_suggested = True
-    db_member.last_active = datetime.utcnow()
+    heartbeats.record(db_member.id)
 
+    bump_version(db, picklejar_id)
+    # The version bump holds the jar row lock, so ordinals are handed out in turn
+    db_suggestion.ordinal = next_ordinal(db, picklejar_id)
     db.commit()
     db.refresh(db_suggestion)
 
+    events.publish_participation(db, picklejar_id, "suggestion_added")
+
     return db_suggestion
 
 
 @router.get("/{picklejar_id}/suggestions", response_model=List[SuggestionResponse])
-def get_suggestions(picklejar_id: str, db: Session = Depends(get_db)):
+def get_suggestions(
+    picklejar_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
     """
     Get all suggestions for a PickleJar.
     Suggestions are anonymous until voting is complete.
+    Supports conditional requests via the jar's ETag.
     """
     # Check if PickleJar exists
-    db_picklejar = db.query(PickleJar).filter(PickleJar.id == picklejar_id).first()
+    db_picklejar = get_jar(db, picklejar_id)
     if not db_picklejar:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"PickleJar with id {picklejar_id} not found",
         )
 
+    cached = not_modified(db_picklejar, if_none_match, response)
+    if cached:
+        return cached
+
     # Get all active suggestions
     suggestions = (
         db.query(Suggestion)
@@ -256,9 +276,7 @@ def update_suggestion(
         )
 
     # Check if PickleJar is still in suggesting phase
-    db_picklejar = (
-        db.query(PickleJar).filter(PickleJar.id == db_suggestion.picklejar_id).first()
-    )
+    db_picklejar = get_jar(db, db_suggestion.picklejar_id)
 
     if db_picklejar.status not in ["setup", "suggesting"]:
         raise HTTPException(
@@ -277,6 +295,7 @@ def update_suggestion(
         setattr(db_suggestion, field, value)
 
     db_suggestion.updated_at = datetime.utcnow()
+    bump_version(db, db_suggestion.picklejar_id)
     db.commit()
     db.refresh(db_suggestion)
 
@@ -311,9 +330,7 @@ def delete_suggestion(
         )
 
     # Check if PickleJar is still in suggesting phase
-    db_picklejar = (
-        db.query(PickleJar).filter(PickleJar.id == db_suggestion.picklejar_id).first()
-    )
+    db_picklejar = get_jar(db, db_suggestion.picklejar_id)
 
     if db_picklejar.status not in ["setup", "suggesting"]:
         raise HTTPException(
@@ -323,6 +340,7 @@ def delete_suggestion(
 
     # Soft delete
     db_suggestion.is_active = False
+    bump_version(db, db_suggestion.picklejar_id)
     db.commit()
 
     # Check if member has any other active suggestions
@@ -341,8 +359,11 @@ def delete_suggestion(
         db_member = db.query(Member).filter(Member.id == member_id).first()
         if db_member:
             db_member.has_suggested = False
+            bump_version(db, db_suggestion.picklejar_id)
             db.commit()
 
+    events.publish_participation(db, db_suggestion.picklejar_id, "suggestion_removed")
+
     return MessageResponse(
         message="Suggestion deleted successfully",
         detail="Your suggestion has been removed",
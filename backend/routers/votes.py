@@ -1,9 +1,14 @@
 from datetime import datetime
-from typing import List, Tuple
+from typing import List
 
+import events
+from ballot_queue import ballot_queue, queued_ingestion, queued_votes
 from database import get_db
 from fastapi import APIRouter, Depends, HTTPException, status
-from models import Member, PickleJar, Suggestion, Vote
+from heartbeats import heartbeats
+from jar_cache import JarSnapshot, get_jar
+from models import Member, PickleJar, Suggestion, SuggestionTally
+from routers.async_routes import keep_sync
 from schemas import (
     MessageResponse,
     VoteBatchCreate,
@@ -11,14 +16,16 @@ from schemas import (
     VoteResponse,
     VoteSummaryResponse,
 )
+from sqlalchemy import update
 from sqlalchemy.orm import Session
+from tallies import clear_ballot, member_votes, suggestion_votes, write_ballot
+from versioning import bump_version
+from voting_context import get_voting_context
 
 router = APIRouter()
 
 
-def _ensure_points_per_voter_initialized(
-    db: Session, picklejar: PickleJar
-) -> Tuple[PickleJar, int]:
+def _ensure_points_per_voter_initialized(db: Session, picklejar: JarSnapshot) -> int:
     """
     Ensure points_per_voter is initialized for this PickleJar.
 
@@ -26,23 +33,25 @@ def _ensure_points_per_voter_initialized(
     current member count as (n - 1), where n is the number of members in this jar.
     A minimum of 1 point per voter is enforced.
 
-    Returns a tuple of (updated_picklejar, effective_points_per_voter).
+    Returns the effective points_per_voter. The jar snapshot itself is not
+    updated; the cache entry is invalidated when the derived value commits.
     """
     # If already set to a positive value, just use it.
-    if getattr(picklejar, "points_per_voter", 0) and picklejar.points_per_voter > 0:
-        return picklejar, picklejar.points_per_voter
+    if picklejar.points_per_voter and picklejar.points_per_voter > 0:
+        return picklejar.points_per_voter
 
     # Derive from member count: n - 1 (minimum 1)
     member_count = db.query(Member).filter(Member.picklejar_id == picklejar.id).count()
     derived_points = max(member_count - 1, 1)
 
-    picklejar.points_per_voter = derived_points
-    picklejar.updated_at = datetime.utcnow()
-    db.add(picklejar)
+    db.query(PickleJar).filter(PickleJar.id == picklejar.id).update(
+        {"points_per_voter": derived_points, "updated_at": datetime.utcnow()},
+        synchronize_session=False,
+    )
+    bump_version(db, picklejar.id)
     db.commit()
-    db.refresh(picklejar)
 
-    return picklejar, derived_points
+    return derived_points
 
 
 @router.post(
@@ -50,6 +59,8 @@ def _ensure_points_per_voter_initialized(
     response_model=VoteSummaryResponse,
     status_code=status.HTTP_201_CREATED,
 )
+# Queued ingestion writes and reads the ballot queue's log
+@keep_sync(when=queued_ingestion)
 def submit_votes(
     picklejar_id: str,
     member_id: str,
@@ -64,9 +75,13 @@ def submit_votes(
     The allowed points per voter are automatically derived if not set:
     - points_per_voter = max(n - 1, 1), where n is the number of members
       in the PickleJar.
+
+    With BALLOT_INGESTION=queued the ballot is validated, logged and
+    acknowledged here, and written to the database shortly after by the
+    ballot queue (see ballot_queue.py).
     """
     # Check if PickleJar exists and is in voting phase
-    db_picklejar = db.query(PickleJar).filter(PickleJar.id == picklejar_id).first()
+    db_picklejar = get_jar(db, picklejar_id)
     if not db_picklejar:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -79,19 +94,25 @@ def submit_votes(
             detail=f"Cannot vote during '{db_picklejar.status}' phase",
         )
 
-    # Ensure points_per_voter is initialized (n - 1 rule) before validating votes
-    db_picklejar, effective_points_per_voter = _ensure_points_per_voter_initialized(
-        db, db_picklejar
-    )
-
-    # Check if member exists
-    db_member = (
-        db.query(Member)
-        .filter(Member.id == member_id, Member.picklejar_id == picklejar_id)
-        .first()
-    )
+    # Validate against the context built when voting started; without one,
+    # query the jar's members and suggestions instead
+    context = get_voting_context(db, db_picklejar)
+    if context is not None:
+        effective_points_per_voter = context.points_per_voter
+        member_found = context.has_member(db, member_id)
+    else:
+        # Ensure points_per_voter is initialized (n - 1 rule) before validating votes
+        effective_points_per_voter = _ensure_points_per_voter_initialized(
+            db, db_picklejar
+        )
+        member_found = (
+            db.query(Member.id)
+            .filter(Member.id == member_id, Member.picklejar_id == picklejar_id)
+            .first()
+            is not None
+        )
 
-    if not db_member:
+    if not member_found:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Member not found in this PickleJar",
@@ -111,69 +132,69 @@ def submit_votes(
 
     # Verify all suggestions exist and belong to this PickleJar
     suggestion_ids = [vote.suggestion_id for vote in vote_data.votes]
-    suggestions = (
-        db.query(Suggestion)
-        .filter(
-            Suggestion.id.in_(suggestion_ids),
-            Suggestion.picklejar_id == picklejar_id,
-            Suggestion.is_active == True,
+    if context is not None:
+        invalid_suggestions = context.invalid_suggestions(suggestion_ids)
+    else:
+        suggestions = (
+            db.query(Suggestion.id)
+            .filter(
+                Suggestion.id.in_(suggestion_ids),
+                Suggestion.picklejar_id == picklejar_id,
+                Suggestion.is_active == True,
+            )
+            .all()
         )
-        .all()
-    )
+        invalid_suggestions = len(suggestions) != len(suggestion_ids)
 
-    if len(suggestions) != len(suggestion_ids):
+    if invalid_suggestions:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="One or more suggestions not found or inactive",
         )
 
-    # Delete existing votes from this member for this PickleJar
-    db.query(Vote).filter(
-        Vote.member_id == member_id, Vote.picklejar_id == picklejar_id
-    ).delete()
-
-    # Create new votes
-    new_votes = []
-    for vote in vote_data.votes:
-        if vote.points > 0:  # Only create votes with positive points
-            db_vote = Vote(
-                member_id=member_id,
-                suggestion_id=vote.suggestion_id,
-                picklejar_id=picklejar_id,
-                points=vote.points,
-            )
-            db.add(db_vote)
-            new_votes.append(db_vote)
+    # Write only what changed (or one packed row); zero-point votes are dropped
+    new_ballot = {
+        vote.suggestion_id: vote.points for vote in vote_data.votes if vote.points > 0
+    }
+    heartbeats.record(member_id)
+
+    if queued_ingestion():
+        # Written behind by the ballot queue; the member reads it back from there
+        submitted_at = ballot_queue.submit(picklejar_id, member_id, new_ballot)
+        new_votes = queued_votes(picklejar_id, member_id, new_ballot, submitted_at)
+        return VoteSummaryResponse(
+            total_points_allocated=total_points,
+            remaining_points=effective_points_per_voter - total_points,
+            votes=[VoteResponse(**vote) for vote in new_votes],
+        )
 
-    # Update member status
-    db_member.has_voted = True
-    db_member.last_active = datetime.utcnow()
+    new_votes = write_ballot(db, picklejar_id, member_id, new_ballot)
 
+    # Update member status. The ballot counter, not the jar's version, tells
+    # readers the ballots changed (see versioning.py)
+    db.execute(
+        update(Member)
+        .where(Member.id == member_id)
+        .values(has_voted=True, ballot_version=Member.ballot_version + 1)
+        .execution_options(synchronize_session=False)
+    )
     db.commit()
 
-    # Refresh votes to get IDs
-    for vote in new_votes:
-        db.refresh(vote)
+    events.publish_participation(
+        db, picklejar_id, "ballot_submitted", include_tallies=True
+    )
 
     # Return summary
     return VoteSummaryResponse(
         total_points_allocated=total_points,
-        remaining_points=db_picklejar.points_per_voter - total_points,
-        votes=[
-            VoteResponse(
-                id=vote.id,
-                member_id=vote.member_id,
-                suggestion_id=vote.suggestion_id,
-                picklejar_id=vote.picklejar_id,
-                points=vote.points,
-                created_at=vote.created_at,
-            )
-            for vote in new_votes
-        ],
+        remaining_points=effective_points_per_voter - total_points,
+        votes=[VoteResponse(**vote) for vote in new_votes],
     )
 
 
 @router.get("/{picklejar_id}/votes/{member_id}", response_model=VoteSummaryResponse)
+# Queued ingestion writes and reads the ballot queue's log
+@keep_sync(when=queued_ingestion)
 def get_member_votes(picklejar_id: str, member_id: str, db: Session = Depends(get_db)):
     """
     Get a member's votes for a PickleJar.
@@ -183,7 +204,7 @@ def get_member_votes(picklejar_id: str, member_id: str, db: Session = Depends(ge
     during vote submission, so remaining_points is consistent.
     """
     # Check if PickleJar exists
-    db_picklejar = db.query(PickleJar).filter(PickleJar.id == picklejar_id).first()
+    db_picklejar = get_jar(db, picklejar_id)
     if not db_picklejar:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -191,7 +212,7 @@ def get_member_votes(picklejar_id: str, member_id: str, db: Session = Depends(ge
         )
 
     # Ensure points_per_voter is initialized so remaining_points is meaningful
-    db_picklejar, _ = _ensure_points_per_voter_initialized(db, db_picklejar)
+    points_per_voter = _ensure_points_per_voter_initialized(db, db_picklejar)
 
     # Check if member exists
     db_member = (
@@ -206,40 +227,32 @@ def get_member_votes(picklejar_id: str, member_id: str, db: Session = Depends(ge
             detail="Member not found in this PickleJar",
         )
 
-    # Get votes
-    votes = (
-        db.query(Vote)
-        .filter(Vote.member_id == member_id, Vote.picklejar_id == picklejar_id)
-        .all()
-    )
+    # Get votes, including a ballot still waiting in the ballot queue
+    votes = None
+    if queued_ingestion():
+        votes = ballot_queue.pending_votes(picklejar_id, member_id)
+    if votes is None:
+        votes = member_votes(db, picklejar_id, member_id)
 
-    total_points = sum(vote.points for vote in votes)
+    total_points = sum(vote["points"] for vote in votes)
 
     return VoteSummaryResponse(
         total_points_allocated=total_points,
-        remaining_points=db_picklejar.points_per_voter - total_points,
-        votes=[
-            VoteResponse(
-                id=vote.id,
-                member_id=vote.member_id,
-                suggestion_id=vote.suggestion_id,
-                picklejar_id=vote.picklejar_id,
-                points=vote.points,
-                created_at=vote.created_at,
-            )
-            for vote in votes
-        ],
+        remaining_points=points_per_voter - total_points,
+        votes=[VoteResponse(**vote) for vote in votes],
     )
 
 
 @router.delete("/{picklejar_id}/votes/{member_id}", response_model=MessageResponse)
+# Queued ingestion writes and reads the ballot queue's log
+@keep_sync(when=queued_ingestion)
 def clear_votes(picklejar_id: str, member_id: str, db: Session = Depends(get_db)):
     """
     Clear all votes for a member in a PickleJar.
     Allows members to start over with their vote allocation.
     """
     # Check if PickleJar exists and is in voting phase
-    db_picklejar = db.query(PickleJar).filter(PickleJar.id == picklejar_id).first()
+    db_picklejar = get_jar(db, picklejar_id)
     if not db_picklejar:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -265,19 +278,29 @@ def clear_votes(picklejar_id: str, member_id: str, db: Session = Depends(get_db)
             detail="Member not found in this PickleJar",
         )
 
+    if queued_ingestion():
+        # Queued after any ballot the member submitted before, so it wins
+        previous = ballot_queue.pending_votes(picklejar_id, member_id)
+        if previous is None:
+            previous = member_votes(db, picklejar_id, member_id)
+        ballot_queue.submit(picklejar_id, member_id, None)
+        heartbeats.record(db_member.id)
+        return MessageResponse(
+            message="Votes cleared successfully",
+            detail=f"Removed {len(previous)} vote(s)",
+        )
+
     # Delete all votes
-    deleted_count = (
-        db.query(Vote)
-        .filter(Vote.member_id == member_id, Vote.picklejar_id == picklejar_id)
-        .delete()
-    )
+    deleted_count = clear_ballot(db, picklejar_id, member_id)
 
     # Update member status
     db_member.has_voted = False
-    db_member.last_active = datetime.utcnow()
-
+    db_member.ballot_version = Member.ballot_version + 1
+    heartbeats.record(db_member.id)
     db.commit()
 
+    events.publish_participation(db, picklejar_id, "ballot_cleared", include_tallies=True)
+
     return MessageResponse(
         message="Votes cleared successfully",
         detail=f"Removed {deleted_count} vote(s)",
@@ -293,7 +316,7 @@ def get_suggestion_votes(
     Only available after voting is complete.
     """
     # Check if PickleJar exists
-    db_picklejar = db.query(PickleJar).filter(PickleJar.id == picklejar_id).first()
+    db_picklejar = get_jar(db, picklejar_id)
     if not db_picklejar:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -320,22 +343,20 @@ def get_suggestion_votes(
             detail=f"Suggestion with id {suggestion_id} not found",
         )
 
-    # Get all votes for this suggestion
-    votes = db.query(Vote).filter(Vote.suggestion_id == suggestion_id).all()
+    # Totals come from the materialized tally; individual votes are listed anonymously
+    tally = (
+        db.query(SuggestionTally.points, SuggestionTally.vote_count)
+        .filter(SuggestionTally.suggestion_id == suggestion_id)
+        .first()
+    )
+    total_points, vote_count = tally if tally else (0, 0)
 
-    total_points = sum(vote.points for vote in votes)
-    vote_count = len(votes)
+    # Only points and times are returned; member identity is not revealed
+    votes = suggestion_votes(db, db_suggestion)
 
     return {
         "suggestion_id": suggestion_id,
         "total_points": total_points,
         "vote_count": vote_count,
-        "votes": [
-            {
-                "points": vote.points,
-                "created_at": vote.created_at,
-                # Don't reveal member identity
-            }
-            for vote in votes
-        ],
+        "votes": votes,
     }
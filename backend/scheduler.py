@@ -0,0 +1,305 @@
+"""
+Background scheduler that advances PickleJar phases at their deadlines.
+
+Upcoming `suggestion_deadline` and `voting_deadline` values sit in a
+min-heap. A daemon thread sleeps until the earliest one, then advances the
+jar with a conditional UPDATE (see transitions.py) that only matches while
+the jar is still in the expected phase and past its deadline. Reads of a jar
+therefore never write, and several workers running the scheduler cannot
+advance the same jar twice.
+
+Each jar and phase has one live deadline. Rescheduling it leaves the old
+heap entry behind to be skipped when it comes up, and the heap is rebuilt
+from the live deadlines once such entries outnumber them, so editing
+deadlines over and over does not grow it.
+
+A jar whose transition fails (a database error, a lock timeout) is logged
+and queued again after a backoff that doubles with each failure, up to
+`MAX_RETRY_SECONDS`, without holding up the other jars due at the same time.
+
+On startup the heap is rebuilt from every jar that is suggesting or voting
+with a deadline, so overdue jars are advanced right after a restart. The
+clock is injectable so tests can drive `run_due` directly.
+"""
+
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional, Tuple
+
+import events
+from ballot_queue import ballot_queue
+from config import settings
+from database import SessionLocal
+from models import PickleJar, Suggestion
+from results import freeze_results
+from sqlalchemy import exists
+from transitions import points_per_voter, transition_status
+from voting_context import invalidate_voting_context_on_commit
+
+logger = logging.getLogger(__name__)
+
+# Superseded heap entries tolerated beyond the live ones before a rebuild
+COMPACT_SLACK = 64
+
+# Backoff before retrying a failed transition, doubled per failure
+RETRY_SECONDS = 5
+MAX_RETRY_SECONDS = 300
+
+
+def _as_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Deadlines are compared as naive UTC, matching datetime.utcnow()."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class DeadlineScheduler:
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        clock: Callable[[], datetime] = datetime.utcnow,
+        recheck_seconds: int = 60,
+        max_sleep_seconds: float = 60.0,
+    ):
+        self.session_factory = session_factory
+        self.clock = clock
+        # How soon to look again at a jar whose suggestion deadline passed
+        # with no suggestions to vote on
+        self.recheck_seconds = recheck_seconds
+        self.max_sleep_seconds = max_sleep_seconds
+        self._heap = []
+        # (jar ID, "suggestion" or "voting") -> deadline of its live heap entry
+        self._deadlines: Dict[Tuple[str, str], datetime] = {}
+        # (jar ID, kind) -> consecutive failed transitions
+        self._failures: Dict[Tuple[str, str], int] = {}
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def schedule(
+        self,
+        picklejar_id: str,
+        suggestion_deadline: Optional[datetime] = None,
+        voting_deadline: Optional[datetime] = None,
+    ) -> None:
+        """
+        Queue a jar's deadlines, replacing any queued before. A deadline
+        left as None keeps the one already queued.
+
+        Safe to call whenever deadlines or status change: a deadline whose
+        phase has already ended is harmless because the UPDATE re-checks
+        the stored values.
+        """
+        with self._condition:
+            for kind, deadline in (
+                ("suggestion", _as_naive_utc(suggestion_deadline)),
+                ("voting", _as_naive_utc(voting_deadline)),
+            ):
+                key = (picklejar_id, kind)
+                if deadline is None or self._deadlines.get(key) == deadline:
+                    continue
+                self._deadlines[key] = deadline
+                heapq.heappush(self._heap, (deadline, picklejar_id, kind))
+            self._compact()
+            self._condition.notify()
+
+    def cancel(self, picklejar_id: str) -> None:
+        """Forget a jar's queued deadlines."""
+        with self._condition:
+            self._deadlines.pop((picklejar_id, "suggestion"), None)
+            self._deadlines.pop((picklejar_id, "voting"), None)
+            self._failures.pop((picklejar_id, "suggestion"), None)
+            self._failures.pop((picklejar_id, "voting"), None)
+            self._compact()
+
+    def _compact(self) -> None:
+        # Called with the condition held
+        if len(self._heap) > 2 * len(self._deadlines) + COMPACT_SLACK:
+            self._heap = [
+                (deadline, picklejar_id, kind)
+                for (picklejar_id, kind), deadline in self._deadlines.items()
+            ]
+            heapq.heapify(self._heap)
+
+    def schedule_jar(self, picklejar: PickleJar) -> None:
+        self.schedule(
+            picklejar.id, picklejar.suggestion_deadline, picklejar.voting_deadline
+        )
+
+    def load(self) -> int:
+        """Queue every suggesting or voting jar that has a deadline."""
+        db = self.session_factory()
+        try:
+            rows = (
+                db.query(
+                    PickleJar.id,
+                    PickleJar.suggestion_deadline,
+                    PickleJar.voting_deadline,
+                )
+                .filter(
+                    PickleJar.status.in_(["suggesting", "voting"]),
+                    (PickleJar.suggestion_deadline != None)
+                    | (PickleJar.voting_deadline != None),
+                )
+                .all()
+            )
+        finally:
+            db.close()
+
+        for picklejar_id, suggestion_deadline, voting_deadline in rows:
+            self.schedule(picklejar_id, suggestion_deadline, voting_deadline)
+        return len(rows)
+
+    def run_due(self) -> int:
+        """Advance every jar whose queued deadline has passed. Returns the count."""
+        now = self.clock()
+        due = []
+        with self._condition:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, picklejar_id, kind = heapq.heappop(self._heap)
+                # Skip entries replaced by a later schedule() or cancel()
+                if self._deadlines.get((picklejar_id, kind)) != deadline:
+                    continue
+                del self._deadlines[(picklejar_id, kind)]
+                due.append((picklejar_id, kind))
+
+        advanced = 0
+        for picklejar_id, kind in due:
+            try:
+                if kind == "suggestion":
+                    advanced += self._close_suggesting(picklejar_id, now)
+                else:
+                    advanced += self._close_voting(picklejar_id, now)
+            except Exception:
+                logger.exception(
+                    "Deadline scheduler failed to close %s for PickleJar %s",
+                    kind,
+                    picklejar_id,
+                )
+                self._retry(picklejar_id, kind, now)
+            else:
+                with self._condition:
+                    self._failures.pop((picklejar_id, kind), None)
+        return advanced
+
+    def _retry(self, picklejar_id: str, kind: str, now: datetime) -> None:
+        """Queue a failed transition again after a backoff."""
+        key = (picklejar_id, kind)
+        with self._condition:
+            failures = self._failures.get(key, 0) + 1
+            self._failures[key] = failures
+            # A deadline queued while the transition ran takes precedence
+            if key in self._deadlines:
+                return
+            delay = min(RETRY_SECONDS * 2 ** (failures - 1), MAX_RETRY_SECONDS)
+            deadline = now + timedelta(seconds=delay)
+            self._deadlines[key] = deadline
+            heapq.heappush(self._heap, (deadline, picklejar_id, kind))
+            self._condition.notify()
+
+    def _close_suggesting(self, picklejar_id: str, now: datetime) -> int:
+        db = self.session_factory()
+        try:
+            row = transition_status(
+                db,
+                picklejar_id,
+                "suggesting",
+                "voting",
+                PickleJar.suggestion_deadline <= now,
+                exists().where(Suggestion.picklejar_id == picklejar_id),
+                now=now,
+                points_per_voter=points_per_voter(picklejar_id),
+            )
+            if row is not None:
+                invalidate_voting_context_on_commit(db, picklejar_id)
+            db.commit()
+
+            if row is None:
+                # Still suggesting past the deadline means there is nothing to
+                # vote on yet; look again later.
+                db_picklejar = (
+                    db.query(PickleJar).filter(PickleJar.id == picklejar_id).first()
+                )
+                if (
+                    db_picklejar
+                    and db_picklejar.status == "suggesting"
+                    and db_picklejar.suggestion_deadline
+                    and db_picklejar.suggestion_deadline <= now
+                ):
+                    self.schedule(
+                        picklejar_id,
+                        suggestion_deadline=now + timedelta(seconds=self.recheck_seconds),
+                    )
+                return 0
+        finally:
+            db.close()
+
+        events.publish_status(picklejar_id, "voting")
+        # The voting deadline may already be due as well
+        self.schedule(picklejar_id, voting_deadline=row.voting_deadline)
+        return 1
+
+    def _close_voting(self, picklejar_id: str, now: datetime) -> int:
+        # Ballots accepted by the ballot queue count towards the frozen results
+        ballot_queue.apply_jar(picklejar_id)
+        db = self.session_factory()
+        try:
+            row = transition_status(
+                db,
+                picklejar_id,
+                "voting",
+                "completed",
+                PickleJar.voting_deadline <= now,
+                now=now,
+            )
+            if row is not None:
+                freeze_results(db, picklejar_id)
+            db.commit()
+        finally:
+            db.close()
+
+        if row is None:
+            return 0
+        events.publish_status(picklejar_id, "completed")
+        return 1
+
+    def _seconds_until_next(self) -> float:
+        if not self._heap:
+            return self.max_sleep_seconds
+        remaining = (self._heap[0][0] - self.clock()).total_seconds()
+        return min(max(remaining, 0.0), self.max_sleep_seconds)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.run_due()
+            except Exception:
+                logger.exception("Deadline scheduler failed to advance jars")
+            with self._condition:
+                if self._stopping:
+                    return
+                self._condition.wait(self._seconds_until_next())
+                if self._stopping:
+                    return
+
+    def start(self) -> None:
+        """Rescan overdue and upcoming jars and start the background thread."""
+        self.load()
+        self._stopping = False
+        self._thread = threading.Thread(
+            target=self._run, name="deadline-scheduler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+scheduler = DeadlineScheduler(recheck_seconds=settings.DEADLINE_RECHECK_SECONDS)
@@ -93,6 +93,13 @@ class MemberCreate(BaseModel):
             raise ValueError("Phone number must be at least 10 digits")
         return cleaned
 
+    @validator("display_name")
+    def validate_display_name(cls, v):
+        # A blank name means none, so a rejoin keeps the name already set
+        if v is not None:
+            v = v.strip() or None
+        return v
+
 
 class MemberResponse(BaseModel):
     """Schema for Member responses"""
@@ -190,6 +197,8 @@ class SuggestionWithVotesResponse(SuggestionResponse):
     total_points: int
     member_id: str
     member_phone: Optional[str] = None  # Revealed after voting
+    rank: Optional[int] = None  # Shared by suggestions tied on score
+    score: Optional[float] = None  # Under the results' scoring rule
 
 
 # ============================================================================
@@ -274,6 +283,18 @@ class ResultsResponse(BaseModel):
     winner: Optional[WinnerResponse]
     all_suggestions: List[SuggestionWithVotesResponse]
     stats: PickleJarStatsResponse
+    scoring_rule: str = "points"
+
+
+class PickleJarSnapshotResponse(BaseModel):
+    """Schema for everything the shared jar page needs in one response"""
+
+    picklejar: PickleJarDetailResponse
+    members: List[MemberStatusResponse]
+    suggestions: List[SuggestionResponse]
+    member: Optional[MemberResponse] = None  # Only the requesting member
+    votes: Optional[VoteSummaryResponse] = None  # The requesting member's votes
+    results: Optional[ResultsResponse] = None  # During voting or once completed
 
 
 # ============================================================================
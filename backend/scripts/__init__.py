@@ -0,0 +1,5 @@
+"""
+Maintenance commands for the PickleJar backend.
+
+Run them from the backend directory, e.g. `python -m scripts.repair_tallies verify`.
+"""
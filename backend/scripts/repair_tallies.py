@@ -0,0 +1,48 @@
+"""
+Rebuild or verify the materialized suggestion tallies.
+
+Usage (from the backend directory):
+    python -m scripts.repair_tallies verify [--jar PICKLEJAR_ID]
+    python -m scripts.repair_tallies rebuild [--jar PICKLEJAR_ID]
+
+`verify` exits with status 1 when any stored tally disagrees with the votes
+table. `rebuild` recomputes tallies from the votes table and replaces them.
+"""
+
+import argparse
+import sys
+
+from database import SessionLocal
+from tallies import rebuild_tallies, verify_tallies
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("command", choices=["verify", "rebuild"])
+    parser.add_argument("--jar", dest="picklejar_id", help="Limit to one PickleJar")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            written = rebuild_tallies(db, args.picklejar_id)
+            db.commit()
+            print(f"Rebuilt {written} tally row(s)")
+            return 0
+
+        mismatches = verify_tallies(db, args.picklejar_id)
+        for mismatch in mismatches:
+            print(
+                f"{mismatch['suggestion_id']}: stored "
+                f"{mismatch['stored_points']} pts / {mismatch['stored_vote_count']} votes, "
+                f"expected {mismatch['expected_points']} pts / "
+                f"{mismatch['expected_vote_count']} votes"
+            )
+        print(f"{len(mismatches)} mismatched tally row(s)")
+        return 1 if mismatches else 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
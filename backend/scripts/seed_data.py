@@ -0,0 +1,471 @@
+"""
+Fill a database with synthetic PickleJars for benchmarking.
+
+Usage (from the backend directory):
+    python -m scripts.seed_data [--jars 1000 | --votes 10000000] [--seed 1]
+                                [--batch-size 20000] [--create-tables]
+
+Writes jars, members, suggestions, votes and suggestion tallies in batches
+with executemany; the models only supply the table definitions. The same
+seed always produces the same rows, IDs and timestamps included. IDs have
+the same form as the API's: UUIDv7s built from each row's creation time
+and short jar IDs.
+
+The shape roughly follows production:
+- Jars are created about a minute apart, starting at `--start`.
+- Jar sizes are log-normal (median around 8 members, capped at 250).
+- Jars are spread over phases: mostly completed, some voting or
+  suggesting, a few in setup or cancelled. Later phases have suggestions
+  and votes, with fewer ballots cast while voting is still open.
+- Ballots favour a few popular suggestions and split `points_per_voter`
+  over one to five of them.
+- About a third of suggestions have a structured location near one of a
+  handful of cities.
+
+A jar averages about 20 votes, so `--votes 10000000` seeds roughly
+500,000 jars. The target database must be empty; run
+`alembic upgrade head` first or pass `--create-tables`.
+"""
+
+import argparse
+import json
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+from database import Base, engine
+from models import (
+    SHORT_ID_ALPHABET,
+    SHORT_ID_LENGTH,
+    Member,
+    PickleJar,
+    Suggestion,
+    SuggestionTally,
+    Vote,
+    format_uuid7,
+)
+from sqlalchemy import func, select
+
+# (phase, weight)
+PHASES = (
+    ("setup", 3),
+    ("suggesting", 12),
+    ("voting", 20),
+    ("completed", 60),
+    ("cancelled", 5),
+)
+
+# (city, latitude, longitude)
+CITIES = (
+    ("Austin", 30.2672, -97.7431),
+    ("Chicago", 41.8781, -87.6298),
+    ("Denver", 39.7392, -104.9903),
+    ("New York", 40.7128, -74.0060),
+    ("Portland", 45.5152, -122.6784),
+    ("San Francisco", 37.7749, -122.4194),
+)
+
+ACTIVITIES = (
+    "Tacos",
+    "Bowling",
+    "Karaoke",
+    "Hiking",
+    "Board games",
+    "Ramen",
+    "Mini golf",
+    "Trivia night",
+    "Escape room",
+    "Picnic",
+    "Climbing gym",
+    "Brunch",
+)
+
+COSTS = ("$", "$$", "$$$", None)
+
+# Row layout per table, in foreign key order
+COLUMNS = {
+    PickleJar: (
+        "id",
+        "title",
+        "description",
+        "points_per_voter",
+        "max_suggestions_per_member",
+        "suggestion_deadline",
+        "voting_deadline",
+        "hangout_datetime",
+        "status",
+        "is_active",
+        "version",
+        "created_at",
+        "updated_at",
+        "creator_phone",
+    ),
+    Member: (
+        "id",
+        "picklejar_id",
+        "phone_number",
+        "display_name",
+        "is_verified",
+        "has_suggested",
+        "has_voted",
+        "is_active",
+        "joined_at",
+        "last_active",
+    ),
+    Suggestion: (
+        "id",
+        "picklejar_id",
+        "member_id",
+        "ordinal",
+        "title",
+        "description",
+        "location",
+        "structured_location",
+        "latitude",
+        "longitude",
+        "map_bounds",
+        "geo_source",
+        "location_confidence",
+        "location_last_verified_at",
+        "estimated_cost",
+        "is_active",
+        "created_at",
+        "updated_at",
+    ),
+    Vote: (
+        "id",
+        "member_id",
+        "suggestion_id",
+        "picklejar_id",
+        "points",
+        "created_at",
+        "updated_at",
+    ),
+    SuggestionTally: (
+        "suggestion_id",
+        "picklejar_id",
+        "points",
+        "vote_count",
+        "updated_at",
+    ),
+}
+
+# Member row fields updated after the row is built
+MEMBER_HAS_SUGGESTED = COLUMNS[Member].index("has_suggested")
+MEMBER_HAS_VOTED = COLUMNS[Member].index("has_voted")
+
+EPOCH = datetime(1970, 1, 1)
+MILLISECOND = timedelta(milliseconds=1)
+
+
+class Seeder:
+    """Generates rows from one random stream and writes them in batches."""
+
+    def __init__(self, connection, seed: int, batch_size: int, start: datetime):
+        self.connection = connection
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.start = start
+        self.rows = {model: [] for model in COLUMNS}
+        self.counts = {model: 0 for model in COLUMNS}
+        self.jar_ids = set()
+        self.pending = 0
+
+        if connection.dialect.name == "sqlite":
+            # Write through the driver, storing values the way SQLAlchemy's
+            # SQLite types do; its per-value bind processing dominates
+            # otherwise
+            sqlite3.register_adapter(
+                datetime, lambda value: value.isoformat(" ", "microseconds")
+            )
+            sqlite3.register_adapter(dict, json.dumps)
+            self.cursor = connection.connection.cursor()
+            # Random UUID keys touch index pages all over the file; keep
+            # them in memory until commit
+            self.cursor.execute("PRAGMA cache_size = -1048576")
+        else:
+            self.cursor = None
+
+    def uuid(self, created_at: datetime) -> str:
+        """A UUIDv7 for a row created at `created_at`, like `generate_uuid`."""
+        unix_ms = (created_at - EPOCH) // MILLISECOND
+        return format_uuid7(unix_ms, self.rng.getrandbits(74))
+
+    def short_id(self) -> str:
+        while True:
+            jar_id = "".join(
+                self.rng.choice(SHORT_ID_ALPHABET) for _ in range(SHORT_ID_LENGTH)
+            )
+            if jar_id not in self.jar_ids:
+                self.jar_ids.add(jar_id)
+                return jar_id
+
+    def flush(self) -> None:
+        # Parents first, so every batch satisfies foreign keys
+        for model, columns in COLUMNS.items():
+            rows = self.rows[model]
+            if not rows:
+                continue
+            table = model.__table__
+            if self.cursor is not None:
+                self.cursor.executemany(
+                    f"INSERT INTO {table.name} ({', '.join(columns)}) "
+                    f"VALUES ({', '.join('?' * len(columns))})",
+                    rows,
+                )
+            else:
+                self.connection.execute(
+                    table.insert(), [dict(zip(columns, row)) for row in rows]
+                )
+            self.counts[model] += len(rows)
+            self.rows[model] = []
+        self.pending = 0
+
+    def jar(self, number: int) -> int:
+        """Generate one jar with its rows. Returns the number of votes."""
+        rng = self.rng
+        phase = rng.choices(
+            [name for name, _ in PHASES], [weight for _, weight in PHASES]
+        )[0]
+        member_count = min(250, max(2, round(rng.lognormvariate(2.1, 0.7))))
+        max_per_member = rng.choices((1, 2, 3), (70, 20, 10))[0]
+        # About one new jar a minute, like a steady stream of real traffic
+        created_at = self.start + timedelta(minutes=number, seconds=rng.randrange(60))
+        jar_id = self.short_id()
+
+        members = []
+        for i in range(member_count):
+            joined_at = created_at + timedelta(seconds=rng.randrange(2 * 86400))
+            members.append(
+                [
+                    self.uuid(joined_at),
+                    jar_id,
+                    f"+1555{number % 1000:03d}{i:04d}",
+                    f"Member {i + 1}",
+                    rng.random() < 0.8,
+                    False,
+                    False,
+                    rng.random() < 0.97,
+                    joined_at,
+                    joined_at + timedelta(seconds=rng.randrange(3 * 86400)),
+                ]
+            )
+
+        suggestions = []
+        if phase in ("voting", "completed") or (
+            phase in ("suggesting", "cancelled") and rng.random() < 0.7
+        ):
+            for member in members:
+                if rng.random() < 0.4:
+                    continue
+                for _ in range(rng.randint(1, max_per_member)):
+                    suggestions.append(
+                        self.suggestion(jar_id, member, len(suggestions))
+                    )
+                member[MEMBER_HAS_SUGGESTED] = True
+        if phase in ("voting", "completed") and not suggestions:
+            suggestions.append(self.suggestion(jar_id, members[0], 0))
+            members[0][MEMBER_HAS_SUGGESTED] = True
+
+        points_per_voter = 10
+        votes = []
+        points = [0] * len(suggestions)
+        vote_counts = [0] * len(suggestions)
+        if phase in ("voting", "completed"):
+            points_per_voter = max(len(suggestions) - 1, 1)
+            turnout = rng.uniform(0.2, 0.9) if phase == "voting" else 0.95
+            # A few suggestions attract most of the points
+            cum_weights = []
+            total = 0.0
+            for _ in suggestions:
+                total += rng.paretovariate(1.2)
+                cum_weights.append(total)
+            for member in members:
+                if rng.random() >= turnout:
+                    continue
+                voted_at = member[-1]
+                for index, allocated in self.ballot(cum_weights, points_per_voter):
+                    votes.append(
+                        (
+                            self.uuid(voted_at),
+                            member[0],
+                            suggestions[index][0],
+                            jar_id,
+                            allocated,
+                            voted_at,
+                            voted_at,
+                        )
+                    )
+                    points[index] += allocated
+                    vote_counts[index] += 1
+                member[MEMBER_HAS_VOTED] = True
+
+        suggestion_deadline = voting_deadline = None
+        if rng.random() < 0.6:
+            suggestion_deadline = created_at + timedelta(days=rng.randint(1, 4))
+            voting_deadline = suggestion_deadline + timedelta(days=rng.randint(1, 3))
+        updated_at = max(member[-1] for member in members)
+
+        self.rows[PickleJar].append(
+            (
+                jar_id,
+                f"{rng.choice(ACTIVITIES)} crew #{number + 1}",
+                None if rng.random() < 0.5 else "Where should we go?",
+                points_per_voter,
+                max_per_member,
+                suggestion_deadline,
+                voting_deadline,
+                created_at + timedelta(days=rng.randint(3, 14)),
+                phase,
+                phase != "cancelled",
+                1 + len(members) + len(suggestions) + len(votes),
+                created_at,
+                updated_at,
+                members[0][2],
+            )
+        )
+        self.rows[Member].extend(members)
+        self.rows[Suggestion].extend(suggestions)
+        self.rows[Vote].extend(votes)
+        self.rows[SuggestionTally].extend(
+            (suggestion[0], jar_id, points[index], vote_counts[index], updated_at)
+            for index, suggestion in enumerate(suggestions)
+        )
+
+        self.pending += 1 + len(members) + 2 * len(suggestions) + len(votes)
+        if self.pending >= self.batch_size:
+            self.flush()
+        return len(votes)
+
+    def suggestion(self, jar_id: str, member: list, ordinal: int) -> tuple:
+        rng = self.rng
+        activity = rng.choice(ACTIVITIES)
+        suggested_at = member[-2] + timedelta(seconds=rng.randrange(86400))
+        location = structured = latitude = longitude = bounds = None
+        geo_source = confidence = verified_at = None
+
+        roll = rng.random()
+        if roll < 0.35:
+            city, latitude, longitude = rng.choice(CITIES)
+            latitude += rng.uniform(-0.1, 0.1)
+            longitude += rng.uniform(-0.1, 0.1)
+            name = f"{activity} at {rng.randint(10, 999)} Main St"
+            location = f"{name}, {city}"
+            bounds = {
+                "northeast": {
+                    "latitude": latitude + 0.002,
+                    "longitude": longitude + 0.002,
+                },
+                "southwest": {
+                    "latitude": latitude - 0.002,
+                    "longitude": longitude - 0.002,
+                },
+            }
+            geo_source = "mapbox"
+            confidence = rng.randint(60, 100)
+            verified_at = suggested_at
+            structured = {
+                "name": name,
+                "address": location,
+                "place_id": f"seed.{rng.getrandbits(48):012x}",
+                "provider": geo_source,
+                "map_bounds": bounds,
+                "location_confidence": confidence,
+            }
+        elif roll < 0.75:
+            location = f"Somewhere in {rng.choice(CITIES)[0]}"
+
+        return (
+            self.uuid(suggested_at),
+            jar_id,
+            member[0],
+            ordinal,
+            activity,
+            None if rng.random() < 0.6 else f"{activity} downtown",
+            location,
+            structured,
+            latitude,
+            longitude,
+            bounds,
+            geo_source,
+            confidence,
+            verified_at,
+            rng.choice(COSTS),
+            rng.random() < 0.98,
+            suggested_at,
+            suggested_at,
+        )
+
+    def ballot(self, cum_weights, points_per_voter):
+        """Split the points over one to five suggestions, favouring popular ones."""
+        rng = self.rng
+        size = min(len(cum_weights), points_per_voter, rng.randint(1, 5))
+        indexes = []
+        while len(indexes) < size:
+            for index in rng.choices(
+                range(len(cum_weights)), cum_weights=cum_weights, k=size
+            ):
+                if index not in indexes:
+                    indexes.append(index)
+                    if len(indexes) == size:
+                        break
+        cuts = sorted(rng.sample(range(1, points_per_voter), size - 1))
+        shares = [b - a for a, b in zip([0] + cuts, cuts + [points_per_voter])]
+        return zip(indexes, shares)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--jars", type=int, default=1000, help="Number of jars")
+    group.add_argument("--votes", type=int, help="Add jars until this many votes")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--batch-size", type=int, default=20000, help="Rows written per batch"
+    )
+    parser.add_argument(
+        "--start",
+        type=datetime.fromisoformat,
+        default=datetime(2025, 1, 1),
+        help="Creation time of the first jar; the rest follow about a minute apart",
+    )
+    parser.add_argument(
+        "--create-tables",
+        action="store_true",
+        help="Create missing tables from the models instead of using Alembic",
+    )
+    args = parser.parse_args(argv)
+
+    if args.create_tables:
+        Base.metadata.create_all(bind=engine)
+
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        existing = connection.execute(select(func.count()).select_from(PickleJar))
+        if existing.scalar():
+            print("The database already contains PickleJars; seed an empty one")
+            return 1
+
+        seeder = Seeder(connection, args.seed, args.batch_size, args.start)
+        jars = votes = 0
+        while votes < args.votes if args.votes is not None else jars < args.jars:
+            votes += seeder.jar(jars)
+            jars += 1
+            if jars % 50000 == 0:
+                print(
+                    f"{jars} jars, {votes} votes "
+                    f"({time.perf_counter() - started:.0f}s)"
+                )
+        seeder.flush()
+
+    counts = ", ".join(
+        f"{seeder.counts[model]} {model.__tablename__}" for model in COLUMNS
+    )
+    print(f"Wrote {counts} in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,528 @@
+"""
+Materialized per-suggestion vote tallies and jar-level participation counts.
+
+The voting endpoints keep `suggestion_tallies` in step with the stored
+ballots by applying the difference between a member's old and new ballot
+in the same transaction that writes the ballot. `save_ballot` writes only
+the vote rows that changed; with BALLOT_STORAGE=packed, `write_ballot`
+stores the whole ballot as one `packed_ballots` row instead (see
+ballots.py). The rebuild and verify helpers recompute totals straight from
+`votes` and `packed_ballots` and are used by `scripts/repair_tallies.py`
+for repair.
+"""
+
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from ballots import decode_entries, decode_totals, encode_entries, suggestion_ordinals
+from config import settings
+from database import upsert_insert
+from models import (
+    Member,
+    PackedBallot,
+    Suggestion,
+    SuggestionTally,
+    Vote,
+    generate_uuid,
+)
+from sqlalchemy import bindparam, case, func, select
+from sqlalchemy.orm import Session
+
+Ballot = Dict[str, int]
+
+
+def _packed_storage() -> bool:
+    return settings.BALLOT_STORAGE == "packed"
+
+
+def load_ballot(db: Session, picklejar_id: str, member_id: str) -> Ballot:
+    """Return a member's current ballot as {suggestion_id: points}."""
+    rows = (
+        db.query(Vote.suggestion_id, Vote.points)
+        .filter(Vote.member_id == member_id, Vote.picklejar_id == picklejar_id)
+        .all()
+    )
+    return {suggestion_id: points for suggestion_id, points in rows}
+
+
+def save_ballot(
+    db: Session, picklejar_id: str, member_id: str, new_ballot: Ballot
+) -> List[dict]:
+    """
+    Replace a member's ballot, touching only the vote rows that changed.
+
+    Votes for suggestions no longer on the ballot are deleted in one
+    statement, changed points are updated in one executemany and new votes
+    are inserted in one executemany with IDs generated up front, so no row
+    needs to be re-read. Tallies are adjusted by the same difference.
+
+    Returns the resulting vote rows, in ballot order, as dicts. Does not
+    commit.
+    """
+    vote_table = Vote.__table__
+    existing = {
+        row.suggestion_id: row
+        for row in db.execute(
+            select(
+                vote_table.c.id,
+                vote_table.c.suggestion_id,
+                vote_table.c.points,
+                vote_table.c.created_at,
+            ).where(
+                vote_table.c.member_id == member_id,
+                vote_table.c.picklejar_id == picklejar_id,
+            )
+        )
+    }
+    old_ballot = {sid: row.points for sid, row in existing.items()}
+
+    now = datetime.utcnow()
+    stale_ids = [row.id for sid, row in existing.items() if sid not in new_ballot]
+    changed = [
+        {"vote_id": existing[sid].id, "new_points": points, "now": now}
+        for sid, points in new_ballot.items()
+        if sid in existing and existing[sid].points != points
+    ]
+    added = [
+        {
+            "id": generate_uuid(),
+            "member_id": member_id,
+            "suggestion_id": sid,
+            "picklejar_id": picklejar_id,
+            "points": points,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for sid, points in new_ballot.items()
+        if sid not in existing
+    ]
+
+    if stale_ids:
+        db.execute(vote_table.delete().where(vote_table.c.id.in_(stale_ids)))
+    if changed:
+        db.execute(
+            vote_table.update()
+            .where(vote_table.c.id == bindparam("vote_id"))
+            .values(points=bindparam("new_points"), updated_at=bindparam("now")),
+            changed,
+        )
+    if added:
+        db.execute(vote_table.insert(), added)
+
+    apply_ballot_diff(db, picklejar_id, old_ballot, new_ballot)
+
+    added_by_suggestion = {row["suggestion_id"]: row for row in added}
+    votes = []
+    for sid, points in new_ballot.items():
+        if sid in added_by_suggestion:
+            vote_id, created_at = added_by_suggestion[sid]["id"], now
+        else:
+            vote_id, created_at = existing[sid].id, existing[sid].created_at
+        votes.append(
+            {
+                "id": vote_id,
+                "member_id": member_id,
+                "suggestion_id": sid,
+                "picklejar_id": picklejar_id,
+                "points": points,
+                "created_at": created_at,
+            }
+        )
+    return votes
+
+
+def _packed_ballot(db: Session, picklejar_id: str, member_id: str):
+    ballot_table = PackedBallot.__table__
+    return db.execute(
+        select(ballot_table.c.entries, ballot_table.c.updated_at).where(
+            ballot_table.c.picklejar_id == picklejar_id,
+            ballot_table.c.member_id == member_id,
+        )
+    ).first()
+
+
+def _packed_votes(
+    picklejar_id: str, member_id: str, ballot: Ballot, created_at: datetime
+) -> List[dict]:
+    # Packed votes have no row of their own; the ID names the ballot entry
+    return [
+        {
+            "id": f"{member_id}:{sid}",
+            "member_id": member_id,
+            "suggestion_id": sid,
+            "picklejar_id": picklejar_id,
+            "points": points,
+            "created_at": created_at,
+        }
+        for sid, points in ballot.items()
+    ]
+
+
+def _unpack(entries: bytes, ordinals: Dict[str, int]) -> Ballot:
+    by_ordinal = {ordinal: sid for sid, ordinal in ordinals.items()}
+    return {
+        by_ordinal[ordinal]: points
+        for ordinal, points in decode_entries(entries).items()
+        if ordinal in by_ordinal
+    }
+
+
+def save_packed_ballot(
+    db: Session, picklejar_id: str, member_id: str, new_ballot: Ballot
+) -> List[dict]:
+    """
+    Replace a member's ballot with a single `packed_ballots` row.
+
+    The old ballot comes from the packed row, or from the member's vote rows
+    if they voted before packed storage was enabled; those rows are deleted
+    so the ballot is counted once. Tallies are adjusted by the difference as
+    in `save_ballot`. Returns the resulting votes as dicts. Does not commit.
+    """
+    ordinals = suggestion_ordinals(db, picklejar_id, number_missing=True)
+    ballot_table = PackedBallot.__table__
+    vote_table = Vote.__table__
+
+    existing = _packed_ballot(db, picklejar_id, member_id)
+    if existing is not None:
+        old_ballot = _unpack(existing.entries, ordinals)
+    else:
+        old_ballot = load_ballot(db, picklejar_id, member_id)
+        if old_ballot:
+            db.execute(
+                vote_table.delete().where(
+                    vote_table.c.member_id == member_id,
+                    vote_table.c.picklejar_id == picklejar_id,
+                )
+            )
+
+    now = datetime.utcnow()
+    entries = encode_entries(
+        {ordinals[sid]: points for sid, points in new_ballot.items()}
+    )
+    if existing is not None:
+        db.execute(
+            ballot_table.update()
+            .where(
+                ballot_table.c.picklejar_id == picklejar_id,
+                ballot_table.c.member_id == member_id,
+            )
+            .values(entries=entries, updated_at=now)
+        )
+    else:
+        db.execute(
+            ballot_table.insert().values(
+                picklejar_id=picklejar_id,
+                member_id=member_id,
+                entries=entries,
+                created_at=now,
+                updated_at=now,
+            )
+        )
+
+    apply_ballot_diff(db, picklejar_id, old_ballot, new_ballot)
+    return _packed_votes(picklejar_id, member_id, new_ballot, now)
+
+
+def write_ballot(
+    db: Session, picklejar_id: str, member_id: str, new_ballot: Ballot
+) -> List[dict]:
+    """Replace a member's ballot using the configured BALLOT_STORAGE."""
+    if _packed_storage():
+        return save_packed_ballot(db, picklejar_id, member_id, new_ballot)
+    return save_ballot(db, picklejar_id, member_id, new_ballot)
+
+
+def member_votes(db: Session, picklejar_id: str, member_id: str) -> List[dict]:
+    """
+    Return a member's votes as dicts shaped like `VoteResponse`.
+
+    With packed storage the packed ballot is read first; members who voted
+    before it was enabled still have vote rows, which are read instead.
+    """
+    if _packed_storage():
+        packed = _packed_ballot(db, picklejar_id, member_id)
+        if packed is not None:
+            ordinals = suggestion_ordinals(db, picklejar_id)
+            ballot = _unpack(packed.entries, ordinals)
+            return _packed_votes(picklejar_id, member_id, ballot, packed.updated_at)
+
+    vote_table = Vote.__table__
+    rows = db.execute(
+        select(
+            vote_table.c.id,
+            vote_table.c.member_id,
+            vote_table.c.suggestion_id,
+            vote_table.c.picklejar_id,
+            vote_table.c.points,
+            vote_table.c.created_at,
+        ).where(
+            vote_table.c.member_id == member_id,
+            vote_table.c.picklejar_id == picklejar_id,
+        )
+    ).mappings()
+    return [dict(row) for row in rows]
+
+
+def clear_ballot(db: Session, picklejar_id: str, member_id: str) -> int:
+    """
+    Delete a member's ballot and take it out of the tallies.
+
+    Returns the number of votes removed. Does not commit.
+    """
+    if _packed_storage():
+        packed = _packed_ballot(db, picklejar_id, member_id)
+        if packed is not None:
+            ordinals = suggestion_ordinals(db, picklejar_id)
+            old_ballot = _unpack(packed.entries, ordinals)
+            ballot_table = PackedBallot.__table__
+            db.execute(
+                ballot_table.delete().where(
+                    ballot_table.c.picklejar_id == picklejar_id,
+                    ballot_table.c.member_id == member_id,
+                )
+            )
+            apply_ballot_diff(db, picklejar_id, old_ballot, {})
+            return len(old_ballot)
+
+    old_ballot = load_ballot(db, picklejar_id, member_id)
+    deleted_count = (
+        db.query(Vote)
+        .filter(Vote.member_id == member_id, Vote.picklejar_id == picklejar_id)
+        .delete()
+    )
+    apply_ballot_diff(db, picklejar_id, old_ballot, {})
+    return deleted_count
+
+
+def suggestion_votes(db: Session, suggestion: Suggestion) -> List[dict]:
+    """Return the anonymous {points, created_at} of every vote on a suggestion."""
+    votes = [
+        {"points": points, "created_at": created_at}
+        for points, created_at in db.query(Vote.points, Vote.created_at).filter(
+            Vote.suggestion_id == suggestion.id
+        )
+    ]
+    if _packed_storage() and suggestion.ordinal is not None:
+        ballots = db.query(PackedBallot.entries, PackedBallot.updated_at).filter(
+            PackedBallot.picklejar_id == suggestion.picklejar_id
+        )
+        for entries, updated_at in ballots:
+            points = decode_entries(entries).get(suggestion.ordinal)
+            if points is not None:
+                votes.append({"points": points, "created_at": updated_at})
+    return votes
+
+
+def apply_ballot_diff(
+    db: Session, picklejar_id: str, old_ballot: Ballot, new_ballot: Ballot
+) -> None:
+    """
+    Apply the change from `old_ballot` to `new_ballot` to the tallies.
+
+    Only suggestions whose points or vote presence changed are touched.
+    Increments are done in SQL, and a missing tally row is created by the
+    same upsert, so concurrent ballots neither overwrite each other nor race
+    to insert the row. Does not commit; the caller commits together with the vote rows.
+    """
+    deltas = {}
+    for suggestion_id in set(old_ballot) | set(new_ballot):
+        old_points = old_ballot.get(suggestion_id)
+        new_points = new_ballot.get(suggestion_id)
+        points_delta = (new_points or 0) - (old_points or 0)
+        count_delta = int(new_points is not None) - int(old_points is not None)
+        if points_delta or count_delta:
+            deltas[suggestion_id] = (points_delta, count_delta)
+
+    if not deltas:
+        return
+
+    # Insert-or-increment in one statement: two first ballots for the same
+    # suggestion cannot both try to create its tally row
+    now = datetime.utcnow()
+    insert = upsert_insert(db, SuggestionTally.__table__)
+    db.execute(
+        insert.on_conflict_do_update(
+            index_elements=["suggestion_id"],
+            set_={
+                "points": insert.table.c.points + insert.excluded.points,
+                "vote_count": insert.table.c.vote_count + insert.excluded.vote_count,
+                "updated_at": insert.excluded.updated_at,
+            },
+        ),
+        [
+            {
+                "suggestion_id": sid,
+                "picklejar_id": picklejar_id,
+                "points": points_delta,
+                "vote_count": count_delta,
+                "updated_at": now,
+            }
+            for sid, (points_delta, count_delta) in deltas.items()
+        ],
+    )
+
+
+def participation_counts(db: Session, picklejar_id: str) -> dict:
+    """
+    Count members, suggestions and votes for a PickleJar in one statement.
+
+    Uses scalar COUNT/SUM subqueries so the cost is a single round trip no
+    matter how many members or suggestions the jar has.
+    """
+
+    def flag_count(column):
+        return func.coalesce(func.sum(case((column == True, 1), else_=0)), 0)
+
+    member_counts = (
+        select(
+            func.count(Member.id).label("member_count"),
+            flag_count(Member.has_suggested).label("members_who_suggested"),
+            flag_count(Member.has_voted).label("members_who_voted"),
+        )
+        .where(Member.picklejar_id == picklejar_id)
+        .subquery()
+    )
+    suggestion_count = (
+        select(func.count(Suggestion.id))
+        .where(Suggestion.picklejar_id == picklejar_id)
+        .scalar_subquery()
+    )
+    total_votes_cast = (
+        select(func.coalesce(func.sum(SuggestionTally.vote_count), 0))
+        .where(SuggestionTally.picklejar_id == picklejar_id)
+        .scalar_subquery()
+    )
+
+    row = db.execute(
+        select(
+            member_counts,
+            suggestion_count.label("suggestion_count"),
+            total_votes_cast.label("total_votes_cast"),
+        )
+    ).mappings().one()
+
+    return dict(row)
+
+
+def jar_tallies(db: Session, picklejar_id: str) -> List[dict]:
+    """Return the stored tallies of every suggestion in a PickleJar."""
+    rows = (
+        db.query(
+            SuggestionTally.suggestion_id,
+            SuggestionTally.points,
+            SuggestionTally.vote_count,
+        )
+        .filter(SuggestionTally.picklejar_id == picklejar_id)
+        .all()
+    )
+    return [
+        {"suggestion_id": sid, "points": points, "vote_count": count}
+        for sid, points, count in rows
+    ]
+
+
+def _computed_tallies(db: Session, picklejar_id: Optional[str] = None) -> dict:
+    """
+    Recompute {suggestion_id: (picklejar_id, points, vote_count)} from the
+    votes table plus the decoded packed ballots.
+    """
+    query = db.query(
+        Suggestion.id,
+        Suggestion.picklejar_id,
+        Suggestion.ordinal,
+        func.coalesce(func.sum(Vote.points), 0),
+        func.count(Vote.id),
+    ).outerjoin(Vote, Vote.suggestion_id == Suggestion.id)
+    if picklejar_id:
+        query = query.filter(Suggestion.picklejar_id == picklejar_id)
+    rows = query.group_by(
+        Suggestion.id, Suggestion.picklejar_id, Suggestion.ordinal
+    ).all()
+
+    packed_query = db.query(PackedBallot.picklejar_id, PackedBallot.entries)
+    if picklejar_id:
+        packed_query = packed_query.filter(PackedBallot.picklejar_id == picklejar_id)
+    blobs_by_jar = defaultdict(list)
+    for jar_id, entries in packed_query:
+        blobs_by_jar[jar_id].append(entries)
+    packed_totals = {
+        jar_id: decode_totals(blobs) for jar_id, blobs in blobs_by_jar.items()
+    }
+
+    computed = {}
+    for sid, jar_id, ordinal, points, count in rows:
+        points, count = int(points), int(count)
+        if jar_id in packed_totals and ordinal is not None:
+            packed_points, packed_counts = packed_totals[jar_id]
+            if ordinal < len(packed_counts):
+                points += int(packed_points[ordinal])
+                count += int(packed_counts[ordinal])
+        computed[sid] = (jar_id, points, count)
+    return computed
+
+
+def verify_tallies(db: Session, picklejar_id: Optional[str] = None) -> List[dict]:
+    """
+    Compare stored tallies against the votes and packed ballots.
+
+    Returns one entry per suggestion whose stored totals disagree with the
+    recomputed ones. A missing tally row counts as zero points and votes.
+    """
+    expected = _computed_tallies(db, picklejar_id)
+
+    query = db.query(
+        SuggestionTally.suggestion_id,
+        SuggestionTally.points,
+        SuggestionTally.vote_count,
+    )
+    if picklejar_id:
+        query = query.filter(SuggestionTally.picklejar_id == picklejar_id)
+    stored = {sid: (points, count) for sid, points, count in query.all()}
+
+    mismatches = []
+    for sid in set(expected) | set(stored):
+        _, expected_points, expected_count = expected.get(sid, (None, 0, 0))
+        stored_points, stored_count = stored.get(sid, (0, 0))
+        if (expected_points, expected_count) != (stored_points, stored_count):
+            mismatches.append(
+                {
+                    "suggestion_id": sid,
+                    "stored_points": stored_points,
+                    "stored_vote_count": stored_count,
+                    "expected_points": expected_points,
+                    "expected_vote_count": expected_count,
+                }
+            )
+    return mismatches
+
+
+def rebuild_tallies(db: Session, picklejar_id: Optional[str] = None) -> int:
+    """
+    Replace stored tallies with totals recomputed from the stored ballots.
+
+    Returns the number of tally rows written. Does not commit.
+    """
+    expected = _computed_tallies(db, picklejar_id)
+
+    delete_query = db.query(SuggestionTally)
+    if picklejar_id:
+        delete_query = delete_query.filter(SuggestionTally.picklejar_id == picklejar_id)
+    delete_query.delete(synchronize_session=False)
+
+    if expected:
+        now = datetime.utcnow()
+        db.execute(
+            SuggestionTally.__table__.insert(),
+            [
+                {
+                    "suggestion_id": sid,
+                    "picklejar_id": jar_id,
+                    "points": points,
+                    "vote_count": count,
+                    "updated_at": now,
+                }
+                for sid, (jar_id, points, count) in expected.items()
+            ],
+        )
+    return len(expected)
@@ -0,0 +1,79 @@
+"""
+Shared test fixtures.
+
+The app reads its settings when it is imported, so the test database and
+settings are put in the environment here, before any test module imports
+it. Every test session gets a fresh SQLite file.
+
+ASYNC_DATABASE only creates the async engine; the shared `client` serves the
+sync routes, and tests build an async app with `create_app` where needed.
+"""
+
+import os
+import tempfile
+
+_tmp_dir = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir.name, 'test.db')}"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["DEADLINE_SCHEDULER_ENABLED"] = "false"
+os.environ["METRICS_ENABLED"] = "false"
+os.environ["SLOW_QUERY_MS"] = "0"
+os.environ["ASYNC_DATABASE"] = "true"
+# Keep the heartbeat writer from running statements during a test
+os.environ["HEARTBEAT_FLUSH_SECONDS"] = "3600"
+
+import pytest
+from database import Base, SessionLocal, engine
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    # Registers the tables even when no test module imported the models
+    import models  # noqa: F401
+
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+    _tmp_dir.cleanup()
+
+
+@pytest.fixture(scope="session")
+def client(database):
+    from main import create_app
+
+    with TestClient(create_app(async_database=False)) as client:
+        yield client
+
+
+@pytest.fixture
+def db(database):
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def voting_jar(client):
+    """A jar in voting with three members, each with one suggestion."""
+    picklejar_id = client.post("/api/picklejars/", json={"title": "Tests"}).json()["id"]
+    member_ids = [
+        client.post(
+            f"/api/members/{picklejar_id}/join",
+            json={"phone_number": f"+1555000000{number}"},
+        ).json()["id"]
+        for number in range(3)
+    ]
+    client.post(f"/api/picklejars/{picklejar_id}/start-suggesting")
+    suggestion_ids = [
+        client.post(
+            f"/api/suggestions/{picklejar_id}/suggest",
+            params={"member_id": member_id},
+            json={"title": f"Idea {number}"},
+        ).json()["id"]
+        for number, member_id in enumerate(member_ids)
+    ]
+    client.post(f"/api/picklejars/{picklejar_id}/start-voting")
+    return {"id": picklejar_id, "members": member_ids, "suggestions": suggestion_ids}
@@ -0,0 +1,135 @@
+import sqlite3
+
+import ballot_queue as ballot_queue_module
+import pytest
+from ballot_queue import BallotQueue
+from config import settings
+from database import SessionLocal
+from models import PickleJar
+from sqlalchemy.exc import OperationalError
+from tallies import jar_tallies
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return BallotQueue(str(tmp_path / "ballots.db"), session_factory=SessionLocal)
+
+
+def total_points(db, picklejar_id):
+    return sum(tally["points"] for tally in jar_tallies(db, picklejar_id))
+
+
+def jar_version(db, picklejar_id):
+    db.expire_all()
+    return db.get(PickleJar, picklejar_id).version
+
+
+def test_database_outage_leaves_ballots_in_the_log(queue, voting_jar, db):
+    jar = voting_jar
+    for member_id, suggestion_id in zip(jar["members"], jar["suggestions"]):
+        queue.submit(jar["id"], member_id, {suggestion_id: 2})
+
+    def unavailable():
+        raise OperationalError("BEGIN", {}, sqlite3.OperationalError("locked"))
+
+    queue.session_factory = unavailable
+    with pytest.raises(OperationalError):
+        queue.apply_pending()
+    assert queue.log.count() == 3
+    assert total_points(db, jar["id"]) == 0
+
+    queue.session_factory = SessionLocal
+    assert queue.apply_pending() == 3
+    assert queue.log.count() == 0
+    assert total_points(db, jar["id"]) == 6
+    assert queue.stats()["dead_letters"] == 0
+
+
+def test_ballot_for_a_closed_jar_is_dead_lettered(queue, client, voting_jar, db):
+    jar = voting_jar
+    queue.submit(jar["id"], jar["members"][0], {jar["suggestions"][1]: 2})
+    # Completed after the ballot was accepted but before it was applied
+    client.post(f"/api/picklejars/{jar['id']}/complete")
+    version = jar_version(db, jar["id"])
+
+    queue.apply_pending()
+
+    assert queue.log.count() == 0
+    assert queue.stats()["dead_letters"] == 1
+    assert total_points(db, jar["id"]) == 0
+    assert jar_version(db, jar["id"]) == version
+
+
+def test_only_the_failing_ballot_is_dead_lettered(queue, voting_jar, db, monkeypatch):
+    jar = voting_jar
+    broken_member = jar["members"][1]
+    write_ballot = ballot_queue_module.write_ballot
+
+    def failing_write(db, picklejar_id, member_id, ballot):
+        if member_id == broken_member:
+            raise ValueError("cannot be written")
+        return write_ballot(db, picklejar_id, member_id, ballot)
+
+    monkeypatch.setattr(ballot_queue_module, "write_ballot", failing_write)
+    for member_id, suggestion_id in zip(jar["members"], jar["suggestions"]):
+        queue.submit(jar["id"], member_id, {suggestion_id: 2})
+
+    queue.apply_pending()
+
+    assert queue.log.count() == 0
+    assert queue.stats()["dead_letters"] == 1
+    assert total_points(db, jar["id"]) == 4
+
+
+def test_member_reads_their_queued_ballot_back(
+    queue, client, voting_jar, monkeypatch
+):
+    monkeypatch.setattr(settings, "BALLOT_INGESTION", "queued")
+    monkeypatch.setattr(ballot_queue_module.ballot_queue, "_log", queue.log)
+    jar = voting_jar
+    voter, other = jar["members"][0], jar["members"][1]
+    before = client.get(
+        f"/api/picklejars/{jar['id']}/snapshot", params={"member_id": voter}
+    )
+
+    response = client.post(
+        f"/api/votes/{jar['id']}/vote",
+        params={"member_id": voter},
+        json={"votes": [{"suggestion_id": jar["suggestions"][1], "points": 2}]},
+    )
+    assert response.status_code == 201
+    assert queue.log.count() == 1
+
+    # Someone else's read does not flush the queue
+    results = client.get(
+        f"/api/picklejars/{jar['id']}/results", params={"member_id": other}
+    )
+    assert results.json()["stats"]["total_votes_cast"] == 0
+    assert queue.log.count() == 1
+
+    results = client.get(
+        f"/api/picklejars/{jar['id']}/results", params={"member_id": voter}
+    )
+    assert results.json()["stats"]["total_votes_cast"] == 1
+    assert queue.log.count() == 0
+
+    # The snapshot applies it too, so a cached copy is not revalidated
+    client.post(
+        f"/api/votes/{jar['id']}/vote",
+        params={"member_id": voter},
+        json={"votes": [{"suggestion_id": jar["suggestions"][2], "points": 1}]},
+    )
+    assert queue.log.count() == 1
+    snapshot = client.get(
+        f"/api/picklejars/{jar['id']}/snapshot",
+        params={"member_id": voter},
+        headers={"If-None-Match": before.headers["ETag"]},
+    )
+    assert snapshot.status_code == 200
+    assert queue.log.count() == 0
+    assert snapshot.json()["votes"]["total_points_allocated"] == 1
+    points = {
+        suggestion["id"]: suggestion["total_points"]
+        for suggestion in snapshot.json()["results"]["all_suggestions"]
+    }
+    assert points[jar["suggestions"][2]] == 1
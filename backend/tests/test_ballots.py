@@ -0,0 +1,67 @@
+"""
+Packed ballots decode to the ballot that was encoded, and a jar voting with
+BALLOT_STORAGE=packed reads back and tallies the same votes as with rows.
+"""
+
+import pytest
+from ballots import decode_entries, decode_totals, encode_entries
+from config import settings
+from models import PackedBallot, Vote
+
+
+def test_entries_round_trip_sorted_by_ordinal():
+    entries = {5: 2, 0: 1, 3: 2**32 - 1}
+
+    blob = encode_entries(entries)
+
+    assert len(blob) == 8 * len(entries)
+    assert list(decode_entries(blob).items()) == [(0, 1), (3, 2**32 - 1), (5, 2)]
+    assert decode_entries(encode_entries({})) == {}
+
+
+def test_totals_sum_points_and_votes_per_ordinal():
+    blobs = [encode_entries({0: 2, 2: 1}), encode_entries({2: 3}), b""]
+
+    points, counts = decode_totals(blobs, size=4)
+
+    assert points.tolist() == [2, 0, 4, 0]
+    assert counts.tolist() == [1, 0, 2, 0]
+
+
+@pytest.fixture
+def packed(monkeypatch):
+    monkeypatch.setattr(settings, "BALLOT_STORAGE", "packed")
+
+
+def vote(client, picklejar_id, member_id, points):
+    response = client.post(
+        f"/api/votes/{picklejar_id}/vote",
+        params={"member_id": member_id},
+        json={"votes": [{"suggestion_id": s, "points": p} for s, p in points.items()]},
+    )
+    assert response.status_code == 201
+
+
+def ballot(client, picklejar_id, member_id):
+    votes = client.get(f"/api/votes/{picklejar_id}/votes/{member_id}").json()
+    return {v["suggestion_id"]: v["points"] for v in votes["votes"]}
+
+
+def test_packed_ballots_are_read_back_and_tallied(client, db, packed, voting_jar):
+    picklejar_id = voting_jar["id"]
+    first, second, third = voting_jar["suggestions"]
+    member_id = voting_jar["members"][0]
+
+    vote(client, picklejar_id, member_id, {first: 1, third: 1})
+    vote(client, picklejar_id, member_id, {third: 2})
+    vote(client, picklejar_id, voting_jar["members"][1], {second: 1, third: 1})
+
+    assert ballot(client, picklejar_id, member_id) == {third: 2}
+    assert db.query(PackedBallot).filter_by(picklejar_id=picklejar_id).count() == 2
+    assert db.query(Vote).filter_by(picklejar_id=picklejar_id).count() == 0
+
+    client.post(f"/api/picklejars/{picklejar_id}/complete")
+    results = client.get(f"/api/picklejars/{picklejar_id}/results").json()
+    totals = {s["id"]: s["total_points"] for s in results["all_suggestions"]}
+    assert totals == {first: 0, second: 1, third: 3}
+    assert results["stats"]["total_votes_cast"] == 3
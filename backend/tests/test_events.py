@@ -0,0 +1,134 @@
+"""
+Resuming the live event stream: IDs from before a restart or from pruned
+histories get a `resync`, and the shared SQLite backend is read off the
+event loop. Snapshots are only built for jars someone is subscribed to.
+"""
+
+import asyncio
+import os
+import threading
+
+import events
+from events import EventBroker, InMemoryEventBackend, SQLiteEventBackend
+from sqlalchemy import event
+
+
+def first_frames(broker, picklejar_id, last_event_id, count=2):
+    """The first `count` frames of a stream, after the `retry` line."""
+
+    async def read():
+        stream = broker.stream(picklejar_id, last_event_id)
+        frames = [await stream.__anext__() for _ in range(count + 1)]
+        await stream.aclose()
+        return frames[1:]
+
+    return asyncio.run(read())
+
+
+def test_resume_from_before_restart_resyncs():
+    before = InMemoryEventBackend()
+    stale_id = before.append("jar", "status", {"status": "voting"}).id
+
+    restarted = EventBroker(InMemoryEventBackend())
+    restarted.publish("jar", "status", {"status": "completed"})
+    frames = first_frames(restarted, "jar", stale_id, count=1)
+
+    assert "event: resync" in frames[0]
+
+
+def test_resume_from_unknown_id_resyncs():
+    broker = EventBroker(InMemoryEventBackend())
+    latest = broker.publish("jar", "status", {"status": "voting"}).id
+
+    frames = first_frames(broker, "jar", latest + 1000, count=1)
+
+    assert "event: resync" in frames[0]
+    assert f"id: {latest}\n" in frames[0]
+
+
+def test_resume_within_history_replays_events():
+    broker = EventBroker(InMemoryEventBackend())
+    first = broker.publish("jar", "status", {"status": "suggesting"}).id
+    broker.publish("jar", "status", {"status": "voting"})
+
+    frames = first_frames(broker, "jar", first, count=1)
+
+    assert '"voting"' in frames[0]
+
+
+def test_prune_drops_idle_unsubscribed_histories():
+    backend = InMemoryEventBackend()
+    idle_id = backend.append("idle", "status", {"status": "voting"}).id
+    backend.append("watched", "status", {"status": "voting"})
+
+    backend.prune(keep={"watched", "empty"}, max_age=0)
+
+    assert "idle" not in backend._history
+    assert backend.events_since("idle", idle_id - 1) is None
+    assert [e.data for e in backend.events_since("watched", idle_id)] == [
+        {"status": "voting"}
+    ]
+    # A subscribed jar without events keeps the ID its streams started from
+    assert backend.events_since("empty", idle_id - 1) == []
+
+
+def test_sqlite_backend_is_read_off_the_event_loop(tmp_path):
+    backend = SQLiteEventBackend(os.path.join(tmp_path, "events.db"))
+    read_threads = set()
+    events_since = backend.events_since
+
+    def recording_events_since(*args):
+        read_threads.add(threading.get_ident())
+        return events_since(*args)
+
+    backend.events_since = recording_events_since
+    broker = EventBroker(backend)
+    first = broker.publish("jar", "status", {"status": "suggesting"}).id
+    broker.publish("jar", "status", {"status": "voting"})
+
+    async def read():
+        loop_thread = threading.get_ident()
+        stream = broker.stream("jar", first)
+        await stream.__anext__()
+        frame = await stream.__anext__()
+        await stream.aclose()
+        return loop_thread, frame
+
+    loop_thread, frame = asyncio.run(read())
+
+    assert '"voting"' in frame
+    assert read_threads and loop_thread not in read_threads
+
+
+def test_participation_snapshot_is_only_built_for_subscribers(
+    monkeypatch, database, db, voting_jar
+):
+    picklejar_id = voting_jar["id"]
+    statements = []
+
+    def listener(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(database, "before_cursor_execute", listener)
+    try:
+        published = events.broker.backend.latest_id(picklejar_id)
+        events.publish_participation(
+            db, picklejar_id, "ballot_submitted", include_tallies=True
+        )
+        assert statements == []
+        [unwatched] = events.broker.backend.events_since(picklejar_id, published)
+        assert unwatched.data == {}
+
+        loop = asyncio.new_event_loop()
+        monkeypatch.setitem(
+            events.broker._waiters, picklejar_id, {(loop, asyncio.Event())}
+        )
+        events.publish_participation(
+            db, picklejar_id, "ballot_submitted", include_tallies=True
+        )
+        loop.close()
+        watched = events.broker.backend.events_since(picklejar_id, unwatched.id)[0]
+        assert watched.data["participation"]["member_count"] == 3
+        assert "tallies" in watched.data
+    finally:
+        event.remove(database, "before_cursor_execute", listener)
@@ -0,0 +1,74 @@
+"""
+Cached jars expire after the TTL, and an invalidation published by one
+worker reaches the caches of the others.
+"""
+
+import pytest
+from jar_cache import InMemoryInvalidationChannel, JarCache, SQLiteInvalidationChannel
+from models import PickleJar
+from sqlalchemy import update
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def jar_id(db):
+    picklejar = PickleJar(title="Cached")
+    db.add(picklejar)
+    db.commit()
+    return picklejar.id
+
+
+def rename(db, picklejar_id, title):
+    """Change the row behind the caches' backs, like a script would."""
+    db.execute(
+        update(PickleJar).where(PickleJar.id == picklejar_id).values(title=title)
+    )
+    db.commit()
+
+
+def test_entries_expire_after_the_ttl(db, jar_id):
+    clock = Clock()
+    cache = JarCache(InMemoryInvalidationChannel(), ttl_seconds=30, clock=clock)
+    cache.get(db, jar_id)
+    rename(db, jar_id, "Renamed")
+
+    clock.now += 29
+    assert cache.get(db, jar_id).title == "Cached"
+    clock.now += 1
+    assert cache.get(db, jar_id).title == "Renamed"
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_invalidations_reach_other_workers(db, jar_id, tmp_path):
+    path = str(tmp_path / "cache.db")
+    workers = [JarCache(SQLiteInvalidationChannel(path)) for _ in range(2)]
+    for cache in workers:
+        cache.get(db, jar_id)
+    rename(db, jar_id, "Renamed")
+
+    workers[0].invalidate([jar_id])
+
+    assert [cache.get(db, jar_id).title for cache in workers] == ["Renamed"] * 2
+    assert [cache.invalidations for cache in workers] == [1, 1]
+
+
+def test_a_worker_that_fell_behind_drops_everything(db, jar_id, tmp_path):
+    path = str(tmp_path / "cache.db")
+    behind = JarCache(SQLiteInvalidationChannel(path))
+    ahead = JarCache(SQLiteInvalidationChannel(path, history_size=2))
+    behind.get(db, jar_id)
+    rename(db, jar_id, "Renamed")
+
+    # Publishing trims all but the last two rows, including the one naming
+    # the cached jar, before the other worker polls
+    ahead.invalidate([jar_id, "other-1", "other-2", "other-3"])
+
+    assert behind.get(db, jar_id).title == "Renamed"
+    assert behind.stats()["invalidations"] == 1
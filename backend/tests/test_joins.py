@@ -0,0 +1,119 @@
+"""
+Joining again is idempotent: a blank display name keeps the member's name,
+and only a join that adds a member or renames one bumps the jar's version.
+Bulk joins report every row and refuse oversized bodies.
+"""
+
+import json
+
+import pytest
+from config import settings
+from jar_cache import get_jar
+
+
+@pytest.fixture
+def jar_id(client):
+    return client.post("/api/picklejars/", json={"title": "Joins"}).json()["id"]
+
+
+def join(client, picklejar_id, phone_number, **fields):
+    response = client.post(
+        f"/api/members/{picklejar_id}/join",
+        json={"phone_number": phone_number, **fields},
+    )
+    assert response.status_code == 201
+    return response.json()
+
+
+def version(db, picklejar_id):
+    db.expire_all()
+    return get_jar(db, picklejar_id).version
+
+
+def test_rejoining_with_a_blank_name_keeps_the_name(client, jar_id):
+    member = join(client, jar_id, "+15551230000", display_name="Ada")
+
+    rejoined = join(client, jar_id, "+15551230000", display_name="  ")
+
+    assert rejoined["id"] == member["id"]
+    assert rejoined["display_name"] == "Ada"
+
+
+def test_only_joins_that_change_a_member_bump_the_version(client, db, jar_id):
+    join(client, jar_id, "+15551230001", display_name="Ada")
+    joined = version(db, jar_id)
+
+    join(client, jar_id, "+15551230001")
+    join(client, jar_id, "+15551230001", display_name="Ada")
+    join(client, jar_id, "+15551230001", display_name="")
+    assert version(db, jar_id) == joined
+
+    renamed = join(client, jar_id, "+15551230001", display_name="Grace")
+    assert renamed["display_name"] == "Grace"
+    assert version(db, jar_id) == joined + 1
+
+
+def bulk_join(client, picklejar_id, body, **kwargs):
+    return client.post(f"/api/members/{picklejar_id}/bulk-join", content=body, **kwargs)
+
+
+def test_bulk_join_reports_every_row(client, db, jar_id):
+    join(client, jar_id, "+15551230002", display_name="Ada")
+    join(client, jar_id, "+15551230003", display_name="Grace")
+    body = (
+        "phone_number,display_name\n"
+        "+1 (555) 123-0004,Alan\n"
+        "+15551230002,\n"
+        "+15551230003,Hopper\n"
+        "+1 555 123 0004,Alan again\n"
+        "12345,Too short\n"
+    )
+
+    response = bulk_join(client, jar_id, body, headers={"Content-Type": "text/csv"})
+
+    assert response.status_code == 200
+    *rows, summary = [json.loads(line) for line in response.text.splitlines()]
+    assert [(row["row"], row["status"]) for row in rows] == [
+        (1, "created"),
+        (2, "existing"),
+        (3, "updated"),
+        (4, "duplicate"),
+        (5, "invalid"),
+    ]
+    assert rows[3]["detail"] == "Same number as row 1"
+    assert summary["summary"] == {
+        "created": 1,
+        "updated": 1,
+        "existing": 1,
+        "duplicate": 1,
+        "invalid": 1,
+    }
+    names = {
+        member["display_name"]
+        for member in client.get(f"/api/members/{jar_id}/members").json()
+    }
+    assert {"Ada", "Hopper", "Alan"} <= names
+
+
+def test_bulk_join_rejects_too_many_rows(client, jar_id, monkeypatch):
+    monkeypatch.setattr(settings, "BULK_JOIN_MAX_ROWS", 2)
+    body = json.dumps([f"+1555123100{number}" for number in range(3)])
+
+    assert bulk_join(client, jar_id, body).status_code == 413
+    assert client.get(f"/api/members/{jar_id}/members").json() == []
+
+
+def test_bulk_join_rejects_large_bodies_while_reading_them(
+    client, jar_id, monkeypatch
+):
+    monkeypatch.setattr(settings, "BULK_JOIN_MAX_BYTES", 64)
+    body = json.dumps([f"+1555123200{number}" for number in range(5)]).encode()
+
+    def chunks():
+        # Sent chunked, without a Content-Length to reject up front
+        for start in range(0, len(body), 16):
+            yield body[start : start + 16]
+
+    assert bulk_join(client, jar_id, body).status_code == 413
+    assert bulk_join(client, jar_id, chunks()).status_code == 413
+    assert client.get(f"/api/members/{jar_id}/members").json() == []
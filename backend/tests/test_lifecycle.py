@@ -0,0 +1,111 @@
+"""
+A jar's whole lifecycle, served by the sync routes and by their async
+versions (ASYNC_DATABASE), including with the jar cache and live events
+shared through SQLite files.
+"""
+
+import asyncio
+import os
+
+import events
+import pytest
+from config import settings
+from events import SQLiteEventBackend
+from fastapi.testclient import TestClient
+from jar_cache import SQLiteInvalidationChannel, jar_cache
+from main import create_app
+
+
+def off_event_loop(method):
+    """Wrap a blocking method to fail if it is called on a running loop."""
+
+    def wrapper(*args, **kwargs):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return method(*args, **kwargs)
+        raise AssertionError(f"{method.__qualname__} blocked the event loop")
+
+    return wrapper
+
+
+@pytest.fixture
+def sqlite_channels(monkeypatch, tmp_path):
+    """Share the jar cache and live events through SQLite files."""
+    monkeypatch.setattr(settings, "JAR_CACHE_CHANNEL", "sqlite")
+    monkeypatch.setattr(settings, "EVENTS_BACKEND", "sqlite")
+
+    channel = SQLiteInvalidationChannel(os.path.join(tmp_path, "cache.db"))
+    channel.subscribe(jar_cache._drop)
+    monkeypatch.setattr(channel, "poll", off_event_loop(channel.poll))
+    monkeypatch.setattr(channel, "publish", off_event_loop(channel.publish))
+    monkeypatch.setattr(jar_cache, "channel", channel)
+
+    backend = SQLiteEventBackend(os.path.join(tmp_path, "events.db"))
+    monkeypatch.setattr(backend, "append", off_event_loop(backend.append))
+    monkeypatch.setattr(events.broker, "backend", backend)
+
+
+@pytest.fixture(params=["sync", "async", "async-sqlite"])
+def app_client(request, database):
+    if request.param == "async-sqlite":
+        request.getfixturevalue("sqlite_channels")
+    app = create_app(async_database=request.param != "sync")
+    with TestClient(app) as client:
+        yield client
+
+
+def test_lifecycle(app_client):
+    client = app_client
+    jar = client.post("/api/picklejars/", json={"title": "Lifecycle"})
+    assert jar.status_code == 201, jar.text
+    picklejar_id = jar.json()["id"]
+
+    member_ids = []
+    for number in range(2):
+        member = client.post(
+            f"/api/members/{picklejar_id}/join",
+            json={"phone_number": f"+1555100000{number}"},
+        )
+        assert member.status_code == 201, member.text
+        member_ids.append(member.json()["id"])
+
+    response = client.post(f"/api/picklejars/{picklejar_id}/start-suggesting")
+    assert response.status_code == 200, response.text
+    suggestion_ids = []
+    for number, member_id in enumerate(member_ids):
+        suggestion = client.post(
+            f"/api/suggestions/{picklejar_id}/suggest",
+            params={"member_id": member_id},
+            json={"title": f"Idea {number}"},
+        )
+        assert suggestion.status_code == 201, suggestion.text
+        suggestion_ids.append(suggestion.json()["id"])
+
+    response = client.post(f"/api/picklejars/{picklejar_id}/start-voting")
+    assert response.status_code == 200, response.text
+    points_per_voter = client.get(f"/api/picklejars/{picklejar_id}").json()[
+        "points_per_voter"
+    ]
+    for member_id in member_ids:
+        response = client.post(
+            f"/api/votes/{picklejar_id}/vote",
+            params={"member_id": member_id},
+            json={
+                "votes": [
+                    {"suggestion_id": suggestion_ids[0], "points": points_per_voter}
+                ]
+            },
+        )
+        assert response.status_code == 201, response.text
+
+    response = client.post(f"/api/picklejars/{picklejar_id}/complete")
+    assert response.status_code == 200, response.text
+
+    results = client.get(f"/api/picklejars/{picklejar_id}/results")
+    assert results.status_code == 200, results.text
+    results = results.json()
+    assert results["stats"]["total_votes_cast"] == 2
+    assert results["winner"]["suggestion"]["id"] == suggestion_ids[0]
+    assert results["winner"]["total_points"] == 2 * points_per_voter
+    assert client.get("/health").status_code == 200
@@ -0,0 +1,103 @@
+"""
+The jar detail, stats and results endpoints are built on SQL aggregates, so
+the number of statements they run must not grow with the jar.
+"""
+
+from datetime import datetime
+
+import pytest
+from models import Member, PickleJar, Suggestion, Vote, generate_uuid
+from sqlalchemy import event
+from tallies import rebuild_tallies
+
+ENDPOINTS = ("", "/stats", "/results")
+
+
+def seed_jar(db, members: int, status: str) -> str:
+    """A jar with `members` members, one suggestion per ten and full ballots."""
+    now = datetime.utcnow()
+    jar = PickleJar(title=f"{members} members", status=status, points_per_voter=3)
+    db.add(jar)
+    db.flush()
+
+    member_rows = [
+        {
+            "id": generate_uuid(),
+            "picklejar_id": jar.id,
+            "phone_number": f"+1555{number:07d}",
+            "has_suggested": number % 10 == 0,
+            "has_voted": True,
+            "joined_at": now,
+        }
+        for number in range(members)
+    ]
+    suggestion_rows = [
+        {
+            "id": generate_uuid(),
+            "picklejar_id": jar.id,
+            "member_id": member["id"],
+            "ordinal": ordinal,
+            "title": f"Suggestion {ordinal}",
+            "created_at": now,
+        }
+        for ordinal, member in enumerate(member_rows[::10])
+    ]
+    vote_rows = [
+        {
+            "id": generate_uuid(),
+            "member_id": member["id"],
+            "suggestion_id": suggestion_rows[number % len(suggestion_rows)]["id"],
+            "picklejar_id": jar.id,
+            "points": 3,
+            "created_at": now,
+        }
+        for number, member in enumerate(member_rows)
+    ]
+    db.execute(Member.__table__.insert(), member_rows)
+    db.execute(Suggestion.__table__.insert(), suggestion_rows)
+    db.execute(Vote.__table__.insert(), vote_rows)
+    rebuild_tallies(db, jar.id)
+    db.commit()
+    return jar.id
+
+
+def statement_counts(client, engine, picklejar_id: str) -> dict:
+    counts = {}
+    statements = [0]
+
+    def count(*args):
+        statements[0] += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        for endpoint in ENDPOINTS:
+            statements[0] = 0
+            response = client.get(f"/api/picklejars/{picklejar_id}{endpoint}")
+            assert response.status_code == 200, response.text
+            counts[endpoint or "detail"] = statements[0]
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return counts
+
+
+@pytest.mark.parametrize("status", ["voting", "completed"])
+def test_statement_count_does_not_grow_with_members(client, database, db, status):
+    small = seed_jar(db, 10, status)
+    large = seed_jar(db, 2000, status)
+
+    small_counts = statement_counts(client, database, small)
+    large_counts = statement_counts(client, database, large)
+
+    assert large_counts == small_counts
+    # A few aggregate statements per endpoint, not one per member
+    assert max(small_counts.values()) <= 10
+
+
+def test_large_jar_results_are_complete(client, db):
+    picklejar_id = seed_jar(db, 2000, "voting")
+
+    results = client.get(f"/api/picklejars/{picklejar_id}/results").json()
+
+    assert len(results["all_suggestions"]) == 200
+    assert results["stats"]["total_votes_cast"] == 2000
+    assert sum(s["total_points"] for s in results["all_suggestions"]) == 6000
@@ -0,0 +1,87 @@
+"""
+Token buckets refill over the period, jar buckets are shared by every
+client of a jar, and rejected requests say when to retry.
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+from rate_limit import InMemoryTokenBucketStore, RateLimitMiddleware
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def limited(clock, requests=100, jar_requests=100) -> TestClient:
+    """
+    A client for an app allowing `requests` per client and `jar_requests`
+    per jar every 60 seconds, for reads and writes alike.
+    """
+    app = RateLimitMiddleware(
+        ok_app,
+        InMemoryTokenBucketStore(),
+        read_requests=requests,
+        write_requests=requests,
+        jar_read_requests=jar_requests,
+        jar_write_requests=jar_requests,
+        period_seconds=60,
+        client_header="X-Client",
+        clock=clock,
+    )
+    return TestClient(app)
+
+
+def get(client, path, client_id="a"):
+    return client.get(path, headers={"X-Client": client_id})
+
+
+def test_buckets_refill_over_the_period(clock):
+    client = limited(clock, requests=2)
+    assert [get(client, "/api/picklejars/").status_code for _ in range(2)] == [200] * 2
+
+    rejected = get(client, "/api/picklejars/")
+    assert rejected.status_code == 429
+    # One token every 30 seconds
+    assert rejected.headers["Retry-After"] == "30"
+
+    clock.now += 10.5
+    assert get(client, "/api/picklejars/").headers["Retry-After"] == "20"
+    clock.now += 19.5
+    assert get(client, "/api/picklejars/").status_code == 200
+    assert get(client, "/api/picklejars/").status_code == 429
+
+
+def test_reads_and_writes_have_separate_budgets(clock):
+    client = limited(clock, requests=1)
+    assert get(client, "/api/picklejars/").status_code == 200
+    assert get(client, "/api/picklejars/").status_code == 429
+
+    write = client.post("/api/picklejars/", headers={"X-Client": "a"})
+    assert write.status_code == 200
+
+
+def test_jar_buckets_are_shared_by_all_clients(clock):
+    client = limited(clock, jar_requests=2)
+    assert get(client, "/api/picklejars/jar-1", "a").status_code == 200
+    assert get(client, "/api/members/jar-1/members", "b").status_code == 200
+
+    assert get(client, "/api/votes/jar-1/results", "c").status_code == 429
+    assert get(client, "/api/picklejars/jar-2", "c").status_code == 200
+    # Addressed by the member's ID, not a jar's
+    assert get(client, "/api/members/member/jar-1", "c").status_code == 200
+    # Outside the API
+    assert get(client, "/health", "c").status_code == 200
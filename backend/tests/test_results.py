@@ -0,0 +1,92 @@
+"""
+A completed jar's results are frozen when it completes and again when it is
+edited, and served from that snapshot. Reading results never writes.
+"""
+
+import pytest
+from jar_cache import get_jar
+from models import ResultsSnapshot
+from sqlalchemy import delete, event
+
+
+@pytest.fixture
+def completed_jar(client, voting_jar):
+    picklejar_id = voting_jar["id"]
+    client.post(
+        f"/api/votes/{picklejar_id}/vote",
+        params={"member_id": voting_jar["members"][0]},
+        json={"votes": [{"suggestion_id": voting_jar["suggestions"][2], "points": 2}]},
+    )
+    assert client.post(f"/api/picklejars/{picklejar_id}/complete").status_code == 200
+    return voting_jar
+
+
+def snapshot(db, picklejar_id):
+    db.expire_all()
+    return db.get(ResultsSnapshot, picklejar_id)
+
+
+def writes_during(engine, action):
+    """Run `action` and return the INSERT, UPDATE and DELETE statements it ran."""
+    writes = []
+
+    def record(conn, cursor, statement, *args):
+        verb = statement.lstrip().split(None, 1)[0].upper()
+        if verb in ("INSERT", "UPDATE", "DELETE"):
+            writes.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        action()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return writes
+
+
+def test_results_are_served_from_the_snapshot_frozen_at_completion(
+    client, db, completed_jar
+):
+    picklejar_id = completed_jar["id"]
+    frozen = snapshot(db, picklejar_id)
+    assert frozen.version == get_jar(db, picklejar_id).version
+
+    response = client.get(f"/api/picklejars/{picklejar_id}/results")
+
+    assert response.content == frozen.body
+    winner = response.json()["winner"]["suggestion"]
+    assert winner["id"] == completed_jar["suggestions"][2]
+
+
+def test_editing_a_completed_jar_freezes_its_results_again(client, db, completed_jar):
+    picklejar_id = completed_jar["id"]
+    version = snapshot(db, picklejar_id).version
+
+    client.patch(f"/api/picklejars/{picklejar_id}", json={"title": "Renamed"})
+
+    frozen = snapshot(db, picklejar_id)
+    assert frozen.version == version + 1
+    results = client.get(f"/api/picklejars/{picklejar_id}/results")
+    assert results.content == frozen.body
+    assert results.json()["picklejar"]["title"] == "Renamed"
+
+
+def test_results_without_a_snapshot_are_built_without_writing(
+    client, database, db, completed_jar
+):
+    picklejar_id = completed_jar["id"]
+    # As for a jar completed before snapshots existed
+    db.execute(
+        delete(ResultsSnapshot).where(ResultsSnapshot.picklejar_id == picklejar_id)
+    )
+    db.commit()
+
+    responses = []
+    writes = writes_during(
+        database,
+        lambda: responses.append(client.get(f"/api/picklejars/{picklejar_id}/results")),
+    )
+
+    assert writes == []
+    assert responses[0].status_code == 200
+    assert responses[0].json()["stats"]["total_votes_cast"] == 1
+    assert snapshot(db, picklejar_id) is None
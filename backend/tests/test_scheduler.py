@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+
+from scheduler import COMPACT_SLACK, RETRY_SECONDS, DeadlineScheduler
+
+NOW = datetime(2026, 1, 1, 12, 0)
+
+
+class RecordingScheduler(DeadlineScheduler):
+    """Records the jars it would advance instead of updating them."""
+
+    def __init__(self):
+        super().__init__(clock=lambda: NOW)
+        self.closed = []
+
+    def _close_suggesting(self, picklejar_id, now):
+        self.closed.append((picklejar_id, "suggestion"))
+        return 1
+
+    def _close_voting(self, picklejar_id, now):
+        self.closed.append((picklejar_id, "voting"))
+        return 1
+
+
+def test_rescheduling_a_jar_does_not_grow_the_heap():
+    scheduler = RecordingScheduler()
+    for minutes in range(10 * COMPACT_SLACK):
+        scheduler.schedule("jar", voting_deadline=NOW + timedelta(minutes=minutes))
+
+    assert len(scheduler._heap) <= 2 + COMPACT_SLACK
+
+
+def test_only_the_latest_deadline_fires():
+    scheduler = RecordingScheduler()
+    scheduler.schedule("jar", voting_deadline=NOW - timedelta(minutes=5))
+    scheduler.schedule("jar", voting_deadline=NOW - timedelta(minutes=1))
+    scheduler.schedule("later", voting_deadline=NOW - timedelta(minutes=2))
+    scheduler.schedule("later", voting_deadline=NOW + timedelta(minutes=5))
+
+    assert scheduler.run_due() == 1
+    assert scheduler.closed == [("jar", "voting")]
+    assert scheduler.run_due() == 0
+
+
+def test_cancelled_jar_is_not_advanced():
+    scheduler = RecordingScheduler()
+    scheduler.schedule(
+        "jar",
+        suggestion_deadline=NOW - timedelta(minutes=2),
+        voting_deadline=NOW - timedelta(minutes=1),
+    )
+    scheduler.cancel("jar")
+
+    assert scheduler.run_due() == 0
+    assert scheduler.closed == []
+
+
+class FlakyScheduler(RecordingScheduler):
+    """Fails to close voting for the jars in `failing`."""
+
+    def __init__(self, failing):
+        super().__init__()
+        self.failing = set(failing)
+
+    def _close_voting(self, picklejar_id, now):
+        if picklejar_id in self.failing:
+            raise RuntimeError("database is locked")
+        return super()._close_voting(picklejar_id, now)
+
+
+def test_failed_transition_does_not_stop_other_jars_and_is_retried():
+    scheduler = FlakyScheduler(failing={"b"})
+    for offset, picklejar_id in enumerate(["a", "b", "c"]):
+        scheduler.schedule(
+            picklejar_id, voting_deadline=NOW - timedelta(minutes=3 - offset)
+        )
+
+    assert scheduler.run_due() == 2
+    assert scheduler.closed == [("a", "voting"), ("c", "voting")]
+    retry_at = scheduler._deadlines[("b", "voting")]
+    assert retry_at == NOW + timedelta(seconds=RETRY_SECONDS)
+
+    # Still failing: the backoff doubles
+    scheduler.clock = lambda: retry_at
+    assert scheduler.run_due() == 0
+    assert scheduler._deadlines[("b", "voting")] == retry_at + timedelta(
+        seconds=2 * RETRY_SECONDS
+    )
+
+    scheduler.failing.clear()
+    scheduler.clock = lambda: retry_at + timedelta(seconds=2 * RETRY_SECONDS)
+    assert scheduler.run_due() == 1
+    assert scheduler.closed[-1] == ("b", "voting")
+    assert ("b", "voting") not in scheduler._failures
@@ -0,0 +1,131 @@
+"""
+Concurrent phase transitions: each is a single conditional UPDATE, so of
+several simultaneous requests for the same change exactly one succeeds.
+"""
+
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from scheduler import DeadlineScheduler
+
+THREADS = 8
+
+# (endpoint, status after)
+STEPS = [
+    ("start-suggesting", "suggesting"),
+    ("start-voting", "voting"),
+    ("complete", "completed"),
+    ("revert-to-voting", "voting"),
+    ("revert-to-suggesting", "suggesting"),
+    ("revert-to-setup", "setup"),
+]
+
+
+def race(attempt):
+    """Run `attempt(index)` in THREADS threads released at once."""
+    barrier = threading.Barrier(THREADS)
+    outcomes = [None] * THREADS
+
+    def run(index):
+        barrier.wait()
+        outcomes[index] = attempt(index)
+
+    workers = [threading.Thread(target=run, args=(i,)) for i in range(THREADS)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return outcomes
+
+
+@pytest.fixture(scope="module")
+def clients(client):
+    return [TestClient(client.app) for _ in range(THREADS)]
+
+
+@pytest.fixture
+def jar(client):
+    picklejar_id = client.post("/api/picklejars/", json={"title": "Race"}).json()["id"]
+    member_id = client.post(
+        f"/api/members/{picklejar_id}/join", json={"phone_number": "+15550000000"}
+    ).json()["id"]
+    return picklejar_id, member_id
+
+
+def jar_status(client, picklejar_id):
+    return client.get(f"/api/picklejars/{picklejar_id}").json()["status"]
+
+
+def test_each_transition_has_one_winner(client, clients, jar):
+    picklejar_id, member_id = jar
+    # Half the threads complete the jar through the deadline scheduler
+    after_deadline = DeadlineScheduler(
+        clock=lambda: datetime.utcnow() + timedelta(hours=2)
+    )
+
+    for endpoint, after in STEPS:
+        if endpoint == "start-voting":
+            client.post(
+                f"/api/suggestions/{picklejar_id}/suggest",
+                params={"member_id": member_id},
+                json={"title": "Idea"},
+            )
+        if endpoint == "complete":
+            deadline = (datetime.utcnow() + timedelta(hours=1)).isoformat()
+            client.patch(
+                f"/api/picklejars/{picklejar_id}", json={"voting_deadline": deadline}
+            )
+
+        def attempt(index):
+            if endpoint == "complete" and index % 2:
+                now = after_deadline.clock()
+                return 200 if after_deadline._close_voting(picklejar_id, now) else 400
+            url = f"/api/picklejars/{picklejar_id}/{endpoint}"
+            return clients[index].post(url).status_code
+
+        outcomes = race(attempt)
+
+        assert outcomes.count(200) == 1, (endpoint, outcomes)
+        assert set(outcomes) <= {200, 400, 409}, (endpoint, outcomes)
+        assert jar_status(client, picklejar_id) == after
+
+
+def test_if_match_transition_has_one_winner(client, clients, jar):
+    picklejar_id, _ = jar
+    etag = client.get(f"/api/picklejars/{picklejar_id}").headers["ETag"]
+
+    outcomes = race(
+        lambda index: clients[index]
+        .post(
+            f"/api/picklejars/{picklejar_id}/start-suggesting",
+            headers={"If-Match": etag},
+        )
+        .status_code
+    )
+
+    assert outcomes.count(200) == 1, outcomes
+    assert set(outcomes) <= {200, 400, 409, 412}, outcomes
+
+
+def test_concurrent_cancel_has_one_winner(client, clients, jar):
+    picklejar_id, _ = jar
+
+    url = f"/api/picklejars/{picklejar_id}"
+    outcomes = race(lambda index: clients[index].delete(url).status_code)
+
+    assert outcomes.count(200) == 1, outcomes
+    assert set(outcomes) <= {200, 400, 409}, outcomes
+    assert jar_status(client, picklejar_id) == "cancelled"
+
+
+def test_patch_cannot_change_status(client, jar):
+    picklejar_id, _ = jar
+
+    response = client.patch(
+        f"/api/picklejars/{picklejar_id}", json={"status": "completed"}
+    )
+
+    assert response.status_code == 400
+    assert jar_status(client, picklejar_id) == "setup"
@@ -0,0 +1,96 @@
+"""
+Conditional GETs and Cache-Control: jar reads are always revalidated, and
+only a completed jar's results pinned to its version may be cached.
+"""
+
+
+def etag_version(response) -> int:
+    """The jar version in an ETag, without the ballot counter of voting jars."""
+    return int(response.headers["ETag"].strip('"').split(".")[1])
+
+
+def complete(client, picklejar_id, member_id, suggestion_id):
+    client.post(
+        f"/api/votes/{picklejar_id}/vote",
+        params={"member_id": member_id},
+        json={"votes": [{"suggestion_id": suggestion_id, "points": 1}]},
+    )
+    assert client.post(f"/api/picklejars/{picklejar_id}/complete").status_code == 200
+
+
+def test_completed_jar_is_revalidated_after_revert(client, voting_jar):
+    picklejar_id = voting_jar["id"]
+    complete(client, picklejar_id, voting_jar["members"][0], voting_jar["suggestions"][0])
+
+    completed = client.get(f"/api/picklejars/{picklejar_id}")
+    assert completed.headers["Cache-Control"] == "no-cache"
+    etag = completed.headers["ETag"]
+    not_modified = client.get(
+        f"/api/picklejars/{picklejar_id}", headers={"If-None-Match": etag}
+    )
+    assert not_modified.status_code == 304
+
+    client.post(f"/api/picklejars/{picklejar_id}/revert-to-voting")
+    reverted = client.get(
+        f"/api/picklejars/{picklejar_id}", headers={"If-None-Match": etag}
+    )
+    assert reverted.status_code == 200
+    assert reverted.json()["status"] == "voting"
+
+
+def test_results_pinned_to_a_version_are_cacheable(client, voting_jar):
+    picklejar_id = voting_jar["id"]
+    complete(client, picklejar_id, voting_jar["members"][0], voting_jar["suggestions"][0])
+    results = client.get(f"/api/picklejars/{picklejar_id}/results")
+    assert results.headers["Cache-Control"] == "no-cache"
+    version = etag_version(results)
+
+    pinned = client.get(
+        f"/api/picklejars/{picklejar_id}/results", params={"version": version}
+    )
+    assert pinned.status_code == 200
+    assert pinned.headers["Cache-Control"].startswith("private, max-age=")
+    assert "immutable" in pinned.headers["Cache-Control"]
+    assert pinned.json() == results.json()
+
+    stale = client.get(
+        f"/api/picklejars/{picklejar_id}/results", params={"version": version - 1}
+    )
+    assert stale.headers["Cache-Control"] == "no-cache"
+
+
+def test_ballots_change_the_etag_but_not_the_jar_version(client, voting_jar):
+    from jar_cache import jar_cache
+
+    picklejar_id = voting_jar["id"]
+    before = client.get(f"/api/picklejars/{picklejar_id}")
+    invalidations = jar_cache.stats()["invalidations"]
+
+    client.post(
+        f"/api/votes/{picklejar_id}/vote",
+        params={"member_id": voting_jar["members"][0]},
+        json={"votes": [{"suggestion_id": voting_jar["suggestions"][1], "points": 1}]},
+    )
+
+    # The vote left the jar row and its cached copy alone
+    assert jar_cache.stats()["invalidations"] == invalidations
+    # Every read showing ballots sees a new ETag
+    for url in (
+        f"/api/picklejars/{picklejar_id}",
+        f"/api/picklejars/{picklejar_id}/results",
+        f"/api/picklejars/{picklejar_id}/snapshot",
+        f"/api/members/{picklejar_id}/members",
+    ):
+        response = client.get(url, headers={"If-None-Match": before.headers["ETag"]})
+        assert response.status_code == 200, url
+    after = client.get(f"/api/picklejars/{picklejar_id}")
+    assert after.json()["members_who_voted"] == before.json()["members_who_voted"] + 1
+    assert after.headers["ETag"] != before.headers["ETag"]
+    assert etag_version(after) == etag_version(before)
+
+    # If-Match only compares the jar version, so the host can still complete
+    response = client.post(
+        f"/api/picklejars/{picklejar_id}/complete",
+        headers={"If-Match": before.headers["ETag"]},
+    )
+    assert response.status_code == 200, response.text
@@ -0,0 +1,104 @@
+"""
+Phase transitions of a PickleJar as single conditional UPDATEs.
+
+A transition (start suggesting, start voting, complete, the reverts,
+cancelling, and the deadline scheduler's moves) is one `UPDATE ... WHERE id = ? AND
+status = ?` that also bumps the version and returns the updated row. Only
+one of several concurrent requests for the same transition can match, so
+no row is locked and nothing is read first. The affected row tells the
+caller whether it won.
+
+Clients can also make a transition conditional on the jar version they
+last saw by sending its ETag in `If-Match`. The version then becomes part
+of the WHERE clause, and the transition fails if anything changed the jar
+in between. Ballots do not count: the ballot part of a voting jar's ETag
+(see versioning.py) is ignored.
+"""
+
+from datetime import datetime
+from typing import Iterable, List, Optional, Sequence, Union
+
+from jar_cache import invalidate_on_commit
+from models import PickleJar, Suggestion
+from sqlalchemy import Row, case, func, select, update
+from sqlalchemy.orm import Session
+
+
+def suggestion_count(picklejar_id: str):
+    """SQL expression counting a jar's suggestions."""
+    return (
+        select(func.count(Suggestion.id))
+        .where(Suggestion.picklejar_id == picklejar_id)
+        .scalar_subquery()
+    )
+
+
+def points_per_voter(picklejar_id: str):
+    """SQL expression for a jar's voting budget: n - 1 points, at least 1."""
+    count = suggestion_count(picklejar_id)
+    return case((count > 1, count - 1), else_=1)
+
+
+def if_match_versions(
+    picklejar_id: str, if_match: Optional[str]
+) -> Optional[List[int]]:
+    """
+    Return the jar versions an `If-Match` header accepts, or None if it
+    accepts any (no header, or `*`). Weak tags and tags of other jars
+    accept nothing. A trailing ballot counter is ignored.
+    """
+    if not if_match:
+        return None
+    prefix = f'"{picklejar_id}.'
+    versions = []
+    for tag in (tag.strip() for tag in if_match.split(",")):
+        if tag == "*":
+            return None
+        version = tag[len(prefix) : -1].split(".", 1)[0]
+        if tag.startswith(prefix) and tag.endswith('"') and version.isdigit():
+            versions.append(int(version))
+    return versions
+
+
+def transition_status(
+    db: Session,
+    picklejar_id: str,
+    from_status: Union[str, Sequence[str]],
+    to_status: str,
+    *conditions,
+    versions: Optional[List[int]] = None,
+    returning: Iterable = (),
+    now: Optional[datetime] = None,
+    **values,
+) -> Optional[Row]:
+    """
+    Move a jar from `from_status` (or any of several) to `to_status`,
+    bumping its version and setting `values`, and return the updated row
+    with any `returning` columns. Returns None without changing anything
+    unless the jar is in `from_status`, at one of `versions` (when given)
+    and matches every extra condition. Does not commit.
+    """
+    if isinstance(from_status, str):
+        status_matches = PickleJar.status == from_status
+    else:
+        status_matches = PickleJar.status.in_(from_status)
+    row = db.execute(
+        update(PickleJar)
+        .where(
+            PickleJar.id == picklejar_id,
+            status_matches,
+            *([PickleJar.version.in_(versions)] if versions is not None else []),
+            *conditions,
+        )
+        .values(
+            status=to_status,
+            updated_at=now or datetime.utcnow(),
+            version=PickleJar.version + 1,
+            **values,
+        )
+        .returning(*PickleJar.__table__.c, *returning)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is not None:
+        invalidate_on_commit(db, picklejar_id)
+    return row
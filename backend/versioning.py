@@ -0,0 +1,127 @@
+"""
+Per-jar version counter and conditional GET support.
+
+Every endpoint that changes a PickleJar, or the members and suggestions
+shown on its pages, calls `bump_version` in the same transaction. Read
+endpoints turn the version into a strong ETag and answer `If-None-Match`
+with 304 before loading any child rows.
+
+Ballots are the exception: they only increment the voter's
+`members.ballot_version`, so voters do not contend on the jar's row and the
+jar stays in the jar cache during voting. Reads that show ballots (detail,
+members, results, snapshot) add the jar's `ballot_version` sum to their ETag
+while it is voting, at the cost of one aggregate query.
+
+A completed jar's results snapshot (see results.py) is keyed by its
+version, so bumping a completed jar's version re-freezes its results when
+the session commits, after the change itself is flushed.
+"""
+
+from typing import Optional, Union
+
+from config import settings
+from fastapi import Response, status
+from jar_cache import JarSnapshot, invalidate_on_commit
+from models import Member, PickleJar
+from results import freeze_results
+from sqlalchemy import event, func, select, update
+from sqlalchemy.orm import Session
+
+# Session.info key holding completed jars whose results to freeze on commit
+_REFREEZE_KEY = "results_refreeze"
+
+
+def bump_version(db: Session, picklejar_id: str, **values) -> None:
+    """
+    Increment a jar's version in SQL, setting any other `values` in the same
+    UPDATE. Does not commit.
+
+    Also drops the jar from the jar cache once the session commits, and
+    re-freezes the results of a completed jar before it does.
+    """
+    invalidate_on_commit(db, picklejar_id)
+    jar_status = db.execute(
+        update(PickleJar)
+        .where(PickleJar.id == picklejar_id)
+        .values(version=PickleJar.version + 1, **values)
+        .returning(PickleJar.status)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if jar_status == "completed":
+        db.info.setdefault(_REFREEZE_KEY, set()).add(picklejar_id)
+
+
+@event.listens_for(Session, "before_commit")
+def _refreeze_completed(session: Session) -> None:
+    for picklejar_id in session.info.pop(_REFREEZE_KEY, ()):
+        freeze_results(session, picklejar_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_refreeze(session: Session) -> None:
+    session.info.pop(_REFREEZE_KEY, None)
+
+
+def ballot_version(
+    db: Session, picklejar: Union[PickleJar, JarSnapshot]
+) -> Optional[int]:
+    """
+    The jar's ballot counter while it is voting: the sum of its members'
+    `ballot_version`. None in other phases, when ballots cannot change.
+    """
+    if picklejar.status != "voting":
+        return None
+    return db.execute(
+        select(func.coalesce(func.sum(Member.ballot_version), 0)).where(
+            Member.picklejar_id == picklejar.id
+        )
+    ).scalar()
+
+
+def jar_etag(
+    picklejar: Union[PickleJar, JarSnapshot], ballots: Optional[int] = None
+) -> str:
+    if ballots is None:
+        return f'"{picklejar.id}.{picklejar.version}"'
+    return f'"{picklejar.id}.{picklejar.version}.{ballots}"'
+
+
+def _cache_control(immutable: bool) -> str:
+    # Even a completed jar changes when the host reverts it to voting or a
+    # member joins or renames, so responses are revalidated through the ETag.
+    # Only a response pinned to one jar version never changes. Responses
+    # include phone numbers, so they may only be cached by the client.
+    if immutable:
+        return f"private, max-age={settings.COMPLETED_JAR_MAX_AGE}, immutable"
+    return "no-cache"
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def not_modified(
+    picklejar: Union[PickleJar, JarSnapshot],
+    if_none_match: Optional[str],
+    response: Response,
+    immutable: bool = False,
+    ballots: Optional[int] = None,
+) -> Optional[Response]:
+    """
+    Return a 304 response if the client already has this jar version.
+
+    Otherwise set the ETag and Cache-Control headers on `response` and
+    return None so the handler builds the full body. `immutable` marks a
+    response that can never change, so the client may cache it for
+    COMPLETED_JAR_MAX_AGE without revalidating. Responses that show ballots
+    pass the jar's `ballot_version`.
+    """
+    headers = {
+        "ETag": jar_etag(picklejar, ballots),
+        "Cache-Control": _cache_control(immutable),
+    }
+    if if_none_match and _etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
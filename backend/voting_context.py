@@ -0,0 +1,181 @@
+"""
+Process-local voting context of jars in the voting phase.
+
+Once a jar enters voting its suggestions can no longer be added, edited or
+removed and its `points_per_voter` is fixed, so everything `submit_votes`
+validates a ballot against is known up front. `start_voting_phase` builds a
+`VotingContext` (the active suggestion IDs, the points budget and the IDs of
+the jar's members) right after it commits, and jars moved to voting by the
+deadline scheduler or on another worker get theirs on the first vote.
+Ballots are then checked in memory instead of querying `suggestions`.
+
+Members may still join while voting, so a member ID missing from the
+context is looked up once and added. `revert_to_suggesting` (and
+`start_voting_phase`, for contexts left from an earlier round) drop the
+context on commit through the jar cache's invalidation channel, so other
+workers drop theirs too. A context is also ignored once the jar is no longer
+voting or its budget differs, and expires after JAR_CACHE_TTL_SECONDS like
+the jar cache entries. With JAR_CACHE_ENABLED=false no context is kept and
+the voting endpoints query as before.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, FrozenSet, List, Optional, Set, Union
+
+from jar_cache import JarSnapshot, invalidate_on_commit, jar_cache
+from models import Member, PickleJar, Suggestion
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+# Invalidation channel entries for voting contexts carry this prefix, which
+# no jar ID has, so the jar cache itself ignores them
+_CHANNEL_PREFIX = "voting:"
+
+
+@dataclass(frozen=True)
+class VotingContext:
+    """
+    Shared by every request thread through `VotingContextStore`. Only
+    `member_ids` changes after the build, under `_member_lock`.
+    """
+
+    picklejar_id: str
+    points_per_voter: int
+    suggestion_ids: FrozenSet[str]
+    # Grows as members who joined during voting cast their first ballot
+    member_ids: Set[str]
+    _member_lock: threading.Lock = field(
+        default_factory=threading.Lock, compare=False, repr=False
+    )
+
+    def invalid_suggestions(self, suggestion_ids: List[str]) -> bool:
+        """True if a ballot names a suggestion twice or one outside the jar."""
+        return len(set(suggestion_ids)) != len(suggestion_ids) or not (
+            self.suggestion_ids.issuperset(suggestion_ids)
+        )
+
+    def has_member(self, db: Session, member_id: str) -> bool:
+        """Check membership, looking up members who joined after the build."""
+        with self._member_lock:
+            if member_id in self.member_ids:
+                return True
+        found = db.execute(
+            select(Member.id).where(
+                Member.id == member_id, Member.picklejar_id == self.picklejar_id
+            )
+        ).scalar()
+        if found is None:
+            return False
+        with self._member_lock:
+            self.member_ids.add(str(found))
+        return True
+
+
+def build_voting_context(
+    db: Session, picklejar: Union[PickleJar, JarSnapshot]
+) -> VotingContext:
+    """Load a voting jar's context in two queries."""
+    suggestion_ids = db.execute(
+        select(Suggestion.id).where(
+            Suggestion.picklejar_id == picklejar.id, Suggestion.is_active == True
+        )
+    ).scalars()
+    member_ids = db.execute(
+        select(Member.id).where(Member.picklejar_id == picklejar.id)
+    ).scalars()
+    return VotingContext(
+        picklejar_id=picklejar.id,
+        points_per_voter=picklejar.points_per_voter,
+        suggestion_ids=frozenset(str(sid) for sid in suggestion_ids),
+        member_ids={str(member_id) for member_id in member_ids},
+    )
+
+
+class VotingContextStore:
+    """Bounded LRU of `VotingContext`s, dropped through an invalidation channel."""
+
+    def __init__(
+        self,
+        channel,
+        max_size: int = 1024,
+        ttl_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.channel = channel
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # Bumped on every invalidation so a context built before a concurrent
+        # invalidation is not stored afterwards
+        self._generation = 0
+        channel.subscribe(self._drop)
+
+    def get(
+        self, db: Session, picklejar: Union[PickleJar, JarSnapshot]
+    ) -> Optional[VotingContext]:
+        """
+        Return the context of a voting jar, building it on a miss. Returns
+        None when contexts are disabled, the jar is not voting or its budget
+        has not been set.
+        """
+        if (
+            self.max_size <= 0
+            or picklejar.status != "voting"
+            or not picklejar.points_per_voter
+            or picklejar.points_per_voter <= 0
+        ):
+            return None
+        self.channel.poll()
+        with self._lock:
+            entry = self._entries.get(picklejar.id)
+            if (
+                entry is not None
+                and entry[0] > self.clock()
+                and entry[1].points_per_voter == picklejar.points_per_voter
+            ):
+                self._entries.move_to_end(picklejar.id)
+                return entry[1]
+            generation = self._generation
+
+        context = build_voting_context(db, picklejar)
+        with self._lock:
+            if generation == self._generation:
+                self._entries[picklejar.id] = (self.clock() + self.ttl_seconds, context)
+                self._entries.move_to_end(picklejar.id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return context
+
+    def _drop(self, channel_ids: Optional[List[str]]) -> None:
+        with self._lock:
+            if channel_ids is None:
+                self._generation += 1
+                self._entries.clear()
+                return
+            for channel_id in channel_ids:
+                if channel_id.startswith(_CHANNEL_PREFIX):
+                    self._generation += 1
+                    self._entries.pop(channel_id[len(_CHANNEL_PREFIX) :], None)
+
+
+voting_contexts = VotingContextStore(
+    jar_cache.channel,
+    max_size=jar_cache.max_size,
+    ttl_seconds=jar_cache.ttl_seconds,
+)
+
+
+def get_voting_context(
+    db: Session, picklejar: Union[PickleJar, JarSnapshot]
+) -> Optional[VotingContext]:
+    return voting_contexts.get(db, picklejar)
+
+
+def invalidate_voting_context_on_commit(db: Session, picklejar_id: str) -> None:
+    """Drop the jar's voting context in every worker once `db` commits."""
+    invalidate_on_commit(db, _CHANNEL_PREFIX + picklejar_id)
@@ -110,6 +110,7 @@ trap cleanup SIGINT SIGTERM
 echo -e "${BLUE}Starting backend...${NC}"
 cd backend
 source .venv/bin/activate 2>/dev/null || source .venv/Scripts/activate 2>/dev/null
+alembic upgrade head
 uvicorn main:app --reload --log-level info &
 BACKEND_PID=$!
 cd ..